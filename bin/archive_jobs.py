@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui.
+#
+# Copyright (C) 2012 HDE, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+import sys
+import logging
+from optparse import OptionParser
+
+from ksscommand import KssCommand, KssCommandException, KssCommandOptException
+
+import __cmd__
+
+try:
+    import karesansui
+    from karesansui import __version__
+    from karesansui.lib.utils import load_locale
+    from karesansui.lib.const import JOB_ARCHIVE_DIR, JOB_ARCHIVE_BATCH_SIZE, \
+         JOB_ARCHIVE_INTERVAL
+    from karesansui.db.access.jobhistory import create_indexes, archive_jobs
+
+except ImportError as e:
+    print("[Error] some packages not found. - %s" % e, file=sys.stderr)
+    sys.exit(1)
+
+_ = load_locale()
+
+usage = '%prog [options]'
+
+def getopts():
+    optp = OptionParser(usage=usage, version=__version__)
+    optp.add_option('-d', '--days', dest='days', type="int",
+                    help=_('Archive finished jobs older than this number of days'))
+    optp.add_option('-a', '--archive-dir', dest='archive_dir', default=JOB_ARCHIVE_DIR,
+                    help=_('Archive directory'))
+    optp.add_option('-b', '--batch-size', dest='batch_size', type="int", default=JOB_ARCHIVE_BATCH_SIZE,
+                    help=_('Job groups archived per transaction'))
+    optp.add_option('-i', '--interval', dest='interval', type="float", default=JOB_ARCHIVE_INTERVAL,
+                    help=_('Seconds to wait between transactions'))
+
+    return optp.parse_args()
+
+def chkopts(opts):
+    if opts.days is not None and opts.days < 1:
+        raise KssCommandOptException('ERROR: -d or --days option must be 1 or more. days=%s' % opts.days)
+    if opts.batch_size < 1:
+        raise KssCommandOptException('ERROR: -b or --batch-size option must be 1 or more. batch_size=%s' % opts.batch_size)
+    if opts.interval < 0:
+        raise KssCommandOptException('ERROR: -i or --interval option must be 0 or more. interval=%s' % opts.interval)
+
+class ArchiveJobs(KssCommand):
+
+    def process(self):
+        (opts, args) = getopts()
+        chkopts(opts)
+        self.up_progress(10)
+
+        created = create_indexes(self.kss_session, self.session)
+        for name in created:
+            self.logger.info('Created index. - %s' % name)
+            print(_('Created index. - %s') % name, file=sys.stdout)
+        self.up_progress(20)
+
+        if opts.days is None:
+            return True
+
+        try:
+            (count, filename) = archive_jobs(self.kss_session, self.session, opts.days,
+                                             opts.archive_dir, opts.batch_size, opts.interval)
+        except (IOError, OSError) as e:
+            raise KssCommandException('Failed to write the archive. - %s' % str(e))
+
+        if filename is None:
+            print(_('There were no jobs to archive.'), file=sys.stdout)
+        else:
+            self.logger.info('Archived jobs. - %d jobgroups, file=%s' % (count, filename))
+            print(_('Archived jobs. - %d jobgroups, file=%s') % (count, filename), file=sys.stdout)
+        return True
+
+if __name__ == "__main__":
+    target = ArchiveJobs()
+    sys.exit(target.run())
@@ -53,25 +53,24 @@ first_run = True
 conn = KaresansuiVirtConnection()
 shares = {}
 while True:
-    guests = conn.search_guests()
+    guests = conn.get_guest_inventory()
     idx = 1
     cpusum=0
     if first_run:
         for guest in guests:
-            id = guest.ID()
+            id = guest["id"]
             if id > -1:
-                name = guest.name()
-                info = guest.info()
-                shares[name] = info[4]
+                name = guest["name"]
+                shares[name] = guest["cpuTime"]
         first_run = False
     else:
         stdscr.addstr(idx, 1, "Domain\t\tID\tVCPU\t%CPU\t%CPUSUM   ", curses.A_REVERSE)
         idx += 1
         for guest in guests:
-            id = guest.ID()
-            if id > -1:
-                name = guest.name()
-                info = guest.info()
+            id = guest["id"]
+            if id > -1 and guest["name"] in shares:
+                name = guest["name"]
+                info = (guest["state"], guest["maxMem"], guest["memory"], guest["nrVirtCpu"], guest["cpuTime"])
                 now = time.time()
                 share = info[4] - shares[name]
                 p = (share*100)/((now - vtop_start) * 10**9)
@@ -52,54 +52,29 @@ class GetCpuUsage(KssCommand):
     def process(self):
         conn = KaresansuiVirtConnection()
         try:
-            guests = conn.search_guests()
-    
-            infos = []
-            for guest in guests:
-              id = guest.ID()
-              if id > -1:
-                name = guest.name()
-                info = guest.info()
-        
+            infos = {}
+            for guest in conn.get_guest_inventory():
+              if guest["id"] > -1:
                 now = gettimeofday()
                 sec = now[0]
                 usec = now[1]
-                infos.append({"id": id, "cpu_time": info[4], "real_time_sec": int(sec), "real_time_usec": int(usec)})
+                infos[guest["uuid"]] = {"id": guest["id"], "cpu_time": guest["cpuTime"], "real_time_sec": int(sec), "real_time_usec": int(usec)}
     
             #print infos
             time.sleep(1.1)
     
-            cnt = 0
-            for guest in guests:
-              id = guest.ID()
-              if id > -1:
-                name = guest.name()
-                print(name)
-                info = guest.info()
+            for guest in conn.get_guest_inventory():
+              if guest["id"] > -1 and guest["uuid"] in infos:
+                print(guest["name"])
+                prev = infos[guest["uuid"]]
     
                 now = gettimeofday()
                 sec = now[0]
                 usec = now[1]
     
                 # calculate the usage of cpu
-                #print infos[cnt]
-                cpu_diff = (info[4] - infos[cnt]["cpu_time"]) / 10000
-                #print info[4]
-                #print infos[cnt]["cpu_time"]
-                #print cpu_diff
-    
-                #real_diff = 1000 *(long(sec) - infos[cnt]["real_time_sec"]) + (usec - infos[cnt]["real_time_usec"])
-                real_diff = ((int(sec) - infos[cnt]["real_time_sec"]) * 1000) + ((usec - infos[cnt]["real_time_usec"]) / 1000);
-    
-                #real_diff = 1000 *(sec - infos[cnt]["real_time_sec"])
-                #real_diff2 = (usec - infos[cnt]["real_time_usec"])
-    
-                #print "realTime.tv_sec:%10ld" % sec
-                #print "infos.real_time.tv_sec:%10ld" % infos[cnt]["real_time_sec"]
-                #print "realTime.tv_usec:%10ld" % usec
-                #print "infos.real_time.tv_usec:%10ld" % infos[cnt]["real_time_usec"]
-                #print "real_diff:%10ld" % real_diff
-                #print "cpu_diff:%10ld" % cpu_diff
+                cpu_diff = (guest["cpuTime"] - prev["cpu_time"]) / 10000
+                real_diff = ((int(sec) - prev["real_time_sec"]) * 1000) + ((usec - prev["real_time_usec"]) / 1000);
     
                 usage = cpu_diff / float(real_diff);  
                 print("%.3f%%" % usage)
@@ -107,9 +82,8 @@ class GetCpuUsage(KssCommand):
                 # print the results
                 #printf("%d\t%.3f%\t%lu\t%lu\t%hu\t%0X\t%s\n", id, usage, info.memory / 1024,  
                 #info.maxMem / 1024, info.nrVirtCpu, info.state, virDomainGetName(dom));  
-                cnt = cnt + 1
 
-                return True
+            return True
         finally:
             conn.close()
 
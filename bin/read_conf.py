@@ -45,6 +45,7 @@ try:
     from karesansui.lib.dict_op import DictOp
     from karesansui.lib.file.configfile import ConfigFile
     from karesansui.lib.utils import python_dict_to_php_array
+    from karesansui.lib import dict_op_wire
 
 except ImportError as e:
     print("[Error] some packages not found. - %s" % e, file=sys.stderr)
@@ -60,6 +61,7 @@ def getopts():
     optp.add_option('-o', '--output-file',  dest='file',  help=_('Output file name'))
     optp.add_option('-R', '--raw',  dest='raw', action="store_true", default=False, help=_('Print by raw format'))
     optp.add_option('-P', '--php',  dest='php', action="store_true", default=False, help=_('Print by php format'))
+    optp.add_option('-L', '--literal',  dest='literal', action="store_true", default=False, help=_('Print by python literal format'))
     optp.add_option('-q', '--quiet',dest='verbose', action="store_false", default=True, help=_("don't print status messages"))
     optp.add_option('-H', '--host', dest='host', help=_('Host name'))
     optp.add_option('-U', '--auth-user',  dest='auth_user',  help=_('Auth user name'))
@@ -89,8 +91,8 @@ def chkopts(opts):
     if len(modules) != len(files):
         raise KssCommandOptException("ERROR: not same number of modules and files. - module:%d file:%d" % (len(modules),len(files),))
 
-    if opts.raw is True and opts.php is True:
-        raise KssCommandOptException("ERROR: cannot specify --raw and --php option at same time.")
+    if [opts.raw, opts.php, opts.literal].count(True) > 1:
+        raise KssCommandOptException("ERROR: cannot specify --raw, --php and --literal option at same time.")
 
 
 class ReadConf(KssCommand):
@@ -134,8 +136,10 @@ class ReadConf(KssCommand):
                     if opts.php is True:
                         _str = python_dict_to_php_array(dop.getconf(_mod),_var)
                         ConfigFile(_file).write(_str)
-                    else:
+                    elif opts.literal is True:
                         ConfigFile(_file).write("%s = %s\n" % (_var,str(dop.getconf(_mod)),))
+                    else:
+                        ConfigFile(_file).write(dict_op_wire.dumps(_mod,dop.getconf(_mod)))
 
             finally:
                 cnt = cnt + 1
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui.
+#
+# Copyright (C) 2012 HDE, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+import os
+import sys
+import signal
+import logging
+from optparse import OptionParser
+
+from __cmd__ import karesansui_conf, search_path
+
+for y in [x.strip() for x in search_path.split(',') if x]:
+    if (y in sys.path) is False: sys.path.insert(0, y)
+
+try:
+    import karesansui
+    from karesansui import __version__
+    from karesansui.lib.utils import load_locale
+    from karesansui.lib.file.k2v import K2V
+    from karesansui.lib.const import KARESANSUI_GROUP, CONFIGURE_SERVER_SOCKET
+    from karesansui.lib.conf_server import ConfigReadServer
+    import karesansui.lib.log.logger
+
+except ImportError as e:
+    print("[Error] some packages not found. - %s" % e, file=sys.stderr)
+    sys.exit(1)
+
+_ = load_locale()
+
+usage = '%prog [options]'
+
+def getopts():
+    optp = OptionParser(usage=usage, version=__version__)
+    optp.add_option('-s', '--socket', dest='socket', help=_('Socket file name'), default=CONFIGURE_SERVER_SOCKET)
+    optp.add_option('-g', '--group', dest='group', help=_('Group allowed to connect'), default=KARESANSUI_GROUP)
+
+    return optp.parse_args()
+
+def main():
+    (opts, args) = getopts()
+
+    if os.getuid() != 0:
+        print("[Error] must be run as root.", file=sys.stderr)
+        return 1
+
+    try:
+        karesansui.config = K2V(karesansui_conf).read()
+        karesansui.lib.log.logger.reload_conf(karesansui.config['application.log.config'])
+    except Exception as e:
+        print('[Error] Failed to load configuration file. - %s : msg=%s' % (karesansui_conf, str(e)), file=sys.stderr)
+        return 1
+    logger = logging.getLogger('karesansui.command')
+
+    server = ConfigReadServer(opts.socket, group=opts.group)
+
+    def _shutdown(signum, frame):
+        raise KeyboardInterrupt()
+    signal.signal(signal.SIGTERM, _shutdown)
+
+    logger.info('Configuration read server started - socket=%s' % opts.socket)
+    try:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    finally:
+        server.server_close()
+        logger.info('Configuration read server stopped - socket=%s' % opts.socket)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -46,6 +46,7 @@ try:
     from karesansui.lib.utils import preprint_r, base64_decode
     from karesansui.lib.utils import php_array_to_python_dict
     from karesansui.lib.dict_op import DictOp
+    from karesansui.lib import dict_op_wire
 
 except ImportError as e:
     print("[Error] some packages not found. - %s" % e, file=sys.stderr)
@@ -55,6 +56,19 @@ _ = load_locale()
 
 usage = '%prog [options]'
 
+def read_dict_file(filename, module):
+    """
+    Read a dict file written by karesansui.lib.conf.write_conf().
+    The python literal format of older versions is still accepted.
+    """
+    data = open(filename).read()
+    if dict_op_wire.is_wire_format(data):
+        return dict_op_wire.loads(data)[module]
+
+    _locals = {}
+    exec("conf_arr = %s" % data, {}, _locals)
+    return _locals["conf_arr"]
+
 def getopts():
     optp = OptionParser(usage=usage, version=__version__)
     optp.add_option('-m', '--module', dest='module', help=_('Module name'))
@@ -98,7 +112,11 @@ def chkopts(opts):
 
         else:
             try:
-                exec("%s" % open(_file).read())
+                data = open(_file).read()
+                if dict_op_wire.is_wire_format(data):
+                    dict_op_wire.loads(data)
+                else:
+                    exec("%s" % data)
             except:
                 raise KssCommandOptException("ERROR: file format is invalid. - %s" % _file)
 
@@ -147,7 +165,7 @@ class WriteConf(KssCommand):
                 if opts.php is True:
                     conf_arr = php_array_to_python_dict(open(_file).read())
                 else:
-                    exec("conf_arr = %s" % open(_file).read())
+                    conf_arr = read_dict_file(_file,_mod)
                 dop.addconf(_mod,conf_arr)
 
                 """
@@ -126,6 +126,11 @@ def main():
         print('[Error] libvirtd not running."/etc/init.d/libvirtd start" Please start.', file=sys.stderr)
         sys.exit(1)
     
+    # libvirt domain events (before any libvirt connection is opened)
+    import karesansui.lib.virt.event
+    if karesansui.lib.virt.event.start_monitor() is not None:
+        logger.info('libvirt domain event monitor was started.')
+
     if web.wsgi._is_dev_mode() is True and ('FCGI' in env) is False:
         logger.info('Start Mode [development]')
         app = web.application(urls, globals(), autoreload=True)
@@ -136,7 +141,19 @@ def main():
         web.config.debug = False
         app = web.application(urls, globals(), autoreload=False)
         #sys.argv = [] # argv clear
-        
+
+    # compile templates before the first request
+    from karesansui.lib.rest import precompile_templates
+    logger.info('The templates were compiled. - %d files' % precompile_templates())
+
+    # search index of machines and tags
+    import karesansui.db
+    from karesansui.db.searchindex import prepare_search_index
+    if prepare_search_index(karesansui.db.get_engine()) is not None:
+        logger.info('The search index was prepared.')
+    else:
+        logger.info('The search index is not available. Searches use LIKE.')
+
     # load processor!
     #  - karesansui database!
     app.add_processor(load_sqlalchemy_karesansui)
@@ -26,6 +26,12 @@
 
 import time
 import logging
+import threading
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import class_mapper
+
+import karesansui
 
 from pysilhouette.db.access import \
     jobgroup_findbyall, jobgroup_findbyall_limit, jobgroup_findbystatus, \
@@ -37,8 +43,12 @@ from pysilhouette.db.access import \
 from pysilhouette.db.model import JOBGROUP_TYPE
 
 from karesansui.db.model._2pysilhouette import Job, JobGroup, JOBGROUP_STATUS
+from karesansui.db.model.machine2jobgroup import Machine2Jobgroup
+from karesansui.db.model.jobgroupsummary import JobgroupSummary
+from karesansui.lib.const import JOBGROUP_SUMMARY_CHUNK_SIZE
 from karesansui.db.access import dbsave, dbupdate, dbdelete
 import karesansui.db.access.search
+from karesansui.lib.inotify import FileWatcher
 import karesansui.db.access.machine2jobgroup
 
 logger = logging.getLogger('karesansui.db.access._2pysilhouette')
@@ -64,7 +74,7 @@ def jg_findby1(session, jobgroup_id):
 
 def jg_findbyalltype(session, _type,
                      jobgroup_ids=None, status=None,
-                     desc=False):
+                     desc=False, as_query=False):
     query = session.query(JobGroup)
 
     if not jobgroup_ids is None:
@@ -79,9 +89,13 @@ def jg_findbyalltype(session, _type,
         query = query.filter(JobGroup.type == JOBGROUP_TYPE["PARALLEL"])
 
     if desc is True:
-        return query.order_by(JobGroup.id.desc()).all()
+        query = query.order_by(JobGroup.id.desc())
     else:
-        return query.order_by(JobGroup.id.asc()).all()
+        query = query.order_by(JobGroup.id.asc())
+
+    if as_query is True:
+        return query
+    return query.all()
 
 def jg_findbylimit(session, limit, desc=False):
     if desc is True:
@@ -136,8 +150,10 @@ def save_job_collaboration(karesansui_session,
     
     # Machine2JobGroup INSERT
     try:
+        create_jobgroup_summary(karesansui_session)
         machine2jobgroup.jobgroup_id = jobgroup.id
         karesansui.db.access.machine2jobgroup.save(karesansui_session, machine2jobgroup)
+        karesansui_session.add(JobgroupSummary(jobgroup.id, jobgroup.type, jobgroup.status))
         karesansui_session.commit()
     except:
         try:
@@ -149,6 +165,149 @@ def save_job_collaboration(karesansui_session,
                               % jobgroup.id)
         raise # throw
 
+# statuses after which a jobgroup does not change any more.
+JOBGROUP_FINISHED_STATUS = (JOBGROUP_STATUS['OK'], JOBGROUP_STATUS['NG'])
+
+_jobgroup_summary_created = False
+# ids of machine2jobgroup rows whose jobgroup is gone from pysilhouette.
+_jobgroup_summary_missing = set()
+_jobgroup_summary_lock = threading.Lock()
+
+def create_jobgroup_summary(karesansui_session):
+    """<comment-ja>
+    jobgroupsummaryテーブルがなければ作成します。
+    </comment-ja>
+    <comment-en>
+    Create the jobgroupsummary table if the database predates it. Only the
+    first call of a process looks at the database.
+    </comment-en>
+    """
+    global _jobgroup_summary_created
+    if _jobgroup_summary_created is True:
+        return
+    _jobgroup_summary_lock.acquire()
+    try:
+        if _jobgroup_summary_created is False:
+            class_mapper(JobgroupSummary).local_table.create(
+                bind=karesansui_session.bind, checkfirst=True)
+            _jobgroup_summary_created = True
+    finally:
+        _jobgroup_summary_lock.release()
+
+def update_jobgroup_summary(karesansui_session, jobgroups):
+    """<comment-ja>
+    ジョブグループの種類と状態をjobgroupsummaryテーブルに反映します。
+    @param jobgroups: ジョブグループのリスト
+    @type jobgroups: [pysilhouette.db.model.JobGroup...]
+    </comment-ja>
+    <comment-en>
+    Write the type and status of jobgroups to jobgroupsummary.
+    </comment-en>
+    """
+    for jobgroup in jobgroups:
+        karesansui_session.merge(JobgroupSummary(jobgroup.id, jobgroup.type, jobgroup.status))
+
+def _jobgroups_by_id(pysilhouette_session, jobgroup_ids):
+    jobgroups = {}
+    for i in range(0, len(jobgroup_ids), JOBGROUP_SUMMARY_CHUNK_SIZE):
+        chunk = jobgroup_ids[i:i + JOBGROUP_SUMMARY_CHUNK_SIZE]
+        for jobgroup in jg_findbyall(pysilhouette_session, chunk):
+            jobgroups[jobgroup.id] = jobgroup
+    return jobgroups
+
+def sync_jobgroup_summary(karesansui_session, pysilhouette_session):
+    """<comment-ja>
+    PySilhouetteのジョブグループの状態をjobgroupsummaryテーブルに反映します。
+    @param karesansui_session: Karesansui Database Session
+    @type karesansui_session: Session
+    @param pysilhouette_session: Pysilhouette Database Session
+    @type pysilhouette_session: Session
+    </comment-ja>
+    <comment-en>
+    Bring jobgroupsummary up to date before a job list is read.
+
+    PySilhouette finishes jobs in its own process, so the summaries that
+    are not finished yet (usually a handful, found through the status
+    index) are compared with their jobgroups here. Jobs without a summary
+    (registered before the table existed, or saved through
+    machine2jobgroup.save() alone) are found by an anti-join on the
+    jobgroup_id index and get one. Summaries whose jobgroup is gone are
+    removed; jobs without a summary are not listed.
+    </comment-en>
+    """
+    create_jobgroup_summary(karesansui_session)
+
+    unfinished_ids = [row[0] for row in karesansui_session.query(
+        JobgroupSummary.jobgroup_id).filter(
+        ~JobgroupSummary.status.in_(JOBGROUP_FINISHED_STATUS)).all()]
+
+    unknown_ids = [row[0] for row in karesansui_session.query(
+        Machine2Jobgroup.jobgroup_id).outerjoin(
+        JobgroupSummary,
+        JobgroupSummary.jobgroup_id == Machine2Jobgroup.jobgroup_id).filter(
+        JobgroupSummary.jobgroup_id == None).all()]
+    unknown_ids = sorted(set(unknown_ids) - _jobgroup_summary_missing)
+
+    jobgroups = _jobgroups_by_id(pysilhouette_session, unfinished_ids + unknown_ids)
+
+    update_jobgroup_summary(karesansui_session,
+                            [jobgroups[id] for id in unfinished_ids if id in jobgroups])
+
+    _jobgroup_summary_missing.update([id for id in unknown_ids if not id in jobgroups])
+    _insert_jobgroup_summary(karesansui_session,
+                             [jobgroups[id] for id in unknown_ids if id in jobgroups])
+
+    gone_ids = [id for id in unfinished_ids if not id in jobgroups]
+    for i in range(0, len(gone_ids), JOBGROUP_SUMMARY_CHUNK_SIZE):
+        karesansui_session.query(JobgroupSummary).filter(
+            JobgroupSummary.jobgroup_id.in_(gone_ids[i:i + JOBGROUP_SUMMARY_CHUNK_SIZE])).delete(
+            synchronize_session=False)
+
+    karesansui_session.flush()
+
+def _insert_jobgroup_summary(karesansui_session, jobgroups):
+    """<comment-ja>
+    jobgroupsummaryテーブルにまとめて追加します。
+    </comment-ja>
+    <comment-en>
+    Bulk insert the summaries of jobgroups. When another request (of this
+    or another process) has inserted some of them meanwhile, the insert
+    is rolled back to a savepoint and the summaries are merged instead.
+    </comment-en>
+    """
+    if not jobgroups:
+        return
+    rows = [{"jobgroup_id": jobgroup.id, "type": jobgroup.type, "status": jobgroup.status}
+            for jobgroup in jobgroups]
+    _jobgroup_summary_lock.acquire()
+    try:
+        savepoint = karesansui_session.begin_nested()
+        try:
+            karesansui_session.execute(class_mapper(JobgroupSummary).local_table.insert(), rows)
+            savepoint.commit()
+        except IntegrityError:
+            savepoint.rollback()
+            logger.debug('jobgroupsummary was filled meanwhile, merging %d rows' % len(rows))
+            update_jobgroup_summary(karesansui_session, jobgroups)
+    finally:
+        _jobgroup_summary_lock.release()
+
+def _jobgroup_database_file():
+    """<comment-ja>
+    Pysilhouetteのデータベースがsqliteの場合、そのファイルパスを返します。
+    </comment-ja>
+    <comment-en>
+    Return the path of the pysilhouette database when it is sqlite, else None.
+    </comment-en>
+    """
+    try:
+        url = karesansui.sheconf['database.url']
+    except (TypeError, KeyError):
+        return None
+    if url[:10] != 'sqlite:///' or url == 'sqlite:///:memory:':
+        return None
+    return url[10:]
+
 def corp(karesansui_session,
           pysilhouette_session,
           machine2jobgroup,
@@ -157,35 +316,52 @@ def corp(karesansui_session,
           timeout=20):
     """<comment-ja>
     Pysilhouette経由で権限昇格によるコマンド実行を行います。
+    sqliteの場合はデータベースファイルの更新をinotifyで待ち合わせ、
+    それ以外は短い間隔から徐々にwaittime秒まで延ばしながら状態を確認します。
     </comment-ja>
     <comment-en>
     Can only reading (parallel)
+    Instead of sleeping waittime seconds between each look at the JobGroup,
+    wait for the pysilhouette database file to be written (inotify), or poll
+    with a backoff from 50 msec up to waittime seconds when that is not
+    possible. The whole wait never exceeds timeout seconds.
     </comment-en>
     """
     save_job_collaboration(karesansui_session, pysilhouette_session, machine2jobgroup, jobgroup)
 
-    timeout = int(timeout)
-    waittime = int(waittime)
+    timeout = float(timeout)
+    waittime = float(waittime)
 
+    watcher = FileWatcher(_jobgroup_database_file())
     start_time = time.time()
     res = False
-    while True:
-        if (int(time.time() - start_time)) <= timeout:
+    try:
+        while True:
             pysilhouette_session.refresh(jobgroup)
             logger.debug('Reading JobGroup info - id=%d, status=%s' \
                          % (jobgroup.id, jobgroup.status))
             if jobgroup.status == JOBGROUP_STATUS['OK']:
                 res = True
+                update_jobgroup_summary(karesansui_session, [jobgroup])
                 break
-        else:
-            res = False # TimeOut
-            logger.warn('Reading JobGroup - Result=Read Timeout, id=%d, status=%s' \
-                                 % (jobgroup.id, jobgroup.status))
-            break
-        time.sleep(waittime)
-
-    print('Reading JobGroup - runtime=%d' % (int(time.time() - start_time)))
-    logger.fatal('Reading JobGroup - runtime=%d' % (int(time.time() - start_time)))
+            if jobgroup.status == JOBGROUP_STATUS['NG']:
+                res = False
+                logger.warn('Reading JobGroup - Result=Failed, id=%d, status=%s' \
+                            % (jobgroup.id, jobgroup.status))
+                update_jobgroup_summary(karesansui_session, [jobgroup])
+                break
+
+            remaining = timeout - (time.time() - start_time)
+            if remaining <= 0:
+                res = False # TimeOut
+                logger.warn('Reading JobGroup - Result=Read Timeout, id=%d, status=%s' \
+                            % (jobgroup.id, jobgroup.status))
+                break
+            watcher.wait(min(remaining, waittime))
+    finally:
+        watcher.close()
+
+    logger.debug('Reading JobGroup - runtime=%.3f' % (time.time() - start_time))
     return res
 
 
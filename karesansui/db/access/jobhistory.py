@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui Core.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+
+"""
+<comment-ja>
+ジョブ履歴のインデックスと保存期間の管理
+</comment-ja>
+<comment-en>
+Indexes and retention of the job history (machine2jobgroup and the
+pysilhouette jobgroup and job tables).
+
+archive_jobs() moves finished jobs older than a number of days out of both
+databases into a gzipped JSON lines file, one line per jobgroup with its
+jobs and machine2jobgroup rows. It works in small batches, each written to
+the file before it is deleted, so that it can run while Karesansui and
+pysilhouette are in use. A batch interrupted between the two steps is
+written again by the next run.
+</comment-en>
+"""
+
+import os
+import gzip
+import json
+import time
+import logging
+import datetime
+
+import sqlalchemy
+from sqlalchemy import or_
+from sqlalchemy.orm import class_mapper
+
+from karesansui.lib.const import JOB_ARCHIVE_DIR, JOB_ARCHIVE_BATCH_SIZE, \
+     JOB_ARCHIVE_INTERVAL
+from karesansui.db.model.machine2jobgroup import Machine2Jobgroup
+from karesansui.db.model.jobgroupsummary import JobgroupSummary
+from karesansui.db.model.watch import Watch
+from karesansui.db.model._2pysilhouette import Job, JobGroup
+from karesansui.db.access._2pysilhouette import create_jobgroup_summary, \
+     sync_jobgroup_summary, JOBGROUP_FINISHED_STATUS
+
+logger = logging.getLogger('karesansui.db.access.jobhistory')
+
+# indexes of the pysilhouette tables: (model, index name, columns)
+PYSILHOUETTE_INDEXES = ((JobGroup, 'jobgroup_status_id_idx', ('status', 'id')),
+                        (JobGroup, 'jobgroup_uniq_key_idx', ('uniq_key',)),
+                        (Job, 'job_jobgroup_id_idx', ('jobgroup_id',)),
+                        )
+
+def _table(model):
+    return class_mapper(model).local_table
+
+def create_indexes(karesansui_session, pysilhouette_session):
+    """<comment-ja>
+    ジョブ履歴のインデックスがなければ作成します。
+    @return: 作成したインデックス名のリスト
+    </comment-ja>
+    <comment-en>
+    Create the indexes of the job history that are missing from an
+    existing database: those declared on machine2jobgroup,
+    jobgroupsummary and watch, and PYSILHOUETTE_INDEXES. An index whose
+    columns the pysilhouette table does not have is skipped.
+    Returns the names of the created indexes.
+    </comment-en>
+    """
+    create_jobgroup_summary(karesansui_session)
+
+    created = []
+    conn = karesansui_session.connection()
+    inspector = sqlalchemy.inspect(conn)
+    for model in (Machine2Jobgroup, JobgroupSummary, Watch):
+        table = _table(model)
+        existing = set([index['name'] for index in inspector.get_indexes(table.name)])
+        for index in table.indexes:
+            if not index.name in existing:
+                index.create(conn)
+                created.append(index.name)
+    karesansui_session.commit()
+
+    conn = pysilhouette_session.connection()
+    inspector = sqlalchemy.inspect(conn)
+    for (model, name, columns) in PYSILHOUETTE_INDEXES:
+        table = _table(model)
+        existing = set([index['name'] for index in inspector.get_indexes(table.name)])
+        if name in existing:
+            continue
+        if [column for column in columns if not column in table.c]:
+            logger.warning('The index was skipped, the columns do not exist. - %s%s' % (name, columns))
+            continue
+        sqlalchemy.Index(name, *[table.c[column] for column in columns]).create(conn)
+        created.append(name)
+    pysilhouette_session.commit()
+
+    return created
+
+def _select(session, table, column, ids):
+    return [dict(row.items()) for row in session.execute(
+        table.select().where(column.in_(ids)).order_by(column))]
+
+def archive_jobs(karesansui_session, pysilhouette_session, days,
+                 archive_dir=JOB_ARCHIVE_DIR, batch_size=JOB_ARCHIVE_BATCH_SIZE,
+                 interval=JOB_ARCHIVE_INTERVAL):
+    """<comment-ja>
+    保存期間を過ぎた完了済みのジョブをファイルに移動します。
+    @param days: 保存期間(日)
+    @type days: int
+    @param archive_dir: 保存先ディレクトリ
+    @type archive_dir: str
+    @param batch_size: 1回に移動するジョブグループの数
+    @type batch_size: int
+    @param interval: バッチ間の待ち時間(秒)
+    @type interval: float
+    @return: (移動したジョブグループの数, ファイル名)
+    </comment-ja>
+    <comment-en>
+    Move the jobs registered more than days ago whose jobgroup is finished
+    (or already gone from pysilhouette) to a new file in archive_dir.
+    Returns (number of jobgroups, filename); filename is None when nothing
+    was old enough.
+    </comment-en>
+    """
+    sync_jobgroup_summary(karesansui_session, pysilhouette_session)
+    karesansui_session.commit()
+
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=days)
+    t_m2j = _table(Machine2Jobgroup)
+    t_summary = _table(JobgroupSummary)
+    t_jobgroup = _table(JobGroup)
+    t_job = _table(Job)
+
+    filename = None
+    fp = None
+    count = 0
+    last_id = 0
+    try:
+        while True:
+            rows = karesansui_session.query(
+                Machine2Jobgroup.id, Machine2Jobgroup.jobgroup_id).outerjoin(
+                JobgroupSummary,
+                JobgroupSummary.jobgroup_id == Machine2Jobgroup.jobgroup_id).filter(
+                Machine2Jobgroup.created < cutoff).filter(
+                Machine2Jobgroup.id > last_id).filter(
+                or_(JobgroupSummary.status.in_(JOBGROUP_FINISHED_STATUS),
+                    JobgroupSummary.jobgroup_id == None)).order_by(
+                Machine2Jobgroup.id.asc()).limit(batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            jobgroup_ids = sorted(set([row[1] for row in rows]))
+
+            jobgroups = _select(pysilhouette_session, t_jobgroup, t_jobgroup.c.id, jobgroup_ids)
+            jobs = _select(pysilhouette_session, t_job, t_job.c.jobgroup_id, jobgroup_ids)
+            m2js = _select(karesansui_session, t_m2j, t_m2j.c.jobgroup_id, jobgroup_ids)
+
+            records = dict([(id, {"jobgroup_id": id,
+                                  "jobgroup": None,
+                                  "jobs": [],
+                                  "machine2jobgroup": [],
+                                  }) for id in jobgroup_ids])
+            for jobgroup in jobgroups:
+                records[jobgroup["id"]]["jobgroup"] = jobgroup
+            for job in jobs:
+                records[job["jobgroup_id"]]["jobs"].append(job)
+            for m2j in m2js:
+                records[m2j["jobgroup_id"]]["machine2jobgroup"].append(m2j)
+
+            if fp is None:
+                if not os.path.isdir(archive_dir):
+                    os.makedirs(archive_dir)
+                filename = os.path.join(archive_dir, "jobs-%s.jsonl.gz" \
+                                        % datetime.datetime.now().strftime("%Y%m%d%H%M%S"))
+                fp = gzip.open(filename, "at")
+            for id in jobgroup_ids:
+                fp.write(json.dumps(records[id], default=str, sort_keys=True) + "\n")
+            fp.flush()
+            os.fsync(fp.fileno())
+
+            pysilhouette_session.execute(t_job.delete().where(t_job.c.jobgroup_id.in_(jobgroup_ids)))
+            pysilhouette_session.execute(t_jobgroup.delete().where(t_jobgroup.c.id.in_(jobgroup_ids)))
+            pysilhouette_session.commit()
+
+            karesansui_session.execute(t_summary.delete().where(t_summary.c.jobgroup_id.in_(jobgroup_ids)))
+            karesansui_session.execute(t_m2j.delete().where(t_m2j.c.jobgroup_id.in_(jobgroup_ids)))
+            karesansui_session.commit()
+
+            count += len(jobgroup_ids)
+            logger.info('Archived jobgroups. - %d jobgroups, last machine2jobgroup id=%d, file=%s' \
+                        % (len(jobgroup_ids), last_id, filename))
+            if interval:
+                time.sleep(interval)
+    finally:
+        if fp is not None:
+            fp.close()
+
+    return (count, filename)
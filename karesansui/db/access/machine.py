@@ -29,6 +29,7 @@ from sqlalchemy import and_, or_
 from karesansui.lib.const import MACHINE_ATTRIBUTE
 from karesansui.db.model.machine import Machine
 from karesansui.db.access import dbsave, dbupdate, dbdelete
+from karesansui.db.access.search import findbyand as _findbyand
 
 # -- all
 def findbyall(session, is_deleted=False):
@@ -65,6 +66,26 @@ def findbyhostall(session, is_deleted=False):
         or_(Machine.attribute == MACHINE_ATTRIBUTE['HOST'], Machine.attribute == MACHINE_ATTRIBUTE['URI'])).filter(
         Machine.is_deleted == is_deleted).all()
 
+def findbyhostand(session, query, is_deleted=False):
+    """<comment-ja>
+    クエリー条件のAND検索で、ホスト情報を取得します。
+    名前、ホスト名、タグ、ノートを検索します。
+    @param session: Session
+    @type session: sqlalchemy.orm.session.Session
+    @param query: クエリー条件
+    @type query: str
+    @return: karesansui.db.model.machine.Machine のリスト
+    </comment-ja>
+    <comment-en>
+    Search the hosts by name, hostname, tags and notebook. Without the
+    search index only the name and the hostname are searched.
+    </comment-en>
+    """
+    return _findbyand(session, query, Machine, [Machine.name, Machine.hostname],
+                      as_query=True, kind='machine').filter(
+        or_(Machine.attribute == MACHINE_ATTRIBUTE['HOST'], Machine.attribute == MACHINE_ATTRIBUTE['URI'])).filter(
+        Machine.is_deleted == is_deleted).all()
+
 def findbyhost1(session, machine_id, is_deleted=False):
     return session.query(Machine).filter(
         Machine.id == machine_id).filter(
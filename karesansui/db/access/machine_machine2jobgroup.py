@@ -26,10 +26,33 @@
 from karesansui.lib.const import MACHINE_ATTRIBUTE
 from karesansui.db.model.machine import Machine
 from karesansui.db.model.machine2jobgroup import Machine2Jobgroup
+from karesansui.db.model.jobgroupsummary import JobgroupSummary
 from sqlalchemy import or_, and_
 
+def _filter_jobgroup(query, jobgroup_type=None, jobgroup_status=None):
+    """<comment-ja>
+    ジョブグループの種類と状態で絞り込みます。
+    </comment-ja>
+    <comment-en>
+    Filter by the type and status of the jobgroups, which are read from
+    jobgroupsummary (see sync_jobgroup_summary()). Rows without a summary
+    are left out once either is given.
+    </comment-en>
+    """
+    if jobgroup_type is None and jobgroup_status is None:
+        return query
+
+    query = query.join(JobgroupSummary,
+                       JobgroupSummary.jobgroup_id == Machine2Jobgroup.jobgroup_id)
+    if not jobgroup_type is None:
+        query = query.filter(JobgroupSummary.type == jobgroup_type)
+    if not jobgroup_status is None:
+        query = query.filter(JobgroupSummary.status == jobgroup_status)
+    return query
+
 def findbyall(session, machine_name=None, created_start=None,
-              created_end=None, created_user_id=None, desc=False):
+              created_end=None, created_user_id=None, desc=False,
+              as_query=False, jobgroup_type=None, jobgroup_status=None):
 
     query = session.query(Machine).add_entity(Machine2Jobgroup).join(Machine2Jobgroup)
 
@@ -48,14 +71,21 @@ def findbyall(session, machine_name=None, created_start=None,
     elif (not created_start) and created_end:
         query = query.filter(Machine2Jobgroup.created <= created_end)
         
+    query = _filter_jobgroup(query, jobgroup_type, jobgroup_status)
+
     if desc is True:
-        return query.order_by(Machine2Jobgroup.id.desc()).all()
+        query = query.order_by(Machine2Jobgroup.id.desc())
     else:
-        return query.order_by(Machine2Jobgroup.id.asc()).all()
+        query = query.order_by(Machine2Jobgroup.id.asc())
+
+    if as_query is True:
+        return query
+    return query.all()
 
 
 def findbyhost(session, host_id, created_start=None,
-              created_end=None, created_user_id=None, desc=False):
+              created_end=None, created_user_id=None, desc=False,
+              as_query=False, jobgroup_type=None, jobgroup_status=None):
 
     query = session.query(Machine).add_entity(Machine2Jobgroup).join(Machine2Jobgroup)
 
@@ -80,13 +110,20 @@ def findbyhost(session, host_id, created_start=None,
     elif (not created_start) and created_end:
         query = query.filter(Machine2Jobgroup.created <= created_end)
         
+    query = _filter_jobgroup(query, jobgroup_type, jobgroup_status)
+
     if desc is True:
-        return query.order_by(Machine2Jobgroup.id.desc()).all()
+        query = query.order_by(Machine2Jobgroup.id.desc())
     else:
-        return query.order_by(Machine2Jobgroup.id.asc()).all()
+        query = query.order_by(Machine2Jobgroup.id.asc())
+
+    if as_query is True:
+        return query
+    return query.all()
 
 def findbyguest(session, guest_id, created_start=None,
-              created_end=None, created_user_id=None, desc=False):
+              created_end=None, created_user_id=None, desc=False,
+              as_query=False, jobgroup_type=None, jobgroup_status=None):
 
     query = session.query(Machine).add_entity(Machine2Jobgroup).join(Machine2Jobgroup)
 
@@ -107,10 +144,16 @@ def findbyguest(session, guest_id, created_start=None,
     elif (not created_start) and created_end:
         query = query.filter(Machine2Jobgroup.created <= created_end)
         
+    query = _filter_jobgroup(query, jobgroup_type, jobgroup_status)
+
     if desc is True:
-        return query.order_by(Machine2Jobgroup.id.desc()).all()
+        query = query.order_by(Machine2Jobgroup.id.desc())
     else:
-        return query.order_by(Machine2Jobgroup.id.asc()).all()
+        query = query.order_by(Machine2Jobgroup.id.asc())
+
+    if as_query is True:
+        return query
+    return query.all()
 
 
 def findbyjobgroup_id1(session, jobgroup_id):
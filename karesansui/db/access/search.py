@@ -27,8 +27,27 @@
 from sqlalchemy import and_, or_
 
 from karesansui.lib.utils import detect_encoding
+from karesansui.lib.const import SEARCH_RESULT_LIMIT
+from karesansui.db.searchindex import get_search_index
 
-def findbyand(session, query, model, attr, desc=False):
+def _search_index_query(session, model, kind, terms, desc):
+    """<comment-ja>
+    検索インデックスで検索するQueryを返却します。
+    @return: sqlalchemy.orm.query.Query、インデックスを使えない場合はNone
+    </comment-ja>
+    <comment-en>
+    Return the ranked Query of model through the search index, or None
+    when the database has no index or a term is too short for it.
+    </comment-en>
+    """
+    if kind is None:
+        return None
+    index = get_search_index(session.bind)
+    if index is None:
+        return None
+    return index.search(session.query(model), model, kind, terms, desc)
+
+def findbyand(session, query, model, attr, desc=False, as_query=False, kind=None):
     """
     <comment-ja>
     指定したテーブルとテーブル属性で、
@@ -39,14 +58,24 @@ def findbyand(session, query, model, attr, desc=False):
     @param query: 検索文字列のリスト
     @param model: 検索するテーブルのオブジェクト
     @param attr: 検索するテーブル属性のオブジェクト
+    @param as_query: Trueの場合はリストではなくQueryを返却します。
+    @param kind: 検索インデックスの文書の種類 ('machine', 'tag')
     @return: 検索結果のリスト
     </comment-ja>
     <comment-en>
-    TODO: English Comment
+    With kind, the search index is used when the database has one: the
+    results are ranked, and at most SEARCH_RESULT_LIMIT are returned as a
+    list. Otherwise attr are searched with LIKE.
     </comment-en>
     """
     query = query.split()
 
+    indexed = _search_index_query(session, model, kind, query, desc)
+    if indexed is not None:
+        if as_query is True:
+            return indexed
+        return indexed.limit(SEARCH_RESULT_LIMIT).all()
+
     and_clause = and_()
     for q in query:
         #q = unicode(q, detect_encoding(q))
@@ -55,12 +84,21 @@ def findbyand(session, query, model, attr, desc=False):
             or_clause.append(a.like("%"+q+"%"))
         and_clause.append(or_clause)
     
+    query = session.query(model).filter(and_clause)
     if desc is True:
-        return session.query(model).filter(and_clause).order_by(model.id.desc()).all()
+        query = query.order_by(model.id.desc())
     else:
-        return session.query(model).filter(and_clause).order_by(model.id.asc()).all()
+        query = query.order_by(model.id.asc())
+
+    if as_query is True:
+        return query
+    return query.all()
+
+def findbyor(session, query, model, attrs, desc=False, kind=None):
+    indexed = _search_index_query(session, model, kind, [query], desc)
+    if indexed is not None:
+        return indexed.limit(SEARCH_RESULT_LIMIT).all()
 
-def findbyor(session, query, model, attrs, desc=False):
     or_clause = or_()
     for x in attrs:
         or_clause.append(x.like("%"+query+"%"))
@@ -31,7 +31,7 @@ from karesansui.db.access import dbsave, dbupdate, dbdelete
 from karesansui.db.access.search import findbyand as _findbyand
 
 # -- all
-def findbyall(session):
+def findbyall(session, as_query=False):
     """<comment-ja>
     すべてのタグ情報を取得します。
     @param session: Session
@@ -43,7 +43,10 @@ def findbyall(session):
     TODO: English Comment
     </comment-en>
     """
-    return session.query(Tag).all()
+    query = session.query(Tag)
+    if as_query is True:
+        return query.order_by(Tag.id.asc())
+    return query.all()
 
 def findby1(session, tag_id):
     """<comment-ja>
@@ -82,7 +85,7 @@ def findby1name(session, tag_name):
     else:
         return None
 
-def findbyand(session, query):
+def findbyand(session, query, as_query=False):
     """<comment-ja>
     クエリー条件のAND検索で、多数のユーザ情報を取得します。
     @param session: Session
@@ -95,7 +98,7 @@ def findbyand(session, query):
     TODO: English Comment
     </comment-en>
     """
-    return _findbyand(session, query, Tag, [Tag.name])
+    return _findbyand(session, query, Tag, [Tag.name], as_query=as_query, kind='tag')
 
 # -- host
 def findbyhostall(session, is_deleted=False):
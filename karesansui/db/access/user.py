@@ -23,16 +23,19 @@
 # THE SOFTWARE.
 #
 
+import sqlalchemy.event
+from sqlalchemy.orm import scoped_session
 from sqlalchemy.orm.exc import NoResultFound
 
 from karesansui.lib.crypt import sha1compare
+from karesansui.lib.auth_cache import invalidate_auth_cache
 from karesansui.db.model.user import User
 from karesansui.db.access import dbsave, dbupdate, dbdelete
 from karesansui.db.access.search import findbyand as _findbyand
 
 from karesansui import KaresansuiDBException
 
-def findbyall(session):
+def findbyall(session, as_query=False):
     """<comment-ja>
     ユーザを全て取得します。
     @param session: Session
@@ -42,7 +45,10 @@ def findbyall(session):
     TODO: English Comment
     </comment-en>
     """
-    return session.query(User).all()
+    query = session.query(User)
+    if as_query is True:
+        return query.order_by(User.id.asc())
+    return query.all()
 
 def findby1(session, id):
     """<comment-ja>
@@ -87,7 +93,7 @@ def findbyname_BM(session, nickname):
     return session.query(User).filter(User.nickname.like("%%%s%%" % nickname)).all()
     
 
-def findbyand(session, query):
+def findbyand(session, query, as_query=False):
     """<comment-ja>
     クエリー条件のAND検索で、多数のユーザ情報を取得します。
     @param session: Session
@@ -100,19 +106,46 @@ def findbyand(session, query):
     TODO: English Comment
     </comment-en>
     """
-    return _findbyand(session, query, User, [User.nickname, User.email])
+    return _findbyand(session, query, User, [User.nickname, User.email], as_query=as_query)
 
 @dbsave
 def save(session, user):
     session.add(user)
 
+def _after_commit(session):
+    if session.info.pop("invalidate_auth_cache", False) is True:
+        invalidate_auth_cache()
+
+def _after_rollback(session):
+    session.info.pop("invalidate_auth_cache", None)
+
+def _invalidate_auth_cache(session):
+    """<comment-ja>
+    認証キャッシュを無効にします。セッションのCOMMIT後にも再度無効にします。
+    </comment-ja>
+    <comment-en>
+    Drop the cached users now and once more when session commits: a
+    request reading the user before the commit may cache the old row
+    under the stamp of the first invalidation.
+    </comment-en>
+    """
+    invalidate_auth_cache()
+    if isinstance(session, scoped_session):
+        session = session()
+    if not sqlalchemy.event.contains(session, "after_commit", _after_commit):
+        sqlalchemy.event.listen(session, "after_commit", _after_commit)
+        sqlalchemy.event.listen(session, "after_rollback", _after_rollback)
+    session.info["invalidate_auth_cache"] = True
+
 @dbupdate
 def update(session, user):
     session.add(user)
+    _invalidate_auth_cache(session)
     
 @dbdelete
 def delete(session, user):
     session.delete(user)
+    _invalidate_auth_cache(session)
 
 def new(email, password, salt, nickname, languages=None):
     return User(email, password, salt, nickname, languages)
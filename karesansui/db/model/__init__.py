@@ -97,11 +97,17 @@ def reload_mappers(metadata):
     import karesansui.db.model.machine2jobgroup
     karesansui.db.model.machine2jobgroup.reload_mapper(metadata, _now)
 
+    import karesansui.db.model.jobgroupsummary
+    karesansui.db.model.jobgroupsummary.reload_mapper(metadata, _now)
+
     import karesansui.db.model.watch
     karesansui.db.model.watch.reload_mapper(metadata, _now)
 
     import karesansui.db.model.option
     karesansui.db.model.option.reload_mapper(metadata, _now)
 
+    import karesansui.db.searchindex
+    karesansui.db.searchindex.listen()
+
 if __name__ == '__main__':
     pass
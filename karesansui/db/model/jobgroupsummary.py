@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui Core.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+
+import sqlalchemy
+from sqlalchemy.orm import mapper
+import karesansui.db.model
+
+def get_jobgroupsummary_table(metadata, now):
+    """<comment-ja>
+    (JobgroupSummary)のテーブル定義を返却します。
+    @param metadata: MetaData
+    @type metadata: sqlalchemy.schema.MetaData
+    @param now: now
+    @type now: Datatime
+    @return: sqlalchemy.schema.Table
+    </comment-ja>
+    <comment-en>
+    Return the definition of the jobgroupsummary table.
+    </comment-en>
+    """
+    return sqlalchemy.Table('jobgroupsummary', metadata,
+                            # PySilhouette
+                            sqlalchemy.Column('jobgroup_id', sqlalchemy.Integer,
+                                              primary_key=True,
+                                              autoincrement=False,
+                                              ),
+                            sqlalchemy.Column('type', sqlalchemy.Integer,
+                                              nullable=False,
+                                              ),
+                            sqlalchemy.Column('status', sqlalchemy.Unicode(8),
+                                              nullable=False,
+                                              index=True,
+                                              ),
+                            sqlalchemy.Column('modified', sqlalchemy.DateTime,
+                                              default=now,
+                                              onupdate=now,
+                                              ),
+                            )
+
+class JobgroupSummary(karesansui.db.model.Model):
+    """<comment-ja>
+    jobgroupsummaryテーブルモデルクラス
+    PySilhouetteのJobGroupの種類と状態をKaresansuiのデータベースに複製します。
+    </comment-ja>
+    <comment-en>
+    Copy of the type and status of a PySilhouette JobGroup, kept in the
+    Karesansui database so that the job lists can filter, order and page
+    machine2jobgroup in one query.
+    </comment-en>
+    """
+
+    def __init__(self, jobgroup_id, type, status):
+        """<comment-ja>
+        @param jobgroup_id: ジョブグループID
+        @type jobgroup_id: int
+        @param type: ジョブグループの種類 JOBGROUP_TYPE
+        @type type: int
+        @param status: ジョブグループの状態 JOBGROUP_STATUS
+        @type status: str
+        </comment-ja>
+        <comment-en>
+        TODO: English Comment
+        </comment-en>
+        """
+        self.jobgroup_id = jobgroup_id
+        self.type = type
+        self.status = status
+
+    def __repr__(self):
+        return "JobgroupSummary<'%d, %s, %s'>" % (self.jobgroup_id, self.type, self.status)
+
+def reload_mapper(metadata, now):
+    """<comment-ja>
+    JobgroupSummary(Model)のマッパーをリロードします。
+    @param metadata: リロードしたいMetaData
+    @type metadata: sqlalchemy.schema.MetaData
+    @param now: now
+    @type now: Datatime
+    </comment-ja>
+    <comment-en>
+    TODO: English Comment
+    </comment-en>
+    """
+    t_jobgroupsummary = get_jobgroupsummary_table(metadata, now)
+    mapper(JobgroupSummary, t_jobgroupsummary)
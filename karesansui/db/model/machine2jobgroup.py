@@ -71,6 +71,14 @@ def get_machine2jobgroup_table(metadata, now):
                                               default=now,
                                               onupdate=now,
                                               ),
+                            sqlalchemy.Index('machine2jobgroup_jobgroup_id_idx',
+                                             'jobgroup_id'),
+                            sqlalchemy.Index('machine2jobgroup_machine_id_idx',
+                                             'machine_id', 'id'),
+                            sqlalchemy.Index('machine2jobgroup_created_idx',
+                                             'created'),
+                            sqlalchemy.Index('machine2jobgroup_created_user_id_idx',
+                                             'created_user_id', 'created'),
                             )
 
 class Machine2Jobgroup(karesansui.db.model.Model):
@@ -143,6 +143,10 @@ def get_watch_table(metadata, now):
                                               default=now,
                                               onupdate=now,
                                               ),
+                            sqlalchemy.Index('watch_plugin_selector_idx',
+                                             'plugin', 'plugin_selector',
+                                             mysql_length={'plugin_selector': 255},
+                                             ),
                             )
 
 class Watch(karesansui.db.model.Model):
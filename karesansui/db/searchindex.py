@@ -0,0 +1,349 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui Core.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+"""
+<comment-ja>
+マシン・タグの全文検索インデックス
+</comment-ja>
+<comment-en>
+Full-text search index of machines and tags.
+
+One document is kept per machine (name, hostname, tag names, notebook
+title and value) and per tag (name) in the table search_index:
+
+ sqlite     : an FTS5 virtual table with the trigram tokenizer,
+              ranked by bm25.
+ postgresql : a table with a pg_trgm GIN index, ranked by similarity().
+
+Other databases have no index, and the callers in
+karesansui.db.access.search fall back to LIKE.
+
+prepare_search_index() creates and fills the table; it is called when the
+application starts and when the database is initialized. Afterwards the
+documents are kept up to date by an after_flush hook on the ORM session,
+which rewrites the documents of the machines, tags and notebooks flushed.
+</comment-en>
+"""
+
+import logging
+import threading
+
+import sqlalchemy
+import sqlalchemy.exc
+import sqlalchemy.event
+import sqlalchemy.orm
+from sqlalchemy import select, and_, func, literal_column, Table, \
+     Column, Integer, String, Text, MetaData
+from sqlalchemy.orm import class_mapper
+
+logger = logging.getLogger('karesansui.db.searchindex')
+
+SEARCH_INDEX_TABLE = "search_index"
+
+# document kinds and their codes in the document id.
+SEARCH_INDEX_KINDS = {"machine": 1, "tag": 2}
+
+class SearchIndex:
+    """<comment-ja>
+    検索インデックスのテーブル
+    </comment-ja>
+    <comment-en>
+    The search_index table, a plain table matched with ILIKE. The backends
+    change how it is created and how the terms are matched and ranked.
+    </comment-en>
+    """
+
+    id_column = "id"
+    #: shortest term the index can look up.
+    min_term_length = 1
+
+    def __init__(self):
+        self.table = Table(SEARCH_INDEX_TABLE, MetaData(),
+                           Column(self.id_column, Integer, primary_key=True),
+                           Column('kind', String(16)),
+                           Column('ref', Integer),
+                           Column('body', Text))
+
+    def docid(self, kind, ref):
+        return ref * 4 + SEARCH_INDEX_KINDS[kind]
+
+    def exists(self, connection):
+        return connection.dialect.has_table(connection, SEARCH_INDEX_TABLE)
+
+    def create(self, connection):
+        self.table.create(connection)
+
+    def clear(self, connection):
+        connection.execute(self.table.delete())
+
+    def put(self, connection, kind, documents):
+        """<comment-ja>
+        文書を登録します。
+        @param documents: (ID, 本文)のリスト
+        </comment-ja>
+        <comment-en>
+        Replace the documents of kind, given as a list of (ref, body).
+        </comment-en>
+        """
+        if not documents:
+            return
+        self.remove(connection, kind, [ref for (ref, body) in documents])
+        connection.execute(self.table.insert(),
+                           [{self.id_column: self.docid(kind, ref),
+                             "kind": kind, "ref": ref, "body": body}
+                            for (ref, body) in documents])
+
+    def remove(self, connection, kind, refs):
+        id_column = self.table.c[self.id_column]
+        refs = list(refs)
+        for offset in range(0, len(refs), 500):
+            connection.execute(self.table.delete().where(
+                id_column.in_([self.docid(kind, ref) for ref in refs[offset:offset + 500]])))
+
+    def search(self, query, model, kind, terms, desc=False):
+        """<comment-ja>
+        Queryに検索条件と順位での並び替えを追加します。
+        @return: sqlalchemy.orm.query.Query、インデックスで検索できない場合はNone
+        </comment-ja>
+        <comment-en>
+        Return query joined to the documents of kind that contain all
+        terms, best matches first (then by id), or None if a term is too
+        short for the index.
+        </comment-en>
+        """
+        if not terms or [t for t in terms if len(t) < self.min_term_length]:
+            return None
+        query = query.join(self.table, and_(self.table.c.ref == model.id,
+                                            self.table.c.kind == kind))
+        query = self.match(query, terms)
+        if desc is True:
+            return query.order_by(model.id.desc())
+        return query.order_by(model.id.asc())
+
+    def match(self, query, terms):
+        for t in terms:
+            query = query.filter(self.table.c.body.ilike("%" + t + "%"))
+        return query
+
+class SqliteSearchIndex(SearchIndex):
+
+    id_column = "rowid"
+    min_term_length = 3
+
+    def create(self, connection):
+        connection.execute(sqlalchemy.text(
+            "CREATE VIRTUAL TABLE %s USING fts5"
+            "(kind UNINDEXED, ref UNINDEXED, body, tokenize='trigram')" % SEARCH_INDEX_TABLE))
+
+    def match(self, query, terms):
+        expression = " ".join(['"%s"' % t.replace('"', '""') for t in terms])
+        return query.filter(literal_column(SEARCH_INDEX_TABLE).op("MATCH")(expression)) \
+                    .order_by(literal_column("%s.rank" % SEARCH_INDEX_TABLE))
+
+class PostgresqlSearchIndex(SearchIndex):
+
+    def create(self, connection):
+        connection.execute(sqlalchemy.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        SearchIndex.create(self, connection)
+        connection.execute(sqlalchemy.text(
+            "CREATE INDEX %s_body ON %s USING gin (body gin_trgm_ops)"
+            % (SEARCH_INDEX_TABLE, SEARCH_INDEX_TABLE)))
+
+    def match(self, query, terms):
+        query = SearchIndex.match(self, query, terms)
+        return query.order_by(func.similarity(self.table.c.body, " ".join(terms)).desc())
+
+SEARCH_INDEX_BACKENDS = {"sqlite": SqliteSearchIndex,
+                         "postgresql": PostgresqlSearchIndex}
+
+# search index of each database url, None when it is not available.
+_search_indexes = {}
+_search_indexes_lock = threading.Lock()
+
+def get_search_index(bind):
+    """<comment-ja>
+    データベースの検索インデックスを返します。
+    @param bind: sqlalchemy.engine.Engine または Connection
+    @return: SearchIndex、利用できない場合はNone
+    </comment-ja>
+    <comment-en>
+    Return the SearchIndex of the database of bind, or None if the
+    database has none. Whether the table exists is checked once per
+    process.
+    </comment-en>
+    """
+    if bind is None:
+        return None
+    url = str(bind.engine.url)
+    if url in _search_indexes:
+        return _search_indexes[url]
+
+    index = None
+    backend = SEARCH_INDEX_BACKENDS.get(bind.engine.name)
+    if backend is not None:
+        index = backend()
+        try:
+            if index.exists(bind) is False:
+                index = None
+        except sqlalchemy.exc.DBAPIError as e:
+            logger.warning('Failed to look up the search index - %s' % str(e))
+            index = None
+    _search_indexes_lock.acquire()
+    try:
+        _search_indexes[url] = index
+    finally:
+        _search_indexes_lock.release()
+    return index
+
+def _join_body(values):
+    return "\n".join([v for v in values if v])
+
+def _tables():
+    from karesansui.db.model.machine import Machine
+    tables = class_mapper(Machine).local_table.metadata.tables
+    return (tables['machine'], tables['notebook'], tables['tag'], tables['machine2tag'])
+
+def _machine_documents(connection, machine_ids=None):
+    (t_machine, t_notebook, t_tag, t_m2t) = _tables()
+    machines = select([t_machine.c.id, t_machine.c.name, t_machine.c.hostname,
+                       t_notebook.c.title, t_notebook.c.value],
+                      from_obj=[t_machine.outerjoin(t_notebook,
+                                                    t_machine.c.notebook_id == t_notebook.c.id)])
+    tags = select([t_m2t.c.machine_id, t_tag.c.name],
+                  from_obj=[t_m2t.join(t_tag, t_m2t.c.tag_id == t_tag.c.id)])
+    if machine_ids is not None:
+        machines = machines.where(t_machine.c.id.in_(machine_ids))
+        tags = tags.where(t_m2t.c.machine_id.in_(machine_ids))
+
+    tag_names = {}
+    for (machine_id, name) in connection.execute(tags):
+        tag_names.setdefault(machine_id, []).append(name)
+    return [(row[0], _join_body([row[1], row[2]] + tag_names.get(row[0], []) + [row[3], row[4]]))
+            for row in connection.execute(machines)]
+
+def _tag_documents(connection, tag_ids=None):
+    t_tag = _tables()[2]
+    tags = select([t_tag.c.id, t_tag.c.name])
+    if tag_ids is not None:
+        tags = tags.where(t_tag.c.id.in_(tag_ids))
+    return [(row[0], _join_body([row[1]])) for row in connection.execute(tags)]
+
+def prepare_search_index(engine, rebuild=False):
+    """<comment-ja>
+    検索インデックスを作成します。
+    @param engine: sqlalchemy.engine.Engine
+    @param rebuild: Trueの場合は既存のインデックスも作り直します。
+    @return: SearchIndex、利用できない場合はNone
+    </comment-ja>
+    <comment-en>
+    Create the search index of engine's database when it is missing and
+    fill it with every machine and tag; with rebuild, refill an existing
+    one. Returns the SearchIndex, or None if the database cannot have one.
+    </comment-en>
+    """
+    backend = SEARCH_INDEX_BACKENDS.get(engine.name)
+    if backend is None:
+        return None
+    index = backend()
+    connection = engine.connect()
+    trans = connection.begin()
+    try:
+        if index.exists(connection) is False:
+            index.create(connection)
+            rebuild = True
+        if rebuild is True:
+            index.clear(connection)
+            index.put(connection, "machine", _machine_documents(connection))
+            index.put(connection, "tag", _tag_documents(connection))
+        trans.commit()
+    except sqlalchemy.exc.DBAPIError as e:
+        trans.rollback()
+        logger.warning('The search index is not available - %s' % str(e))
+        index = None
+    finally:
+        connection.close()
+
+    _search_indexes_lock.acquire()
+    try:
+        _search_indexes[str(engine.url)] = index
+    finally:
+        _search_indexes_lock.release()
+    return index
+
+def _after_flush(session, flush_context):
+    from karesansui.db.model.machine import Machine
+    from karesansui.db.model.notebook import Notebook
+    from karesansui.db.model.tag import Tag
+
+    machine_ids = set()
+    tag_ids = set()
+    notebook_ids = set()
+    for obj in session.new | session.dirty:
+        if isinstance(obj, Machine):
+            machine_ids.add(obj.id)
+        elif isinstance(obj, Tag):
+            tag_ids.add(obj.id)
+        elif isinstance(obj, Notebook):
+            notebook_ids.add(obj.id)
+    deleted_machine_ids = set([obj.id for obj in session.deleted if isinstance(obj, Machine)])
+    deleted_tag_ids = set([obj.id for obj in session.deleted if isinstance(obj, Tag)])
+    if not (machine_ids or tag_ids or notebook_ids or deleted_machine_ids or deleted_tag_ids):
+        return
+
+    connection = session.connection()
+    index = get_search_index(connection)
+    if index is None:
+        return
+
+    # machines whose tag or notebook has changed.
+    (t_machine, t_notebook, t_tag, t_m2t) = _tables()
+    if tag_ids:
+        machine_ids.update([row[0] for row in connection.execute(
+            select([t_m2t.c.machine_id]).where(t_m2t.c.tag_id.in_(tag_ids)))])
+    if notebook_ids:
+        machine_ids.update([row[0] for row in connection.execute(
+            select([t_machine.c.id]).where(t_machine.c.notebook_id.in_(notebook_ids)))])
+
+    machine_ids = machine_ids - deleted_machine_ids - set([None])
+    tag_ids = tag_ids - deleted_tag_ids - set([None])
+    index.remove(connection, "machine", deleted_machine_ids)
+    index.remove(connection, "tag", deleted_tag_ids)
+    if machine_ids:
+        index.put(connection, "machine", _machine_documents(connection, machine_ids))
+    if tag_ids:
+        index.put(connection, "tag", _tag_documents(connection, tag_ids))
+
+def listen(session_class=sqlalchemy.orm.Session):
+    """<comment-ja>
+    セッションのflush時に検索インデックスを更新するようにします。
+    </comment-ja>
+    <comment-en>
+    Hook the search index maintenance onto the flush of session_class.
+    Listening more than once has no further effect.
+    </comment-en>
+    """
+    if not sqlalchemy.event.contains(session_class, "after_flush", _after_flush):
+        sqlalchemy.event.listen(session_class, "after_flush", _after_flush)
@@ -444,13 +444,11 @@ class Guest(Rest):
                     host = MergeHost(self.kvc, model)
                     for guest in host.guests:
 
-                        _virt = self.kvc.search_kvg_guests(guest.info["model"].name)
-                        if 0 < len(_virt):
-                            for _v in _virt:
-                                uuid = _v.get_info()["uuid"]
-                                uri_guests_info[uuid] = guest.info
-                                uri_guests_kvg[uuid] = _v
-                                uri_guests_name[uuid] = guest.info["model"].name.encode("utf8")
+                        _v = guest.info["virt"]
+                        uuid = _v.inventory["uuid"]
+                        uri_guests_info[uuid] = guest.info
+                        uri_guests_kvg[uuid] = _v
+                        uri_guests_name[uuid] = guest.info["model"].name.encode("utf8")
 
                     for name in sorted(list(uri_guests_name.values()),key=str.lower):
                         for uuid in dict_search(name,uri_guests_name):
@@ -595,18 +593,22 @@ class Guest(Rest):
                 if models:
                     # Physical Guest Info
                     self.view.hypervisors = {}
+                    virt_mechs = available_virt_mechs()
+                    kvgs = None
                     for model in models:
                         for k,v in MACHINE_HYPERVISOR.items():
-                            if k in available_virt_mechs():
+                            if k in virt_mechs:
                                 self.view.hypervisors[k] = v
                                 uri = uris[k]
                                 if hasattr(self, "kvc") is not True:
                                     self.kvc = KaresansuiVirtConnection(uri)
-                                domname = self.kvc.uuid_to_domname(model.uniq_key)
-                                #if not domname: return web.conflict(web.ctx.path)
-                                _virt = self.kvc.search_kvg_guests(domname)
-                                if 0 < len(_virt):
-                                    guests.append(MergeGuest(model, _virt[0]))
+                                if kvgs is None:
+                                    kvgs = {}
+                                    for _virt in self.kvc.search_kvg_guests_by_inventory():
+                                        kvgs[_virt.inventory["uuid"]] = _virt
+                                #if not model.uniq_key in kvgs: return web.conflict(web.ctx.path)
+                                if model.uniq_key in kvgs:
+                                    guests.append(MergeGuest(model, kvgs[model.uniq_key]))
                                 else:
                                     guests.append(MergeGuest(model, None))
 
@@ -40,10 +40,10 @@ from karesansui.lib.checker import Checker,\
 from karesansui.lib.const import JOB_LIST_RANGE, DEFAULT_LANGS,\
     USER_MIN_LENGTH, USER_MAX_LENGTH,\
     ID_MIN_LENGTH, ID_MAX_LENGTH, \
-    MACHINE_HYPERVISOR
+    MACHINE_HYPERVISOR, PAGER_COUNT_CACHE_TTL
 
 from karesansui.db.access.machine import findbyguest1
-from karesansui.db.access._2pysilhouette import jg_findbyalltype
+from karesansui.db.access._2pysilhouette import jg_findbyalltype, sync_jobgroup_summary
 from karesansui.db.access.machine_machine2jobgroup import findbyguest as m2mj_findbyguest
 from karesansui.db.access.user import findbyname_BM
 from karesansui.db.model._2pysilhouette import JOBGROUP_STATUS, JOBGROUP_TYPE
@@ -70,6 +70,16 @@ class GuestBy1Job(Rest):
         if check is False:
             return web.badrequest(self.view.alert)
 
+        if ('p' in self.input) is True:
+            if validates_page(self) is True:
+                page = int(self.input.p)
+            else:
+                return web.badrequest(self.view.alert)
+        else:
+            page = 0
+
+        sync_jobgroup_summary(self.orm, self.pysilhouette.orm)
+
         if edit is True:
             # user search
             users = findbyname_BM(self.orm, self.input.user)
@@ -88,68 +98,59 @@ class GuestBy1Job(Rest):
                 end = str2datetime(self.input.end,
                                    DEFAULT_LANGS[self.me.languages]['DATE_FORMAT'][0],True)
 
-            # machine search
-            m_m2js = m2mj_findbyguest(self.orm,
-                           guest_id,
-                           start,
-                           end,
-                           users_id,
-                           )
-            if not m_m2js:
+            jobgroup_status = self.input.status
+            if is_empty(jobgroup_status):
+                jobgroup_status = None
+
+            # machine and jobgroup search
+            pager = Pager(m2mj_findbyguest(self.orm,
+                                           guest_id,
+                                           start,
+                                           end,
+                                           users_id,
+                                           True,
+                                           as_query=True,
+                                           jobgroup_type=JOBGROUP_TYPE["SERIAL"],
+                                           jobgroup_status=jobgroup_status,
+                                           ),
+                          page, JOB_LIST_RANGE, PAGER_COUNT_CACHE_TTL)
+            if pager.get_total() == 0:
                 self.logger.debug("Search m_m2js failed. "
                                   "Did not exist m_m2js that in accord with these query. "
-                                  "guest_id %s, start %s, end %s, users_id %s" % (guest_id, start, end, users_id))
+                                  "guest_id %s, start %s, end %s, users_id %s, jobgroup_status %s" \
+                                  % (guest_id, start, end, users_id, jobgroup_status))
                 return web.nocontent()
             
-            self.view.m_m2js = m_m2js
             self.view.user   = self.input.user
             self.view.status = self.input.status
             self.view.start  = self.input.start
             self.view.end    = self.input.end
-
-            jobgroup_ids = []
-            for m_m2j in m_m2js:
-                jobgroup_ids.append(m_m2j[1].jobgroup_id)
-
-            jobgroup_status = self.input.status
-            if is_empty(jobgroup_status):
-                jobgroup_status = None
-            jobgroups = jg_findbyalltype(self.pysilhouette.orm, JOBGROUP_TYPE["SERIAL"],
-                                         jobgroup_ids, jobgroup_status, desc=True)
-            if not jobgroups:
-                self.logger.debug("Search jobgroups failed. "
-                                  "Did not exist jobgroups that in accord with these query."
-                                  "jobgroup_ids %s, jobgroup_status %s" % (jobgroup_ids, jobgroup_status))
-                return web.nocontent()
         else:
-            m_m2js = m2mj_findbyguest(self.orm, guest_id)
+            pager = Pager(m2mj_findbyguest(self.orm, guest_id, desc=True, as_query=True,
+                                           jobgroup_type=JOBGROUP_TYPE["SERIAL"]),
+                          page, JOB_LIST_RANGE, PAGER_COUNT_CACHE_TTL)
 
-            self.view.m_m2js = m_m2js
             self.view.user   = ''
             self.view.status = ''
             self.view.start  = ''
             self.view.end    = ''
 
-            jobgroup_ids = []
-            for m_m2j in m_m2js:
-                 jobgroup_ids.append(m_m2j[1].jobgroup_id)
+        # load the jobgroups of the page only.
+        m_m2js = pager.get_displays()
+        self.view.m_m2js = m_m2js
+
+        jobgroup_ids = []
+        for m_m2j in m_m2js:
+             jobgroup_ids.append(m_m2j[1].jobgroup_id)
 
-            jobgroups = jg_findbyalltype(self.pysilhouette.orm, JOBGROUP_TYPE["SERIAL"],
-                         jobgroup_ids, desc=True)
+        pager.displays = jg_findbyalltype(self.pysilhouette.orm, JOBGROUP_TYPE["SERIAL"],
+                                          jobgroup_ids, desc=True)
 
         self.view.JOBGROUP_STATUS = JOBGROUP_STATUS
         self.view.HYPERVISOR = MACHINE_HYPERVISOR
 
-        if ('p' in self.input) is True:
-            if validates_page(self) is True:
-                start = int(self.input.p)
-            else:
-                return web.badrequest(self.view.alert)
-
-        else:
-            start = 0
         self.view.date_format = DEFAULT_LANGS[self.me.languages]['DATE_FORMAT'][1]
-        self.view.pager = Pager(jobgroups, start, JOB_LIST_RANGE)
+        self.view.pager = pager
 
         return True
 
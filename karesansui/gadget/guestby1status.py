@@ -109,14 +109,17 @@ class GuestBy1Status(Rest):
         # virt
         kvc = KaresansuiVirtConnection()
         try:
-            domname = kvc.uuid_to_domname(model.uniq_key)
-            if not domname: return web.conflict(web.ctx.path)
-            virt = kvc.search_kvg_guests(domname)
+            status = kvc.get_domain_state(model.uniq_key)
+            if status is None:
+                domname = kvc.uuid_to_domname(model.uniq_key)
+                if not domname: return web.conflict(web.ctx.path)
+                virt = kvc.search_kvg_guests(domname)
+                status = virt[0].status()
             
             if self.__template__["media"] == 'json':
-                self.view.status = json_dumps(virt[0].status())
+                self.view.status = json_dumps(status)
             else:
-                self.view.status = virt[0].status()
+                self.view.status = status
                 
         finally:
             kvc.close()
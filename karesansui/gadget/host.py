@@ -31,6 +31,7 @@ from karesansui.lib.rest import Rest, auth
 from karesansui.lib.utils import generate_uuid, string_from_uuid, \
      uni_force, is_param, comma_split, uniq_sort, uri_split, uri_join
 
+from karesansui.lib.search import validates_query
 from karesansui.lib.checker import Checker, \
     CHECK_EMPTY, CHECK_LENGTH, CHECK_ONLYSPACE, CHECK_VALID, \
     CHECK_MIN, CHECK_MAX
@@ -45,7 +46,7 @@ from karesansui.lib.const import \
     USER_MIN_LENGTH, USER_MAX_LENGTH
 
 from karesansui.db.access.machine import \
-     findbyhostall, findby1uniquekey, findby1hostname, \
+     findbyhostall, findbyhostand, findby1uniquekey, findby1hostname, \
      new as m_new, save as m_save, update as m_update
 from karesansui.db.access.tag import new as t_new, \
      samecount as t_count, findby1name as t_name
@@ -176,7 +177,13 @@ class Host(Rest):
         if self.is_mode_input():
             return True
         else:
-            self.view.hosts = findbyhostall(self.orm)
+            if not validates_query(self):
+                return web.badrequest(self.view.alert)
+
+            if is_param(self.input, 'q') is True:
+                self.view.hosts = findbyhostand(self.orm, self.input.q)
+            else:
+                self.view.hosts = findbyhostall(self.orm)
             self.view.application_uniqkey = karesansui.config['application.uniqkey']
             if ('job_id' in self.input) is True:
                 self.view.job_id = self.input.job_id
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#
+
+import web
+
+from karesansui.lib.rest import Rest, auth
+from karesansui.lib.virt.virt import KaresansuiVirtConnection
+from karesansui.lib.const import GUEST_STATUS_WAIT_TIMEOUT
+from karesansui.lib.utils import json_dumps, is_param, is_int
+
+from karesansui.db.access.machine import findbyhost1guestall
+
+class HostBy1GuestStatus(Rest):
+
+    @auth
+    def _GET(self, *param, **params):
+        """<comment-ja>
+        ゲストOSの状態(virDomainState)を返す。
+         - param
+           - serial = 前回の応答のシリアル番号 (省略時は全ゲスト)
+           - timeout = 状態変化を待つ最大秒数 (省略時は待たない)
+        状態変化があるか timeout 秒経過するまで応答を保留する(long-poll)。
+        ドメインイベントの監視が無効の場合は、その時点の全ゲストの状態を serial=-1 で返す。
+        </comment-ja>
+        <comment-en>
+        Return the state (virDomainState) of guests.
+         - param
+           - serial = serial number of the last response (all guests if omitted)
+           - timeout = maximum seconds to wait for state changes (no wait if omitted)
+        The response is held until any guest changes its state or timeout
+        seconds elapse (long-poll).
+        If domain event monitoring is disabled, the current state of all
+        guests is returned at once with serial=-1.
+        </comment-en>
+        """
+        host_id = self.chk_hostby1(param)
+        if host_id is None: return web.notfound()
+
+        serial = 0
+        if is_param(self.input, 'serial') and is_int(self.input.serial):
+            serial = int(self.input.serial)
+
+        timeout = 0
+        if is_param(self.input, 'timeout') and is_int(self.input.timeout):
+            timeout = min(max(int(self.input.timeout), 0), GUEST_STATUS_WAIT_TIMEOUT)
+
+        guest_ids = {}
+        for model in findbyhost1guestall(self.orm, host_id):
+            guest_ids[model.uniq_key] = model.id
+
+        states = {}
+        kvc = KaresansuiVirtConnection()
+        try:
+            if kvc.get_domain_states() is None:
+                serial = -1
+                for _virt in kvc.search_kvg_guests_by_inventory():
+                    states[_virt.inventory["uuid"]] = _virt.inventory["state"]
+        finally:
+            kvc.close()
+
+        # the libvirt connection is not held while waiting.
+        if serial >= 0:
+            result = kvc.wait_domain_state_changes(serial, timeout)
+            if result is None:
+                # event connection was lost, the client should start over.
+                serial = 0
+            else:
+                (serial, changes) = result
+                for uuid, entry in changes.items():
+                    states[uuid] = entry["state"]
+
+        guests = {}
+        for uuid, state in states.items():
+            if uuid in guest_ids:
+                guests[guest_ids[uuid]] = state
+
+        self.view.status = json_dumps({"serial" : serial,
+                                       "guests" : guests,
+                                       })
+        return True
+
+urls = (
+    '/host/(\d+)/guest/status/?(\.json)$', HostBy1GuestStatus,
+    )
@@ -28,7 +28,7 @@ import datetime
 import time
 
 import karesansui
-from karesansui.lib.rest import Rest, auth, OUTPUT_TYPE_FILE
+from karesansui.lib.rest import Rest, auth, OUTPUT_TYPE_STREAM
 from karesansui.lib.utils import is_param, is_empty, \
     str2datetime, create_epochsec, remove_file
 from karesansui.lib.rrd.rrd import RRD
@@ -72,6 +72,84 @@ def validates_report(obj):
     obj.view.alert = checker.errors
     return check
 
+def get_report_period(obj):
+    """<comment-ja>
+    リクエストから取得期間(エポック秒)を返します。
+    </comment-ja>
+    <comment-en>
+    Return (start_time, end_time) of a report request in epoch seconds.
+    </comment-en>
+    """
+    today = datetime.datetime.today()
+
+    if is_param(obj.input, 'report_start_day') and not is_empty(obj.input.report_start_day):
+        start_day = str2datetime(obj.input.report_start_day,
+                                 DEFAULT_LANGS[obj.me.languages]['DATE_FORMAT'][0])
+    else:
+        start_day = today - datetime.timedelta(1)
+
+    if is_param(obj.input, 'report_start_time') and not is_empty(obj.input.report_start_time):
+        (start_hour, start_minute) = obj.input.report_start_time.split(':',2)
+        start_hour = int(start_hour)
+        start_minute = int(start_minute)
+    else:
+        start_hour = today.hour
+        start_minute = today.minute
+
+    if is_param(obj.input, 'report_end_day') and not is_empty(obj.input.report_end_day):
+        end_day = str2datetime(obj.input.report_end_day,
+                                 DEFAULT_LANGS[obj.me.languages]['DATE_FORMAT'][0])
+    else:
+        end_day = today
+
+    if is_param(obj.input, 'report_end_time') and not is_empty(obj.input.report_end_time):
+        (end_hour, end_minute) = obj.input.report_end_time.split(':', 2)
+        end_hour = int(end_hour)
+        end_minute = int(end_minute)
+
+    else:
+        end_hour = today.hour
+        end_minute = today.minute
+
+    start_time = create_epochsec(start_day.year,
+                                 start_day.month,
+                                 start_day.day,
+                                 start_hour,
+                                 start_minute,
+                                 )
+
+    end_time = create_epochsec(end_day.year,
+                               end_day.month,
+                               end_day.day,
+                               end_hour,
+                               end_minute,
+                               )
+    return (start_time, end_time)
+
+def get_report_options(obj):
+    """<comment-ja>
+    リクエストから種類、ホスト、libvirtのターゲットを返します。
+    </comment-ja>
+    <comment-en>
+    Return (type, host, libvirt_target) of a report request.
+    </comment-en>
+    """
+    if is_param(obj.input, 'type') and not is_empty(obj.input.type):
+        type = obj.input.type
+    else:
+        type = "default"
+
+    if is_param(obj.input, 'host') and not is_empty(obj.input.host):
+        host = obj.input.host
+    else:
+        host = None
+
+    if is_param(obj.input, 'libvirt_target') and not is_empty(obj.input.libvirt_target):
+        libvirt_target = obj.input.libvirt_target
+    else:
+        libvirt_target = None
+    return (type, host, libvirt_target)
+
 class HostBy1ReportBy1By1(Rest):
 
     @auth
@@ -89,68 +167,12 @@ class HostBy1ReportBy1By1(Rest):
             self.logger.debug("Get report failed. Did not validate.")
             return web.badrequest(self.view.alert)
 
-        today = datetime.datetime.today()
-
-        if is_param(self.input, 'report_start_day') and not is_empty(self.input.report_start_day):
-            start_day = str2datetime(self.input.report_start_day,
-                                     DEFAULT_LANGS[self.me.languages]['DATE_FORMAT'][0])
-        else:
-            start_day = today - datetime.timedelta(1)
-
-        if is_param(self.input, 'report_start_time') and not is_empty(self.input.report_start_time):
-            (start_hour, start_minute) = self.input.report_start_time.split(':',2)
-            start_hour = int(start_hour)
-            start_minute = int(start_minute)
-        else:
-            start_hour = today.hour
-            start_minute = today.minute
-
-        if is_param(self.input, 'report_end_day') and not is_empty(self.input.report_end_day):
-            end_day = str2datetime(self.input.report_end_day,
-                                     DEFAULT_LANGS[self.me.languages]['DATE_FORMAT'][0])
-        else:
-            end_day = today
-
-        if is_param(self.input, 'report_end_time') and not is_empty(self.input.report_end_time):
-            (end_hour, end_minute) = self.input.report_end_time.split(':', 2)
-            end_hour = int(end_hour)
-            end_minute = int(end_minute)
-
-        else:
-            end_hour = today.hour
-            end_minute = today.minute
-
-        start_time = create_epochsec(start_day.year,
-                                     start_day.month,
-                                     start_day.day,
-                                     start_hour,
-                                     start_minute,
-                                     )
-
-        end_time = create_epochsec(end_day.year,
-                                   end_day.month,
-                                   end_day.day,
-                                   end_hour,
-                                   end_minute,
-                                   )
+        (start_time, end_time) = get_report_period(self)
         if int(start_time) > int(end_time):
             self.logger.error("Getting reports failed. Start time > end time.")
             return web.badrequest(_('Getting reports failed. Start time > end time.'))
 
-        if is_param(self.input, 'type') and not is_empty(self.input.type):
-            type = self.input.type
-        else:
-            type = "default"
-
-        if is_param(self.input, 'host') and not is_empty(self.input.host):
-            host = self.input.host
-        else:
-            host = None
-
-        if is_param(self.input, 'libvirt_target') and not is_empty(self.input.libvirt_target):
-            libvirt_target = self.input.libvirt_target
-        else:
-            libvirt_target = None
+        (type, host, libvirt_target) = get_report_options(self)
 
         rrd = RRD(self._, self.me.languages)
         if host is not None:
@@ -158,12 +180,13 @@ class HostBy1ReportBy1By1(Rest):
                 self.logger.debug("Get report failed. Target host not found.")
                 return web.notfound()
 
-        filepath = rrd.create_graph(target, dev, type, start_time, end_time, libvirt_target)
+        graph = rrd.get_graph(target, dev, type, start_time, end_time, libvirt_target)
 
-        if filepath != "":
-            self.download.type = OUTPUT_TYPE_FILE
-            self.download.file = filepath
-            self.download.once = True
+        if graph is not None:
+            self.download.type = OUTPUT_TYPE_STREAM
+            self.download.stream = graph.data
+            self.download.etag = graph.etag
+            self.download.content_type = 'image/png'
 
         return True
 
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#
+
+import web
+
+from karesansui.lib.rest import Rest, auth, OUTPUT_TYPE_STREAM
+from karesansui.lib.utils import json_dumps, is_param, is_int
+from karesansui.lib.rrd.rrd import RRD
+from karesansui.lib.rrd.xport import pack_series, \
+     XPORT_CONSOLIDATIONS, XPORT_MAX_ROWS
+
+from karesansui.gadget.hostby1reportby1by1 import validates_report, \
+     get_report_period, get_report_options
+
+# upper limit of the maxpoints parameter.
+XPORT_MAX_POINTS = 5000
+
+class HostBy1ReportBy1By1Series(Rest):
+
+    @auth
+    def _GET(self, *param, **params):
+        """<comment-ja>
+        グラフと同じデータを時系列の配列で返す。
+         - param
+           - グラフと同じ (report_start_day, report_end_day, type, host, libvirt_target など)
+           - cf = 集約関数 AVERAGE, MIN, MAX (省略時はAVERAGE)
+           - maxpoints = 最大点数 (省略時は400)
+        .json は列ごとの配列、.bin は列ごとのfloat32(リトルエンディアン)を返す。
+        </comment-ja>
+        <comment-en>
+        Return the data behind a report graph as time series.
+         - param
+           - same as the graph (report_start_day, report_end_day, type, host, libvirt_target, ...)
+           - cf = consolidation function AVERAGE, MIN or MAX (default AVERAGE)
+           - maxpoints = maximum number of points (default 400)
+        Series longer than maxpoints are consolidated by rrdtool with cf.
+        .json returns one array per column; .bin returns the columns one
+        after another as little endian float32 (NaN for unknown), with
+        start, end, step and columns in X-Series-* headers.
+        </comment-en>
+        """
+        host_id = self.chk_hostby1(param)
+        if host_id is None: return web.notfound()
+
+        target = param[1]
+        if target is None: return web.notfound()
+
+        dev = param[2]
+        if dev is None: return web.notfound()
+
+        if not validates_report(self):
+            self.logger.debug("Get report series failed. Did not validate.")
+            return web.badrequest(self.view.alert)
+
+        (start_time, end_time) = get_report_period(self)
+        if int(start_time) > int(end_time):
+            self.logger.error("Getting report series failed. Start time > end time.")
+            return web.badrequest(self._('Getting reports failed. Start time > end time.'))
+
+        (type, host, libvirt_target) = get_report_options(self)
+
+        cf = "AVERAGE"
+        if is_param(self.input, 'cf'):
+            cf = self.input.cf.upper()
+            if cf not in XPORT_CONSOLIDATIONS:
+                return web.badrequest()
+
+        max_rows = XPORT_MAX_ROWS
+        if is_param(self.input, 'maxpoints'):
+            if not is_int(self.input.maxpoints):
+                return web.badrequest()
+            max_rows = min(max(int(self.input.maxpoints), 10), XPORT_MAX_POINTS)
+
+        rrd = RRD(self._, self.me.languages)
+        if host is not None:
+            if rrd.set_rrd_dir_host(host) is False:
+                self.logger.debug("Get report series failed. Target host not found.")
+                return web.notfound()
+
+        series = rrd.export(target, dev, type, start_time, end_time,
+                            libvirt_target, cf, max_rows)
+        if series is None:
+            return web.notfound()
+
+        if self.__template__["media"] == 'bin':
+            web.header('X-Series-Start', str(series["start"]))
+            web.header('X-Series-End', str(series["end"]))
+            web.header('X-Series-Step', str(series["step"]))
+            web.header('X-Series-Columns', ",".join(series["columns"]))
+            self.download.type = OUTPUT_TYPE_STREAM
+            self.download.stream = pack_series(series)
+            self.download.content_type = 'application/octet-stream'
+        else:
+            self.view.series = json_dumps(series)
+
+        return True
+
+urls = (
+    '/host/(\d+)/report/([a-zA-Z0-9]+)/([a-zA-Z0-9_\.\-]+)(\.json|\.bin)$', HostBy1ReportBy1By1Series,
+    )
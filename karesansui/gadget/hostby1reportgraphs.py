@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+#
+
+import re
+import base64
+
+import web
+
+from karesansui.lib.rest import Rest, auth
+from karesansui.lib.utils import json_dumps, is_param, is_empty
+from karesansui.lib.rrd.rrd import RRD
+from karesansui.lib.const import GRAPH_BATCH_MAX
+
+from karesansui.gadget.hostby1reportby1by1 import validates_report, \
+     get_report_period, get_report_options
+
+GRAPH_SPEC_REGEX = re.compile(r"^([a-zA-Z0-9]+):([a-zA-Z0-9_\.\-]+)(?::([a-zA-Z0-9]+))?(?::([a-zA-Z0-9]+))?$")
+
+class HostBy1ReportGraphs(Rest):
+
+    @auth
+    def _GET(self, *param, **params):
+        """<comment-ja>
+        複数のグラフ画像をまとめて返す。
+         - param
+           - graphs = "target:dev[:type[:libvirt_target]]" をカンマで区切ったリスト
+           - その他はグラフと同じ (report_start_day, report_end_day, host など)
+        画像は data URI で返す。描画済みの画像は個別のグラフ(.png)の要求でも使われる。
+        </comment-ja>
+        <comment-en>
+        Return several report graphs at once.
+         - param
+           - graphs = comma separated list of "target:dev[:type[:libvirt_target]]"
+           - others are the same as a single graph (report_start_day, report_end_day, host, ...)
+        Images are returned as data URIs. They are rendered in parallel and
+        kept in the graph cache, where requests for a single graph (.png)
+        find them too.
+        </comment-en>
+        """
+        host_id = self.chk_hostby1(param)
+        if host_id is None: return web.notfound()
+
+        if not is_param(self.input, 'graphs') or is_empty(self.input.graphs):
+            return web.badrequest()
+
+        graphs = []
+        for spec in self.input.graphs.split(','):
+            matched = GRAPH_SPEC_REGEX.match(spec.strip())
+            if matched is None:
+                return web.badrequest()
+            (target, dev, type, libvirt_target) = matched.groups()
+            if type is None:
+                type = "default"
+            graphs.append((target, dev, type, libvirt_target))
+        if len(graphs) > GRAPH_BATCH_MAX:
+            return web.badrequest()
+
+        if not validates_report(self):
+            self.logger.debug("Get report graphs failed. Did not validate.")
+            return web.badrequest(self.view.alert)
+
+        (start_time, end_time) = get_report_period(self)
+        if int(start_time) > int(end_time):
+            self.logger.error("Getting report graphs failed. Start time > end time.")
+            return web.badrequest(self._('Getting reports failed. Start time > end time.'))
+
+        host = get_report_options(self)[1]
+
+        rrd = RRD(self._, self.me.languages)
+        if host is not None:
+            if rrd.set_rrd_dir_host(host) is False:
+                self.logger.debug("Get report graphs failed. Target host not found.")
+                return web.notfound()
+
+        result = []
+        entries = rrd.get_graphs(graphs, start_time, end_time)
+        for ((target, dev, type, libvirt_target), entry) in zip(graphs, entries):
+            graph = {"target"         : target,
+                     "dev"            : dev,
+                     "type"           : type,
+                     "libvirt_target" : libvirt_target,
+                     "etag"           : None,
+                     "image"          : None,
+                     }
+            if entry is not None:
+                graph["etag"] = entry.etag
+                graph["image"] = "data:image/png;base64," \
+                                 + base64.b64encode(entry.data).decode("ascii")
+            result.append(graph)
+
+        self.view.graphs = json_dumps({"graphs" : result})
+        return True
+
+urls = (
+    '/host/(\d+)/report/graphs(\.json)$', HostBy1ReportGraphs,
+    )
@@ -35,6 +35,7 @@ from karesansui.lib.file.k2v import K2V
 from karesansui.lib.crypt import sha1encrypt, sha1compare
 from karesansui.lib.const import MACHINE_ATTRIBUTE, MACHINE_HYPERVISOR
 from karesansui.db import get_engine, get_metadata, get_session
+from karesansui.db.searchindex import prepare_search_index
 from karesansui.db.model.user import User
 from karesansui.db.model.notebook import Notebook
 from karesansui.db.model.tag import Tag
@@ -149,6 +150,7 @@ class Init(Rest):
             metadata.drop_all()   
             metadata.tables['machine2jobgroup'].create()
             metadata.create_all()   
+            prepare_search_index(engine, rebuild=True)
         except Exception as e:
             traceback.format_exc()
             raise Exception('Initializing/Updating a database error - %s' % ''.join(e.args))
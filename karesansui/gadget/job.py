@@ -28,10 +28,12 @@ import karesansui
 import simplejson as json
 from karesansui.lib.rest import Rest, auth
 from karesansui.lib.search import validates_jobsearch
-from karesansui.lib.const import JOB_LIST_RANGE, DEFAULT_LANGS, MACHINE_HYPERVISOR
+from karesansui.lib.const import JOB_LIST_RANGE, DEFAULT_LANGS, MACHINE_HYPERVISOR, \
+     PAGER_COUNT_CACHE_TTL
 from karesansui.lib.pager import Pager
 from karesansui.lib.utils import str2datetime, is_param, is_empty
-from karesansui.db.access._2pysilhouette import jg_findbyalltype, jg_findby1
+from karesansui.db.access._2pysilhouette import jg_findbyalltype, jg_findby1, \
+     sync_jobgroup_summary
 
 from karesansui.db.access.machine_machine2jobgroup import \
      findbyall as m2mj_findbyall, findbyjobgroup_id1 as m2mj_findby1
@@ -49,6 +51,13 @@ class Job(Rest):
         if check is False:
             return web.badrequest(self.view.alert)
 
+        if ('p' in self.input) is True:
+            page = int(self.input.p)
+        else:
+            page = 0
+
+        sync_jobgroup_summary(self.orm, self.pysilhouette.orm)
+
         if edit is True:
             # user search
             users = findbyname_BM(self.orm, self.input.user)
@@ -71,69 +80,61 @@ class Job(Rest):
                 end = str2datetime(self.input.end,
                                    DEFAULT_LANGS[self.me.languages]['DATE_FORMAT'][0],True)
 
-            # machine search
-            m_m2js = m2mj_findbyall(self.orm,
-                           machine_name,
-                           start,
-                           end,
-                           users_id,
-                           True
-                           )
-            if not m_m2js:
+            jobgroup_status = self.input.status
+            if is_empty(jobgroup_status):
+                jobgroup_status = None
+
+            # machine and jobgroup search
+            pager = Pager(m2mj_findbyall(self.orm,
+                                         machine_name,
+                                         start,
+                                         end,
+                                         users_id,
+                                         True,
+                                         as_query=True,
+                                         jobgroup_type=JOBGROUP_TYPE["SERIAL"],
+                                         jobgroup_status=jobgroup_status,
+                                         ),
+                          page, JOB_LIST_RANGE, PAGER_COUNT_CACHE_TTL)
+            if pager.get_total() == 0:
                 self.logger.debug("Search m_m2js failed. "
                                   "Did not exist m_m2js that in accord with these query. "
-                                  "name %s, user_id %s, start %s, end %s" % (machine_name, users_id, start, end))
+                                  "name %s, user_id %s, start %s, end %s, jobgroup_status %s" \
+                                  % (machine_name, users_id, start, end, jobgroup_status))
                 return web.nocontent()
             
-            self.view.m_m2js = m_m2js
             self.view.name = self.input.name
             self.view.user = self.input.user
             self.view.status = self.input.status
             self.view.start = self.input.start
             self.view.end = self.input.end
-
-            jobgroup_ids = []
-            for m_m2j in m_m2js:
-                 jobgroup_ids.append(m_m2j[1].jobgroup_id)
-            jobgroup_status = self.input.status
-            if is_empty(jobgroup_status):
-                jobgroup_status = None
-
-            jobgroups = jg_findbyalltype(self.pysilhouette.orm, JOBGROUP_TYPE["SERIAL"],
-                                         jobgroup_ids, jobgroup_status, desc=True)
-            if not jobgroups:
-                self.logger.debug("Search jobgroups failed. "
-                                  "Did not exist jobgroups that in accord with these query. "
-                                  "jobgroup_ids %s, jobgroup_status %s" % (jobgroup_ids, jobgroup_status))
-                return web.nocontent()
             
         else:
-            m_m2js = m2mj_findbyall(self.orm)
-            self.view.m_m2js = m_m2js
             self.view.name   = ''
             self.view.user   = ''
             self.view.status = ''
             self.view.start  = ''
             self.view.end    = ''
 
-            self.view.m_m2js = m_m2js
+            pager = Pager(m2mj_findbyall(self.orm, desc=True, as_query=True,
+                                         jobgroup_type=JOBGROUP_TYPE["SERIAL"]),
+                          page, JOB_LIST_RANGE, PAGER_COUNT_CACHE_TTL)
 
-            jobgroup_ids = []
-            for m_m2j in m_m2js:
-                 jobgroup_ids.append(m_m2j[1].jobgroup_id)
-                 
-            jobgroups = jg_findbyalltype(self.pysilhouette.orm, JOBGROUP_TYPE["SERIAL"],
-                                         jobgroup_ids, desc=True)
+        # load the jobgroups of the page only.
+        m_m2js = pager.get_displays()
+        self.view.m_m2js = m_m2js
+
+        jobgroup_ids = []
+        for m_m2j in m_m2js:
+             jobgroup_ids.append(m_m2j[1].jobgroup_id)
+
+        pager.displays = jg_findbyalltype(self.pysilhouette.orm, JOBGROUP_TYPE["SERIAL"],
+                                          jobgroup_ids, desc=True)
         
         self.view.JOBGROUP_STATUS = JOBGROUP_STATUS
         self.view.HYPERVISOR = MACHINE_HYPERVISOR
- 
-        if ('p' in self.input) is True:
-            start = int(self.input.p)
-        else:
-            start = 0
         self.view.date_format = DEFAULT_LANGS[self.me.languages]['DATE_FORMAT'][1] 
-        self.view.pager = Pager(jobgroups, start, JOB_LIST_RANGE)
+        self.view.pager = pager
 
         return True
 
@@ -39,6 +39,7 @@ from karesansui.lib.const import \
     PASSWORD_MIN_LENGTH, PASSWORD_MAX_LENGTH, \
     LANGUAGES_MIN_LENGTH, LANGUAGES_MAX_LENGTH
 from karesansui.lib.utils import is_param, is_empty, create_file
+from karesansui.lib.auth_cache import get_auth_cache
 from karesansui.gadget.userby1 import compare_password
 
 def validates_me(obj):
@@ -189,6 +190,7 @@ class Me(Rest):
         except IOError as ioe:
             self.logger.error("Logout failed, Failed to create logout file. - filename=%s" % fname)
             raise # return 500(Internal Server Error)
+        get_auth_cache().invalidate(self.me.email)
 
         return web.seeother('%s/logout' % web.ctx.home)
 
@@ -23,14 +23,40 @@
 # THE SOFTWARE.
 #
 
+from datetime import datetime
+
 import web
-from karesansui.lib.rest import Rest, auth
+from karesansui.lib.rest import Rest, auth, OUTPUT_TYPE_STATIC
+from karesansui.lib.utils import is_param
+from karesansui.lib.static import get_static_file, is_accel_redirect
+from karesansui.lib.const import STATIC_MAX_AGE, STATIC_COMPRESS_TYPES
 
 class Static(Rest):
     def _GET(self, *param, **params):
-        self.__template__.dir = 'static/'+param[0]
-        self.__template__.file = param[1]
-        self.__template__.media = param[2]
+        static = get_static_file('%s/%s.%s' % (param[0], param[1], param[2]))
+        if static is None:
+            return web.notfound()
+
+        # precompressed variants (nginx picks them itself)
+        encoding = None
+        filename = static.filename
+        if param[2] in STATIC_COMPRESS_TYPES:
+            web.header('Vary', 'Accept-Encoding')
+            if is_accel_redirect() is False:
+                (filename, encoding) = static.variant(web.ctx.env.get('HTTP_ACCEPT_ENCODING'))
+
+        # fingerprinted URLs never change, others are revalidated.
+        if is_param(self.input, 'v') and self.input.v == static.fingerprint:
+            self.download.cache_control = 'public,max-age=%d,immutable' % STATIC_MAX_AGE
+        else:
+            self.download.cache_control = 'public,no-cache'
+
+        self.download.type = OUTPUT_TYPE_STATIC
+        self.download.file = filename
+        self.download.encoding = encoding
+        self.download.content_type = static.content_type
+        self.download.etag = static.etag(encoding)
+        self.download.lastmodified = datetime.utcfromtimestamp(int(static.mtime))
         return True
 
 urls = ('/static/(.+)/(.+)\.(js|css|png|gif|jpg|jpeg|ico|jar)', Static,)
@@ -88,25 +88,25 @@ class Tag(Rest):
             self.logger.debug("Failed to get tags. The value of page is invalid.")
             return web.badrequest(self.view.alert)
 
+        if is_param(self.input, 'p') is True:
+            start = int(self.input.p)
+        else:
+            start = 0
+
         if is_param(self.input, 'q') is True:
-            tags = findbyand(self.orm, self.input.q)
-            if not tags:
+            pager = Pager(findbyand(self.orm, self.input.q, as_query=True),
+                          start, TAG_LIST_RANGE)
+            if pager.get_total() == 0:
                 self.logger.debug("Failed to get tags. No such tag - query=%s" % self.input.q)
                 return web.nocontent()
             self.view.search_value = self.input.q
         else:
-            tags = findbyall(self.orm)
+            pager = Pager(findbyall(self.orm, as_query=True), start, TAG_LIST_RANGE)
             self.view.search_value = ""
-            if not tags:
+            if pager.get_total() == 0:
                 self.logger.debug("Failed to get tag. No tags found.")
                 return web.notfound()
 
-        if is_param(self.input, 'p') is True:
-            start = int(self.input.p)
-        else:
-            start = 0
-
-        pager = Pager(tags, start, TAG_LIST_RANGE)
         if not pager.exist_now_page():
             self.logger.debug("Failed to get tag. Could not find page - page=%s" % self.input.p)
             return web.nocontent()
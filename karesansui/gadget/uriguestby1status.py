@@ -133,16 +133,14 @@ class UriGuestBy1Status(Rest):
                 self.kvc = KaresansuiVirtConnectionAuth(uri,creds)
 
                 try:
-                    host = MergeHost(self.kvc, model)
-                    for guest in host.guests:
-                        _virt = self.kvc.search_kvg_guests(guest.info["model"].name)
-                        if 0 < len(_virt):
-                            for _v in _virt:
-                                info = _v.get_info()
-                                if info["uuid"] == uri_id or (uri[0:5] == "test:"):
-                                    __guest = MergeGuest(guest.info["model"],_v)
-                                    status          = _v.status()
-                                    break
+                    status = self.kvc.get_domain_state(uri_id)
+                    if status is None:
+                        host = MergeHost(self.kvc, model)
+                        for guest in host.guests:
+                            _v = guest.info["virt"]
+                            if _v.inventory["uuid"] == uri_id or (uri[0:5] == "test:"):
+                                status = _v.status()
+                                break
 
                     if self.is_json() is True:
                         self.view.status = json_dumps(status)
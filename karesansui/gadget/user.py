@@ -118,25 +118,25 @@ class User(Rest):
             self.logger.debug("Failed to get account. the value of page is invalid. - page=%s" % self.input.p)
             return web.badrequest(self.view.alert)
 
+        if is_param(self.input, "p"):
+            start = int(self.input.p)
+        else:
+            start = 0
+
         if is_param(self.input, "q"):
-            users = findbyand(self.orm, self.input.q)
-            if not users:
+            pager = Pager(findbyand(self.orm, self.input.q, as_query=True),
+                          start, USER_LIST_RANGE)
+            if pager.get_total() == 0:
                 self.logger.debug("Failed to get account. No such account. - query=%s" % self.input.q)
                 return web.nocontent()
             self.view.search_value = self.input.q
         else:
-            users = findbyall(self.orm)
+            pager = Pager(findbyall(self.orm, as_query=True), start, USER_LIST_RANGE)
             self.view.search_value = ""
-            if not users:
+            if pager.get_total() == 0:
                 self.logger.debug("Failed to get account. No accounts found.")
                 return web.notfound()
 
-        if is_param(self.input, "p"):
-            start = int(self.input.p)
-        else:
-            start = 0
-
-        pager = Pager(users, start, USER_LIST_RANGE)
         if not pager.exist_now_page():
             self.logger.debug("Failed to get account. Could not find page - page=%s" % self.input.p)
             return web.nocontent()
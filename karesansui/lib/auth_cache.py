@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui Core.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+"""
+<comment-ja>
+認証済みユーザのキャッシュ
+</comment-ja>
+<comment-en>
+Cache of authenticated users, so that @auth does not look the user up and
+hash the password on every request.
+
+Entries are keyed by a salted SHA-256 of the Basic credentials (passwords
+are not kept) and hold a detached copy of the User. They expire after
+AUTH_CACHE_TTL seconds, and all of them are dropped when the stamp file
+AUTH_CACHE_STAMP_FILE changes. invalidate_auth_cache() touches it whenever
+a user is updated or deleted, which also reaches the other FastCGI
+processes.
+</comment-en>
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from karesansui.lib.const import AUTH_CACHE_SIZE, AUTH_CACHE_TTL, \
+     AUTH_CACHE_STAMP_FILE
+
+logger = logging.getLogger('karesansui.lib.auth_cache')
+
+class AuthCache:
+
+    def __init__(self, size=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL,
+                 stamp_file=AUTH_CACHE_STAMP_FILE):
+        self.size = size
+        self.ttl = ttl
+        self.stamp_file = stamp_file
+        self.salt = os.urandom(16)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _key(self, credentials):
+        return hashlib.sha256(self.salt + credentials.encode("utf-8")).digest()
+
+    def stamp(self):
+        """<comment-ja>
+        スタンプファイルの更新時刻を返します。
+        </comment-ja>
+        <comment-en>
+        Return the current stamp. Take it before authenticating against the
+        database and pass it to set(), so that a change made meanwhile is
+        not missed.
+        </comment-en>
+        """
+        try:
+            return os.stat(self.stamp_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def get(self, credentials, stamp):
+        """<comment-ja>
+        キャッシュされたユーザを返します。
+        @return: karesansui.db.model.user.User (detached)、ない場合はNone
+        </comment-ja>
+        <comment-en>
+        Return the detached User cached for credentials, or None.
+        </comment-en>
+        """
+        key = self._key(credentials)
+        self.lock.acquire()
+        try:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            (expires, entry_stamp, email, user) = entry
+            if expires < time.time() or entry_stamp != stamp:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return user
+        finally:
+            self.lock.release()
+
+    def set(self, credentials, user, stamp):
+        key = self._key(credentials)
+        self.lock.acquire()
+        try:
+            self.entries[key] = (time.time() + self.ttl, stamp, user.email, user)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        finally:
+            self.lock.release()
+
+    def invalidate(self, email=None):
+        """<comment-ja>
+        キャッシュを削除します。
+        @param email: 指定した場合はそのユーザのみ削除します。
+        </comment-ja>
+        <comment-en>
+        Drop the entries of email, or all entries. Only this process is
+        affected; see invalidate_auth_cache().
+        </comment-en>
+        """
+        self.lock.acquire()
+        try:
+            if email is None:
+                self.entries.clear()
+                return
+            for key in [key for (key, entry) in self.entries.items() if entry[2] == email]:
+                del self.entries[key]
+        finally:
+            self.lock.release()
+
+_auth_cache = None
+_auth_cache_lock = threading.Lock()
+
+def get_auth_cache():
+    global _auth_cache
+    if _auth_cache is None:
+        _auth_cache_lock.acquire()
+        try:
+            if _auth_cache is None:
+                _auth_cache = AuthCache()
+        finally:
+            _auth_cache_lock.release()
+    return _auth_cache
+
+def invalidate_auth_cache():
+    """<comment-ja>
+    全てのプロセスの認証キャッシュを無効にします。
+    </comment-ja>
+    <comment-en>
+    Drop the cached users of every process, by touching the stamp file.
+    </comment-en>
+    """
+    cache = get_auth_cache()
+    cache.invalidate()
+    try:
+        fp = open(cache.stamp_file, "a")
+        fp.close()
+        os.utime(cache.stamp_file, None)
+    except (IOError, OSError) as e:
+        logger.warning('Failed to update the stamp file - %s : %s' % (cache.stamp_file, str(e)))
@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui Core.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+警告アクション(ログ、スクリプト、メール)をcollectdのスレッドの外で実行する
+
+notification()はアクションをキューに入れてすぐに戻り、ワーカースレッドが
+順に実行する。同じ監視項目・重要度のアクションが一定時間内に繰り返された
+場合はまとめ、キューが一杯の場合は捨てる。
+"""
+
+import time
+import threading
+import queue
+
+from karesansui.lib.const import ALERT_ACTION_WORKERS, ALERT_ACTION_QUEUE_SIZE, \
+                                 ALERT_ACTION_COALESCE_WINDOW, ALERT_SMTP_IDLE_TIMEOUT
+
+class SMTPConnectionCache:
+    """<comment-ja>
+    SMTPサーバー毎の接続をスレッド毎に保持し、再利用します。
+    </comment-ja>
+    <comment-en>
+    Open SMTP connections, per thread and per (server, port, user), reused
+    while they have been idle for less than idle_timeout seconds.
+    </comment-en>
+    """
+
+    def __init__(self, idle_timeout=ALERT_SMTP_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self.local = threading.local()
+
+    def _connections(self):
+        try:
+            return self.local.connections
+        except AttributeError:
+            self.local.connections = {}
+            return self.local.connections
+
+    def _key(self, mail):
+        return (mail.smtp_server, mail.smtp_port, mail.auth_user)
+
+    def get(self, mail):
+        connections = self._connections()
+        key = self._key(mail)
+        now = time.time()
+        if key in connections:
+            (connection, last_used) = connections[key]
+            if now < last_used + self.idle_timeout:
+                connections[key] = (connection, now)
+                return connection
+            self.discard(mail)
+        connection = mail.connect()
+        connections[key] = (connection, now)
+        return connection
+
+    def discard(self, mail):
+        connections = self._connections()
+        key = self._key(mail)
+        if key in connections:
+            (connection, last_used) = connections.pop(key)
+            try:
+                connection.quit()
+            except Exception:
+                pass
+
+    def send(self, mail):
+        """<comment-ja>
+        保持している接続でメールを送信します。接続が切れていた場合は接続し直して再送します。
+        </comment-ja>
+        <comment-en>
+        Send mail (a MAIL_LIB with its message created) over a cached
+        connection. If a reused connection turns out to be closed, the
+        mail is sent once more over a new one.
+        </comment-en>
+        """
+        reused = self._key(mail) in self._connections()
+        try:
+            mail.send(connection=self.get(mail))
+        except Exception:
+            self.discard(mail)
+            if reused is False:
+                raise
+            mail.send(connection=self.get(mail))
+
+class ActionDispatcher:
+    """<comment-ja>
+    アクションをキューに入れ、ワーカースレッドで実行します。
+    </comment-ja>
+    <comment-en>
+    Run alert actions on worker threads.
+    submit() never blocks: an action is coalesced (not run) when the last
+    action of the same unit was submitted less than coalesce_window
+    seconds before with the same state, and an action arriving while
+    queue_size actions are waiting is dropped. Both are counted in
+    get_metrics().
+    </comment-en>
+    """
+
+    def __init__(self, workers=ALERT_ACTION_WORKERS,
+                 queue_size=ALERT_ACTION_QUEUE_SIZE,
+                 coalesce_window=ALERT_ACTION_COALESCE_WINDOW):
+        self.queue = queue.Queue(queue_size)
+        self.queue_size = queue_size
+        self.coalesce_window = coalesce_window
+        self.lock = threading.Lock()
+        self.last_submitted = {}
+        self.metrics = {"submitted" : 0,
+                        "coalesced" : 0,
+                        "dropped"   : 0,
+                        "done"      : 0,
+                        "failed"    : 0,
+                        "high_water": 0,
+                        }
+        self.smtp = SMTPConnectionCache()
+        self.threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker,
+                                      name="karesansui-alert-action-%d" % i)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, key, func, *args, **kwargs):
+        """<comment-ja>
+        アクションをキューに入れます。
+        @param key: (まとめる単位, 状態) 監視項目名と重要度など
+                    状態が変わった場合はまとめない
+        @return: キューに入れた場合はTrue
+        </comment-ja>
+        <comment-en>
+        Queue func(*args, **kwargs). key is (unit, state), e.g. the watch
+        name and the severity. Returns False if it was coalesced with an
+        earlier action of the same unit and state, or dropped because the
+        queue is full. A change of state in between (FAILURE, OKAY,
+        FAILURE) is never coalesced.
+        </comment-en>
+        """
+        now = time.time()
+        with self.lock:
+            self.metrics["submitted"] += 1
+            if key is not None:
+                (unit, state) = key
+                (last, last_state) = self.last_submitted.get(unit, (0, None))
+                if state == last_state and now < last + self.coalesce_window:
+                    self.metrics["coalesced"] += 1
+                    return False
+            try:
+                self.queue.put_nowait((func, args, kwargs))
+            except queue.Full:
+                self.metrics["dropped"] += 1
+                return False
+            if key is not None:
+                self.last_submitted[unit] = (now, state)
+                for _unit in [x for x, y in self.last_submitted.items()
+                              if now >= y[0] + self.coalesce_window]:
+                    del self.last_submitted[_unit]
+            self.metrics["high_water"] = max(self.metrics["high_water"], self.queue.qsize())
+        return True
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            (func, args, kwargs) = item
+            try:
+                func(*args, **kwargs)
+                result = "done"
+            except Exception:
+                result = "failed"
+            with self.lock:
+                self.metrics[result] += 1
+            self.queue.task_done()
+
+    def get_metrics(self):
+        """<comment-ja>
+        キューの統計を返します。
+        </comment-ja>
+        <comment-en>
+        Return the counters of submitted, coalesced, dropped, done and
+        failed actions, the queue length and its limit and high water mark.
+        </comment-en>
+        """
+        with self.lock:
+            metrics = dict(self.metrics)
+        metrics["queued"] = self.queue.qsize()
+        metrics["queue_size"] = self.queue_size
+        return metrics
+
+    def stop(self, timeout=None):
+        """<comment-ja>
+        キューに残っているアクションを実行してからワーカーを終了します。
+        @return: 実行されずに残ったアクションの数
+        </comment-ja>
+        <comment-en>
+        Let the workers finish the queued actions and stop, waiting at most
+        timeout seconds in all (None: until they are done). Returns the
+        number of queued actions abandoned when the timeout has passed;
+        the (daemon) workers keep running them until the process exits.
+        </comment-en>
+        """
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+
+        def remaining():
+            if deadline is None:
+                return None
+            return max(0, deadline - time.time())
+
+        for thread in self.threads:
+            try:
+                self.queue.put(None, timeout=remaining())
+            except queue.Full:
+                break
+        for thread in self.threads:
+            thread.join(remaining())
+
+        with self.queue.mutex:
+            abandoned = len([item for item in self.queue.queue if item is not None])
+        self.threads = []
+        return abandoned
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def get_dispatcher():
+    """<comment-ja>
+    このプロセスのActionDispatcherを返します。
+    </comment-ja>
+    <comment-en>
+    Return the ActionDispatcher of this process, starting it on first use.
+    </comment-en>
+    """
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = ActionDispatcher()
+        return _dispatcher
+
+def stop_dispatcher(timeout=None):
+    """<comment-ja>
+    このプロセスのActionDispatcherを終了します。
+    @return: 実行されずに残ったアクションの数
+    </comment-ja>
+    <comment-en>
+    Stop the ActionDispatcher of this process, waiting at most timeout
+    seconds. Returns the number of queued actions abandoned.
+    </comment-en>
+    """
+    global _dispatcher
+    abandoned = 0
+    with _dispatcher_lock:
+        if _dispatcher is not None:
+            abandoned = _dispatcher.stop(timeout)
+            _dispatcher = None
+    return abandoned
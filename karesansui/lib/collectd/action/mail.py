@@ -51,7 +51,7 @@ from karesansui.lib.parser.eml     import emlParser
 from karesansui import __version__, __release__, __app__
 AppName = "%s %s" % (ucfirst(__app__),__version__,)
 
-def send_mail(recipient=None, sender=None, server="localhost", port=25, message="", extra_message="", watch_name="", logfile="/dev/null"):
+def send_mail(recipient=None, sender=None, server="localhost", port=25, message="", extra_message="", watch_name="", logfile="/dev/null", connections=None):
     retval = False
 
     func_name = sys._getframe(0).f_code.co_name
@@ -160,7 +160,10 @@ def send_mail(recipient=None, sender=None, server="localhost", port=25, message=
         #sys.exit()
 
         try:
-            mail.send()
+            if connections is None:
+                mail.send()
+            else:
+                connections.send(mail)
             retval = True
         except MAIL_LIB_Exception as msg:
             append_line(logfile,"[%s] Error: %s" % (func_name,str(msg),))
@@ -36,7 +36,8 @@ from karesansui.lib.collectd.utils import create_plugin_selector, plugin_selecto
 from karesansui.lib.const import VENDOR_PREFIX, KARESANSUI_PREFIX, \
                                  VENDOR_DATA_DIR, \
                                  COUNTUP_DATABASE_PATH, COLLECTD_LOG_DIR, \
-                                 COLLECTD_DF_RRPORT_BY_DEVICE
+                                 COLLECTD_DF_RRPORT_BY_DEVICE, \
+                                 COLLECTD_RRDCACHED_ADDRESS
 
 from karesansui.lib.parser.collectdplugin import PARSER_COLLECTD_PLUGIN_DIR
 
@@ -628,7 +629,7 @@ def switch_rrdcached_plugin(flag=True, dop=None, webobj=None, host=None):
     dop.cdp_set("collectdplugin",keys,value,multiple_file=True)
 
     keys = _keys + ["DaemonAddress"]
-    value = "\"unix:/var/run/rrdcached/rrdcached.sock\""
+    value = "\"%s\"" % COLLECTD_RRDCACHED_ADDRESS
     dop.cdp_set("collectdplugin",keys,value,multiple_file=True)
 
     keys = _keys + ["CreateFiles"]
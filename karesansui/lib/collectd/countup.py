@@ -25,14 +25,19 @@
 #
 
 import os
+import json
 import time
-import types
+import threading
 
-from bsddb import hashopen, btopen
-from karesansui.lib.const import COUNTUP_DATABASE_PATH, KARESANSUI_GROUP
+from karesansui.lib.const import COUNTUP_DATABASE_PATH, KARESANSUI_GROUP, \
+                                 COUNTUP_CHECKPOINT_INTERVAL, COUNTUP_JOURNAL_MAX
 
 """
-Berkeley DBにキーの値（カウント情報）を書き込む
+キーの値（カウント情報）をメモリ上の表で管理し、ファイルに書き込む
+
+表への変更はジャーナルファイル(<path>.journal)に追記し、一定間隔で
+表全体をファイル(<path>)にチェックポイントとして書き出す。
+プロセスが異常終了しても、チェックポイントとジャーナルから復元できる。
 
 キー：カテゴリー名(半角文字)
 値  ：以下の要素を持つリスト配列のstrでキャストした文字列
@@ -77,6 +82,174 @@ Example:
 
 """
 
+class CountUpStore:
+    """<comment-ja>
+    カウント情報の表。ファイル毎に1つだけ作られ、CountUpから共有されます。
+    </comment-ja>
+    <comment-en>
+    In-memory table of the counters of one file, shared by all CountUp
+    objects of this process.
+    Changed records are appended to the journal (<path>.journal) as JSON
+    lines when a CountUp is finished, without fsync. Every
+    checkpoint_interval seconds, or when the journal has journal_max
+    lines, the whole table is written to <path> atomically (temporary
+    file, fsync and rename) and the journal is emptied. Loading reads the
+    checkpoint and replays the journal; a torn last line is ignored.
+    </comment-en>
+    """
+
+    def __init__(self, path,
+                 checkpoint_interval=COUNTUP_CHECKPOINT_INTERVAL,
+                 journal_max=COUNTUP_JOURNAL_MAX):
+        self.path = path
+        self.journal_path = "%s.journal" % path
+        self.checkpoint_interval = checkpoint_interval
+        self.journal_max = journal_max
+        self.lock = threading.RLock()
+        self.table = {}
+        self.pending = {}
+        self.journal_lines = 0
+        self.checkpointed = time.time()
+        self.load()
+
+    def load(self):
+        table = {}
+        try:
+            fp = open(self.path)
+            try:
+                data = json.load(fp)
+                if isinstance(data, dict):
+                    table = data
+            finally:
+                fp.close()
+        except (IOError, OSError, ValueError, UnicodeDecodeError):
+            # not created yet, or a Berkeley DB file of older versions.
+            pass
+
+        lines = 0
+        try:
+            fp = open(self.journal_path)
+            try:
+                for line in fp:
+                    try:
+                        (key, value) = json.loads(line)
+                    except (ValueError, TypeError):
+                        break
+                    if value is None:
+                        table.pop(key, None)
+                    else:
+                        table[key] = value
+                    lines += 1
+            finally:
+                fp.close()
+        except (IOError, OSError):
+            pass
+
+        self.table = table
+        self.journal_lines = lines
+
+    def keys(self):
+        return list(self.table.keys())
+
+    def get(self, key):
+        value = self.table.get(key)
+        if value is None:
+            return None
+        return list(value)
+
+    def put(self, key, value):
+        with self.lock:
+            self.table[key] = list(value)
+            self.pending[key] = self.table[key]
+
+    def delete(self, key):
+        with self.lock:
+            if key in self.table:
+                del self.table[key]
+                self.pending[key] = None
+
+    def flush(self):
+        """<comment-ja>
+        変更をジャーナルに書き込み、必要ならチェックポイントを作成します。
+        </comment-ja>
+        <comment-en>
+        Append the pending changes to the journal, and checkpoint when it is
+        due.
+        </comment-en>
+        """
+        with self.lock:
+            if self.pending:
+                data = "".join(["%s\n" % json.dumps([key, value])
+                                for (key, value) in self.pending.items()])
+                created = not os.path.exists(self.journal_path)
+                fd = os.open(self.journal_path, os.O_WRONLY|os.O_APPEND|os.O_CREAT, 0o660)
+                try:
+                    os.write(fd, data.encode("utf-8"))
+                finally:
+                    os.close(fd)
+                if created is True:
+                    self._set_permission(self.journal_path)
+                self.journal_lines += len(self.pending)
+                self.pending = {}
+
+            if self.journal_lines >= self.journal_max \
+               or time.time() >= self.checkpointed + self.checkpoint_interval:
+                self.checkpoint()
+
+    def checkpoint(self):
+        with self.lock:
+            tmp_path = "%s.%d" % (self.path, os.getpid())
+            fp = open(tmp_path, "w")
+            try:
+                json.dump(self.table, fp)
+                fp.flush()
+                os.fsync(fp.fileno())
+            finally:
+                fp.close()
+            created = not os.path.exists(self.path)
+            os.rename(tmp_path, self.path)
+            if created is True:
+                self._set_permission(self.path)
+
+            # everything journaled (and still pending) is in the checkpoint.
+            open(self.journal_path, "w").close()
+            self.journal_lines = 0
+            self.pending = {}
+            self.checkpointed = time.time()
+
+    def destroy(self):
+        with self.lock:
+            self.table = {}
+            self.pending = {}
+            self.journal_lines = 0
+            for path in (self.path, self.journal_path):
+                if os.path.exists(path):
+                    os.unlink(path)
+
+    def _set_permission(self, path):
+        try:
+            from karesansui.lib.utils import r_chmod, r_chgrp
+            r_chgrp(path,KARESANSUI_GROUP)
+            r_chmod(path,"g+rw")
+        except:
+            pass
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_countup_store(path):
+    """<comment-ja>
+    ファイルに対応するCountUpStoreを返します。
+    </comment-ja>
+    <comment-en>
+    Return the CountUpStore of path, loading it on first use.
+    </comment-en>
+    """
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = CountUpStore(path)
+        return _stores[path]
+
 class CountUp:
 
     path = None
@@ -89,72 +262,33 @@ class CountUp:
 
         self.attrs = ["total","hitcount","continuation","since","start","mtime","action"]
 
-        self._set_db_type("bt")     # B-Tree
-        self._set_db_type("hash")   # Hash
-
         try:
             self.create()
         except:
             raise
 
-    def _set_db_type(self,type="hash"):
-        self.db_type = type
-
-    def _open(self, flag="c", mode=0000):
-        func = "%sopen" % self.db_type
-        try:
-            exec("ret = %s(self.path, flag, mode)" % func)
-            return ret
-        except:
-            raise
-
-    def _close(self):
-        try:
-            self.db.close()
-        except:
-            pass
-
     def create(self):
-        if not os.path.exists(self.path):
-            self.db = self._open("c")
-            from karesansui.lib.utils import r_chmod, r_chgrp
-            r_chgrp(self.path,KARESANSUI_GROUP)
-            r_chmod(self.path,"g+rw")
-        else:
-            self.db = self._open("c")
-        pass
+        self.db = get_countup_store(self.path)
 
     def destroy(self):
-        self._close()
-        if os.path.exists(self.path):
-            os.unlink(self.path)
+        self.db.destroy()
 
     def finish(self):
-        self._close()
+        self.db.flush()
 
     def init(self,key):
-        retval = False
-
         now = time.time()
-        value = [0,0,0,now,now,now,0]
-
-        try:
-            self.db[key] = str(value)
-            retval = True
-        except:
-            pass
-
-        return retval
+        self.db.put(key,[0,0,0,now,now,now,0])
+        return True
 
     def get(self,key,attr=None):
-        retval = []
+        retval = self.db.get(key)
+        if retval is None:
+            return []
 
-        if (key in self.db) == 1:
-            exec("retval = %s" % self.db[key])
-
-            if attr is not None:
-                if attr in self.attrs:
-                    retval = retval[self.attrs.index(attr)]
+        if attr is not None:
+            if attr in self.attrs:
+                retval = retval[self.attrs.index(attr)]
 
         return retval
 
@@ -182,10 +316,8 @@ class CountUp:
     def set(self,key,value,attr=None):
         retval = False
 
-        if (key in self.db) == 1:
-
-            exec("data = %s" % self.get(key))
-
+        data = self.db.get(key)
+        if data is not None:
             modified = False
             if attr is None:
                 if type(value) is list:
@@ -197,28 +329,19 @@ class CountUp:
                     modified = True
 
             if modified is True:
-                try:
-                    self.db[key] = str(data)
-                    retval = True
-                except:
-                    pass
+                self.db.put(key,data)
+                retval = True
 
         else:
             if type(value) is list:
-                try:
-                    self.db[key] = str(value)
-                    retval = True
-                except:
-                    pass
+                self.db.put(key,value)
+                retval = True
 
         return retval
 
-    def up(self,key,attr=None):
-        retval = False
-
-        now = time.time()
-        if (key in self.db) == 1:
-            data = self.get(key)
+    def _up(self,key,attr,now):
+        data = self.db.get(key)
+        if data is not None:
             try:
                 total = int(data[self.attrs.index("total")])
             except:
@@ -257,47 +380,60 @@ class CountUp:
         else:
             data = [1,1,1,now,now,now,0]
 
-        try:
-            self.set(key,data)
-            retval = True
-        except:
-            pass
+        self.db.put(key,data)
 
-        return retval
+    def up(self,key,attr=None):
+        with self.db.lock:
+            self._up(key,attr,time.time())
+        return True
+
+    def up_many(self,keys,attr=None):
+        """<comment-ja>
+        複数のカウンターをまとめてインクリメントします。
+        @param keys: キー、または(キー, attr)のリスト
+        @param attr: キーだけを指定した要素に適用するattr
+        </comment-ja>
+        <comment-en>
+        Count up several counters at once, under one lock and with one
+        modification time. keys is a list of keys or of (key, attr);
+        attr applies to the plain keys.
+        </comment-en>
+        """
+        now = time.time()
+        with self.db.lock:
+            for key in keys:
+                if isinstance(key, tuple):
+                    self._up(key[0],key[1],now)
+                else:
+                    self._up(key,attr,now)
+        return True
 
     def reset(self,key,attr=None,value=0):
-        retval = False
-
         now = time.time()
-        if (key in self.db) == 1:
-            data = self.get(key)
+        with self.db.lock:
+            data = self.db.get(key)
+            if data is not None:
+                if attr is None:
+                    data[0] = value
+                    data[1] = value
+                    data[3] = now
+                    data[4] = now
+                elif attr == "total":
+                    data[0] = value
+                    data[3] = now
+                elif attr == "hitcount":
+                    data[1] = value
+                    data[4] = now
+                elif attr == "continuation":
+                    data[3] = value
+                elif attr == "action":
+                    data[6] = 0
 
-            if attr is None:
-                data[0] = value
-                data[1] = value
-                data[3] = now
-                data[4] = now
-            elif attr == "total":
-                data[0] = value
-                data[3] = now
-            elif attr == "hitcount":
-                data[1] = value
-                data[4] = now
-            elif attr == "continuation":
-                data[3] = value
-            elif attr == "action":
-                data[6] = 0
-
-        else:
-            data = [value,value,value,now,now,now,0]
-
-        try:
-            self.set(key,data)
-            retval = True
-        except:
-            pass
+            else:
+                data = [value,value,value,now,now,now,0]
 
-        return retval
+            self.db.put(key,data)
+        return True
 
 
 if __name__ == '__main__':
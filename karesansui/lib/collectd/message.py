@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui Core.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+"""
+collectdの通知メッセージを解析する
+
+Filter(target_notification)のメッセージはdictの文字列、Thresholdのメッセージは
+定型文なので、それぞれから値を取り出す。
+"""
+
+import re
+import ast
+
+# message of the threshold plugin. Only the last groups are used; the
+# others are non-greedy so that they cannot make the match backtrack far.
+THRESHOLD_MESSAGE_REGEX = re.compile(
+    r"^Host (?P<host>.+?), plugin (?P<plugin>.+?)(?: \(instance (?P<plugin_instance>.+?)\))? type (?P<type>.+?)(?: \(instance (?P<type_instance>.+?)\))?: "
+    r"Data source \"(?P<ds_name>[^\"]+)\" is currently (?P<ds_value>[^ ]+)\. "
+    r"That is (?:below|above) the (?:failure|warning) threshold of (?P<ts_value>[\-0-9\.]+)(?P<percent_flag>%?)\.")
+
+# "(msg {...})" appended to the threshold message
+MSG_DICT_REGEX = re.compile(r". \(msg (?P<msg_dict>{.+})")
+
+# dict literals holding only quoted strings, as in the Message option of
+# the filter chain, are split without the parser of ast.literal_eval().
+FLAT_DICT_REGEX = re.compile(r"\{\s*(?:'[^'\\]*'\s*:\s*'[^'\\]*'\s*(?:,\s*|(?=\})))*\}\Z")
+FLAT_DICT_ITEM_REGEX = re.compile(r"'([^'\\]*)'\s*:\s*'([^'\\]*)'")
+
+def literal_dict(string):
+    """<comment-ja>
+    dictの文字列を評価せずに解析します。
+    @return: dict、解析できない場合はNone
+    </comment-ja>
+    <comment-en>
+    Parse a dict literal without evaluating it, or return None.
+    </comment-en>
+    """
+    if FLAT_DICT_REGEX.match(string):
+        return dict(FLAT_DICT_ITEM_REGEX.findall(string))
+    try:
+        value = ast.literal_eval(string)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return None
+    if not isinstance(value, dict):
+        return None
+    return value
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def decode_message(message):
+    """<comment-ja>
+    通知メッセージから値を取り出します。
+    @param message: notify.message
+    @return: ds_name, ds_value, ts_value, percentage, msg, extras, params をキーとしたdict
+             (ds_valueはfloat、取り出せない値はNone)
+    </comment-ja>
+    <comment-en>
+    Take the values out of a notification message.
+    Messages of the filter chain are dict literals and are parsed with
+    ast.literal_eval(); messages of the threshold plugin are matched with
+    THRESHOLD_MESSAGE_REGEX. Returns a dict of ds_name, ds_value (float),
+    ts_value, percentage, msg, extras and params; missing values are None.
+    </comment-en>
+    """
+    result = {"ds_name"    : None,
+              "ds_value"   : None,
+              "ts_value"   : None,
+              "percentage" : False,
+              "msg"        : None,
+              "extras"     : None,
+              "params"     : None,
+              }
+
+    if message[0:2] == "{'":
+        fields = literal_dict(message)
+        if fields is not None:
+            result["ds_value"] = fields.get("ds_value")
+            result["msg"]      = fields.get("msg")
+            if isinstance(fields.get("dict"), dict):
+                result["extras"] = fields["dict"]
+    else:
+        result["msg"] = message
+        m = THRESHOLD_MESSAGE_REGEX.match(message)
+        if m:
+            result["ds_name"]  = m.group('ds_name')
+            result["ds_value"] = m.group('ds_value')
+            result["ts_value"] = m.group('ts_value')
+            if m.group('percent_flag') == "%":
+                result["percentage"] = True
+
+        m = MSG_DICT_REGEX.search(message)
+        if m:
+            params = literal_dict(m.group('msg_dict'))
+            if params is not None:
+                result["params"] = params
+                if "ds" in params:
+                    result["ds_name"] = params["ds"]
+
+    result["ds_value"] = to_float(result["ds_value"])
+    return result
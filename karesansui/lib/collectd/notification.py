@@ -125,6 +125,8 @@ from karesansui import __version__, __release__, __app__
 from karesansui.lib.const            import COUNTUP_DATABASE_PATH, \
                                             KARESANSUI_SYSCONF_DIR
 from karesansui.lib.collectd.countup import CountUp
+from karesansui.lib.collectd.message import decode_message
+from karesansui.lib.collectd.action.dispatcher import get_dispatcher, stop_dispatcher
 from karesansui.lib.utils            import ucfirst
 
 NOTIF_FAILURE = 1<<0
@@ -215,19 +217,31 @@ def init():
     except:
         pass
 
-def append_log(string,level=1):
+def shutdown():
+    # 残っているアクションを実行してから終了する
+    abandoned = stop_dispatcher(30)
+    if abandoned > 0:
+        append_log("Warning: %d queued actions were abandoned at shutdown." % abandoned,1)
+
+def append_log(string,level=1,notification_id=None):
     global logfile
     global loglevel
     global uniq_id
 
+    if not loglevel & level:
+        return
+
+    # アクションのワーカースレッドからは、呼出時のuniq_idを渡す
+    if notification_id is None:
+        notification_id = uniq_id
+
     try:
-        string = "[%f] %s" % (uniq_id,str(string),)
+        string = "[%f] %s" % (notification_id,str(string),)
     except:
-        string = "[%f] %s" % (uniq_id,string,)
+        string = "[%f] %s" % (notification_id,string,)
 
     from karesansui.lib.collectd.utils import append_line
-    if loglevel & level:
-        append_line(logfile,string)
+    append_line(logfile,string)
 
 def notification(notify=None, data=None):
     global countup_db_path
@@ -246,20 +260,6 @@ def notification(notify=None, data=None):
     # 関数読み込み
     from karesansui.lib.collectd.utils import query_watch_data
 
-    ########################################################
-    # データを展開
-    ########################################################
-    if data is dict:
-        for _k,_v in data.items():
-            if _v is bytes:
-                exec("%s = '%s'" % (_k,_v,))
-            else:
-                exec("%s = %s" % (_k,_v,))
-    try:
-        loglevel
-    except:
-        pass
-
     ########################################################
     # システムのログ
     ########################################################
@@ -267,12 +267,13 @@ def notification(notify=None, data=None):
     uniq_id = time.time()
 
     append_log("###################################################",7)
-    append_log("countup_db_path: %s" % (countup_db_path,) ,4)
-    append_log("logfile        : %s" % (logfile,)         ,4)
-    append_log("interval       : %d" % (interval,)        ,4)
-    append_log("environ        : %s" % (environ,)         ,4)
-    append_log("data           : %s" % (data,)            ,4)
-    append_log("",4)
+    if loglevel & 4:
+        append_log("countup_db_path: %s" % (countup_db_path,) ,4)
+        append_log("logfile        : %s" % (logfile,)         ,4)
+        append_log("interval       : %d" % (interval,)        ,4)
+        append_log("environ        : %s" % (environ,)         ,4)
+        append_log("data           : %s" % (data,)            ,4)
+        append_log("",4)
 
 
     ########################################################
@@ -289,16 +290,18 @@ def notification(notify=None, data=None):
     now_str = time.strftime("%c",time.localtime(now))
 
     # logging
-    append_log("plugin         : %s" % (plugin,)           ,7)
-    append_log("plugin_instance: %s" % (plugin_instance,)  ,7)
-    append_log("type           : %s" % (type,)             ,7)
-    append_log("type_instance  : %s" % (type_instance,)    ,7)
-    append_log("host           : %s" % (host,)             ,7)
-    append_log("severity       : %s" % (severity,)         ,7)
-    append_log("message        : %s" % (message,)          ,7)
-    append_log("now            : %s" % (now_str,)          ,4)
-    append_log("",4)
-    append_log("notify         : %s" % (str(dir(notify)),) ,4)
+    if loglevel & 7:
+        append_log("plugin         : %s" % (plugin,)           ,7)
+        append_log("plugin_instance: %s" % (plugin_instance,)  ,7)
+        append_log("type           : %s" % (type,)             ,7)
+        append_log("type_instance  : %s" % (type_instance,)    ,7)
+        append_log("host           : %s" % (host,)             ,7)
+        append_log("severity       : %s" % (severity,)         ,7)
+        append_log("message        : %s" % (message,)          ,7)
+    if loglevel & 4:
+        append_log("now            : %s" % (now_str,)          ,4)
+        append_log("",4)
+        append_log("notify         : %s" % (str(dir(notify)),) ,4)
     """ comment
     append_log("collectd       : %s" % (str(dir(collectd)),)              ,4)
     append_log("collectd.Config: %s" % (str(dir(collectd.Config)),)       ,4)
@@ -310,79 +313,27 @@ def notification(notify=None, data=None):
     ########################################################
     # messageを展開、ds.xxxxをdata_valueとして取り出す
     ########################################################
-    percentage = False
-
-    # messageを展開、ds.xxxxをds_xxxとして取り出す
-    # Filterの時はdict文字列をexec展開して抽出
-    if message[0:2] == "{'":
-        try:
-            exec("ds_value = %s['ds_value']" % message)
-            exec("msg      = %s['msg']"      % message)
-            exec("extras   = %s['dict']"     % message)
-        except:
-            pass
-
-        # dictの設定があれば extra_<key> = <value> で変数展開
-        try:
-            extras
-            for _k,_v in extras.items():
-                exec("extra_%s = %s" % (_k,_v,))
-        except:
-            pass
-
-    # messageを展開、ログからds_valueに取り出す
-    # Thresholdの時はログの文字列から正規表現でデータを抽出
-    else:
-        msg = message
-        regex  = "^Host (?P<host>.+), plugin (?P<plugin>.+)( \(instance (?P<plugin_instance>.+)\))? type (?P<type>.+)( \(instance (?P<type_instance>.+)\))?: "
-        regex += "Data source \"(?P<ds_name>.+)\" is currently (?P<ds_value>.+)\. "
-        regex += "That is (below|above) the (failure|warning) threshold of (?P<ts_value>[\-0-9\.]+)(?P<percent_flag>%?)\."
-
-        m = re.match(regex,message)
-        if m:
-            ds_name  = m.group('ds_name')
-            ds_value = m.group('ds_value')
-            ts_value = m.group('ts_value')
-            if m.group('percent_flag') == "%":
-                percentage = True
-
-        # メッセージの(msg 以下のdict文字列をparamsに展開する
-        regex = ". \(msg (?P<msg_dict>{.+})"
-        m = re.search(regex,message)
-        if m:
-            exec("params = %s" % m.group('msg_dict'))
-            try:
-                ds_name = params["ds"]
-            except:
-                pass
-
-    # ds_valueが浮動小数点形式の文字列なら数値に変換
-    try:
-        from karesansui.lib.utils import float_from_string
-        _ret = float_from_string(ds_value)
-        if _ret is not False:
-            ds_value = float(_ret)
-        else:
-            ds_value = float(ds_value)
-    except:
-        ds_value = None
-
-    try:
-        msg
-    except:
-        msg  = "Host %s, plugin %s type %s (instance %s)\): " % (host,plugin,type,type_instance,)
-        msg += "Data source is currently %s\." % (ds_value)
+    # Filterの時はdict文字列、Thresholdの時はログの文字列から抽出
+    decoded    = decode_message(message)
+    ds_name    = decoded["ds_name"]
+    ds_value   = decoded["ds_value"]
+    ts_value   = decoded["ts_value"]
+    percentage = decoded["percentage"]
+    params     = decoded["params"]
+    msg        = decoded["msg"]
+
+    if msg is None:
+        msg  = "Host %s, plugin %s type %s (instance %s): " % (host,plugin,type,type_instance,)
+        msg += "Data source is currently %s." % (ds_value)
 
     # logging
-    append_log("msg            : %s" % (msg,)        ,4)
-    try:
-        append_log("ds_name        : %s" % (ds_name,),4)
-        append_log("ds_value       : %f" % (ds_value,)   ,4)
-        append_log("ts_value       : %f" % (ts_value,)   ,4)
-    except:
-        pass
-    append_log("percentage     : %s" % (percentage,) ,4)
-    append_log("",4)
+    if loglevel & 4:
+        append_log("msg            : %s" % (msg,)        ,4)
+        append_log("ds_name        : %s" % (ds_name,)    ,4)
+        append_log("ds_value       : %s" % (ds_value,)   ,4)
+        append_log("ts_value       : %s" % (ts_value,)   ,4)
+        append_log("percentage     : %s" % (percentage,) ,4)
+        append_log("",4)
 
     ########################################################
     # watchデータベースからマッチしたデータを取得
@@ -409,57 +360,35 @@ def notification(notify=None, data=None):
     check_span         = 60 * 60 * 6
 
     watch_data = query_watch_data(plugin,plugin_instance,type,type_instance,ds_name,host=host)
-    append_log("watch_data     : %s" % (str(watch_data),) ,4)
-
-    watch_column = [ 'name',
-                     'check_continuation',
-                     'check_span',
-                     'warning_value',
-                     'warning_script',
-                     'warning_mail_body',
-                     'is_warning_percentage',
-                     'is_warning_script',
-                     'is_warning_mail',
-                     'failure_value',
-                     'failure_script',
-                     'failure_mail_body',
-                     'is_failure_percentage',
-                     'is_failure_script',
-                     'is_failure_mail',
-                     'okay_script',
-                     'okay_mail_body',
-                     'is_okay_script',
-                     'is_okay_mail',
-                     'notify_mail_from',
-                     'notify_mail_to']
-    try:
-        for column_name in watch_column:
-            exec("%s = watch_data[0]['%s']" % (column_name,column_name,))
-            exec("_var = %s" % (column_name,))
-            append_log("%s: %s"  % (column_name,_var)   ,4)
-    except:
+    if loglevel & 4:
+        append_log("watch_data     : %s" % (str(watch_data),) ,4)
+
+    if len(watch_data) == 0:
         append_log("Error: cannot get watch data." ,1)
         return
-        #sys.exit(0)
+    watch = watch_data[0]
+    if loglevel & 4:
+        for column_name in sorted(watch.keys()):
+            append_log("%s: %s"  % (column_name,watch[column_name])   ,4)
+
+    name               = watch['name']
+    if watch['check_continuation'] is not None:
+        check_continuation = watch['check_continuation']
+    if watch['check_span'] is not None:
+        check_span         = watch['check_span']
+    notify_mail_from   = watch['notify_mail_from']
+    notify_mail_to     = watch['notify_mail_to']
 
     if severity == NOTIF_OKAY:
-        watch_script    = okay_script
-        watch_mail_body = okay_mail_body
-        watch_is_script = is_okay_script
-        watch_is_mail   = is_okay_mail
         severity_str    = "okay"
     elif severity == NOTIF_WARNING:
-        watch_script    = warning_script
-        watch_mail_body = warning_mail_body
-        watch_is_script = is_warning_script
-        watch_is_mail   = is_warning_mail
         severity_str    = "warning"
     elif severity == NOTIF_FAILURE:
-        watch_script    = failure_script
-        watch_mail_body = failure_mail_body
-        watch_is_script = is_failure_script
-        watch_is_mail   = is_failure_mail
         severity_str    = "failure"
+    watch_script    = watch['%s_script'    % severity_str]
+    watch_mail_body = watch['%s_mail_body' % severity_str]
+    watch_is_script = watch['is_%s_script' % severity_str]
+    watch_is_mail   = watch['is_%s_mail'   % severity_str]
 
     # logging
     append_log("watch_script    :%s" % (watch_script,)    ,4)
@@ -489,20 +418,22 @@ def notification(notify=None, data=None):
     # カウントDBに記録
     ########################################################
     if severity != NOTIF_OKAY:
-        countup.up(gategory_key)
-
         # 何回連続しているか調べる
         # 連続していれば、continuationをインクリメント 
         # いなければ、continuationをリセット
+        # (前回のヒット時刻が不明な場合はcontinuationを変更しない)
         try:
             old_mtime = int(old_mtime)
-            # (インターバル+2)未満のヒットであればインクリメント
-            if now < (old_mtime + interval + 2):
-                countup.up(gategory_key,attr="continuation")
-            else:
-                countup.reset(gategory_key,attr="continuation")
         except:
-            pass
+            old_mtime = None
+        if old_mtime is None:
+            countup.up(gategory_key)
+        # (インターバル+2)未満のヒットであればインクリメント
+        elif now < (old_mtime + interval + 2):
+            countup.up_many([gategory_key,(gategory_key,"continuation")])
+        else:
+            countup.up(gategory_key)
+            countup.reset(gategory_key,attr="continuation")
 
         (total,hitcount,continuation,since,start,mtime,action) = countup.get(gategory_key)
         since_str = time.strftime("%c",time.localtime(since))
@@ -569,21 +500,14 @@ def notification(notify=None, data=None):
         countup.reset(gategory_key,attr="hitcount",value=0)
         countup.reset(gategory_key,attr="continuation")
 
-    # アクションを起こす場合は、totalをリセット
-    if do_action is True:
-        countup.up(gategory_key,attr="action")
-        countup.reset(gategory_key,attr="total")
-
-
-    # カウントDB書き込み終わり
-    countup.finish()
-
     append_log("do_action      : %s" % (do_action,)   ,4)
     append_log("",4)
 
 
     # アクションを起こさない場合は、ここで抜ける
     if do_action is not True:
+        # カウントDB書き込み終わり
+        countup.finish()
         append_log("Notice: Action will be not executed. Aborted.",1)
         return
         #sys.exit(0)
@@ -615,128 +539,139 @@ def notification(notify=None, data=None):
     elif severity == NOTIF_FAILURE:
         alert_msg = "The value of %s (%f) is within the failure region." % (name,ds_value,)
 
-    try:
-        ts_value
+    if ts_value is not None:
         if percentage is True:
             alert_msg += " (threshold:%f%%)" % (float(ts_value),)
         else:
             alert_msg += " (threshold:%f)"   % (float(ts_value),)
-    except:
-        pass
-
-    # ログ書き込み
-    if actions & ACTION_LOG:
-        from karesansui.lib.collectd.action.log import write_log
-
-        if severity == NOTIF_OKAY:
-            priority = "OKAY"
-        elif severity == NOTIF_WARNING:
-            priority = "WARNING"
-        elif severity == NOTIF_FAILURE:
-            priority = "FAILURE"
 
-        write_log(alert_msg,priority=priority)
-        write_log(msg      ,priority="INFO")
-        pass
+    ########################################################
+    # アクションはワーカースレッドで実行する
+    ########################################################
+    dispatcher = get_dispatcher()
+
+    def run_actions(watch_mail_body, notification_id):
+        # ログ書き込み
+        if actions & ACTION_LOG:
+            from karesansui.lib.collectd.action.log import write_log
+
+            if severity == NOTIF_OKAY:
+                priority = "OKAY"
+            elif severity == NOTIF_WARNING:
+                priority = "WARNING"
+            elif severity == NOTIF_FAILURE:
+                priority = "FAILURE"
+
+            write_log(alert_msg,priority=priority)
+            write_log(msg      ,priority="INFO")
+            pass
 
-    # スクリプト実行
-    if actions & ACTION_SCRIPT:
-        from karesansui.lib.collectd.action.script import exec_script
+        # スクリプト実行
+        if actions & ACTION_SCRIPT:
+            from karesansui.lib.collectd.action.script import exec_script
 
-        script = watch_script
-        user   = "root"
+            script = watch_script
+            user   = "root"
 
-        script_retval = False
-        try:
-            script_retval = exec_script(script=script,user=user,msg=alert_msg,watch_name=name,logfile=logfile)
-        except:
-            pass
+            script_retval = False
+            try:
+                script_retval = exec_script(script=script,user=user,msg=alert_msg,watch_name=name,logfile=logfile)
+            except:
+                pass
 
-    # メール送信
-    if actions & ACTION_MAIL:
-        from karesansui.lib.collectd.action.mail import send_mail
-        from karesansui.lib.collectd.utils import get_karesansui_config
+        # メール送信
+        if actions & ACTION_MAIL:
+            from karesansui.lib.collectd.action.mail import send_mail
+            from karesansui.lib.collectd.utils import get_karesansui_config
 
-        try:
-            karesansui_config = get_karesansui_config()
-            smtp_server = karesansui_config['application.mail.server']
-            smtp_port   = int(karesansui_config['application.mail.port'])
-        except:
-            smtp_server = mail_server
-            smtp_port   = mail_port
+            try:
+                karesansui_config = get_karesansui_config()
+                smtp_server = karesansui_config['application.mail.server']
+                smtp_port   = int(karesansui_config['application.mail.port'])
+            except:
+                smtp_server = mail_server
+                smtp_port   = mail_port
 
-        recipient   = notify_mail_to
-        sender      = notify_mail_from
+            recipient   = notify_mail_to
+            sender      = notify_mail_from
 
-        try:
-            lang = os.environ['LANG'].split('.',1)[0]
-            lang = lang.split('_',1)[0]
-        except:
-            lang = "en"
+            try:
+                lang = os.environ['LANG'].split('.',1)[0]
+                lang = lang.split('_',1)[0]
+            except:
+                lang = "en"
 
-        if watch_mail_body == "":
-            NOTIF_MAIL_TMPL_DIR = KARESANSUI_SYSCONF_DIR + "/template"
-            mail_template_file = "%s/%s/collectd_%s_%s.eml" % (NOTIF_MAIL_TMPL_DIR,lang,severity_str,plugin,)
-            append_log("mail_template_file: %s" % mail_template_file,1)
-            if os.path.exists(mail_template_file):
-                watch_mail_body = open(mail_template_file).read()
-        append_log("watch_mail_body: %s" % watch_mail_body,1)
+            if watch_mail_body == "":
+                NOTIF_MAIL_TMPL_DIR = KARESANSUI_SYSCONF_DIR + "/template"
+                mail_template_file = "%s/%s/collectd_%s_%s.eml" % (NOTIF_MAIL_TMPL_DIR,lang,severity_str,plugin,)
+                append_log("mail_template_file: %s" % mail_template_file,1,notification_id)
+                if os.path.exists(mail_template_file):
+                    watch_mail_body = open(mail_template_file).read()
+            append_log("watch_mail_body: %s" % watch_mail_body,1,notification_id)
 
-        try:
-            watch_mail_body = watch_mail_body.encode("UTF-8")
-        except:
-            pass
+            try:
+                watch_mail_body = watch_mail_body.encode("UTF-8")
+            except:
+                pass
 
-        script_result_message = ""
-        CRLF = "\r\n"
-        if actions & ACTION_SCRIPT:
-            script_result_message += CRLF
-            script_result_message += CRLF
-            if script_retval is False:
-                script_result_message += "Error: failed to execute the following script."
-                script_result_message += CRLF
-                script_result_message += script
+            script_result_message = ""
+            CRLF = "\r\n"
+            if actions & ACTION_SCRIPT:
                 script_result_message += CRLF
-            else:
-                script_result_message += "Notice: The action script was executed."
                 script_result_message += CRLF
-                script_result_message += "script return value:%s" % script_retval[0]
-                script_result_message += CRLF
-                if len(script_retval[1]) > 0:
-                    script_result_message += "[Script Output]"
+                if script_retval is False:
+                    script_result_message += "Error: failed to execute the following script."
                     script_result_message += CRLF
-                    script_result_message += "%s" % CRLF.join(script_retval[1])
+                    script_result_message += script
                     script_result_message += CRLF
-
-        macros = {}
-        macros['app_name']        = AppName
-        macros['plugin']          = plugin
-        macros['plugin_instance'] = plugin_instance
-        macros['type']            = type
-        macros['type_instance']   = type_instance
-        macros['host']            = host
-        macros['severity']        = severity_str
-        macros['message']         = message
-        macros['time']            = now_str
-        macros['script_result_message'] = script_result_message
-        try:
+                else:
+                    script_result_message += "Notice: The action script was executed."
+                    script_result_message += CRLF
+                    script_result_message += "script return value:%s" % script_retval[0]
+                    script_result_message += CRLF
+                    if len(script_retval[1]) > 0:
+                        script_result_message += "[Script Output]"
+                        script_result_message += CRLF
+                        script_result_message += "%s" % CRLF.join(script_retval[1])
+                        script_result_message += CRLF
+
+            macros = {}
+            macros['app_name']        = AppName
+            macros['plugin']          = plugin
+            macros['plugin_instance'] = plugin_instance
+            macros['type']            = type
+            macros['type_instance']   = type_instance
+            macros['host']            = host
+            macros['severity']        = severity_str
+            macros['message']         = message
+            macros['time']            = now_str
+            macros['script_result_message'] = script_result_message
             macros['ds']              = ds_name
             macros['current_value']   = ds_value
             macros['threshold_value'] = ts_value
-        except:
-            pass
-        try:
-            params
-            for _k,_v in params.items():
-                exec("macros['%s'] = '%s'" % (_k,str(_v),))
-        except:
-            pass
+            if params is not None:
+                for _k,_v in params.items():
+                    macros[str(_k)] = str(_v)
 
-        from karesansui.lib.collectd.utils import evaluate_macro
-        watch_mail_body = evaluate_macro(watch_mail_body,macros)
+            from karesansui.lib.collectd.utils import evaluate_macro
+            watch_mail_body = evaluate_macro(watch_mail_body,macros)
 
-        send_mail(recipient=recipient,sender=sender,server=smtp_server,port=smtp_port,message=watch_mail_body,extra_message=script_result_message,watch_name=name,logfile=logfile)
-        pass
+            send_mail(recipient=recipient,sender=sender,server=smtp_server,port=smtp_port,message=watch_mail_body,extra_message=script_result_message,watch_name=name,logfile=logfile,connections=dispatcher.smtp)
+            pass
+
+    # アクションを起こした場合だけ、actionを記録してtotalをリセット
+    # (まとめられた、または捨てられたアクションは記録しない)
+    try:
+        if dispatcher.submit((name,severity), run_actions, watch_mail_body, uniq_id) is True:
+            countup.up(gategory_key,attr="action")
+            countup.reset(gategory_key,attr="total")
+        else:
+            append_log("Notice: Action was coalesced or dropped.",1)
+    finally:
+        # カウントDB書き込み終わり
+        countup.finish()
+    if loglevel & 4:
+        append_log("dispatcher     : %s" % (dispatcher.get_metrics(),),4)
 
     """ comment
     collectd.Values(type='cpu',type_instance='steal',
@@ -748,4 +683,5 @@ def notification(notify=None, data=None):
 
 collectd.register_config(config)
 collectd.register_init(init)
+collectd.register_shutdown(shutdown)
 collectd.register_notification(notification,data=optional_data)
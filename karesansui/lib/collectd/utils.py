@@ -24,7 +24,7 @@
 # THE SOFTWARE.
 #
 
-import os, sys, fcntl
+import os, sys, fcntl, time
 
 import karesansui
 from karesansui import KaresansuiLibException
@@ -147,84 +147,112 @@ def threshold_value_to_dict(value):
 
     return value_dict
 
-def query_watch_data(plugin,plugin_instance,type,type_instance,ds,host=None):
-    import karesansui.db
-    kss_engine   = karesansui.db.get_engine()
-    kss_metadata = karesansui.db.get_metadata()
-    kss_session  = karesansui.db.get_session()
+def watch_to_data(watch):
+    return {"name"                  :watch.name,
+            "check_continuation"    :watch.continuation_count,
+            "check_span"            :watch.prohibition_period,
+            "warning_value"         :threshold_value_to_dict(watch.warning_value),
+            "warning_script"        :watch.warning_script,
+            "warning_mail_body"     :watch.warning_mail_body,
+            "is_warning_percentage" :watch.is_warning_percentage,
+            "is_warning_script"     :watch.is_warning_script,
+            "is_warning_mail"       :watch.is_warning_mail,
+            "failure_value"         :threshold_value_to_dict(watch.failure_value),
+            "failure_script"        :watch.failure_script,
+            "failure_mail_body"     :watch.failure_mail_body,
+            "is_failure_percentage" :watch.is_failure_percentage,
+            "is_failure_script"     :watch.is_failure_script,
+            "is_failure_mail"       :watch.is_failure_mail,
+            "okay_script"           :watch.okay_script,
+            "okay_mail_body"        :watch.okay_mail_body,
+            "is_okay_script"        :watch.is_okay_script,
+            "is_okay_mail"          :watch.is_okay_mail,
+            "notify_mail_from"      :watch.notify_mail_from,
+            "notify_mail_to"        :watch.notify_mail_to,
+            }
+
+class WatchRuleIndex:
+    """<comment-ja>
+    監視設定を(plugin, plugin_selector)をキーとして保持します。
+    ttl秒経過するか、データベースファイル(sqlite)が更新されると読み込み直します。
+    </comment-ja>
+    <comment-en>
+    Watch rules, keyed by (plugin, plugin_selector). plugin_selector is
+    made by create_plugin_selector() from plugin_instance, type,
+    type_instance, ds and host, so a lookup is one dict access.
+    All rules are loaded with one query, and loaded again when ttl seconds
+    have passed or, for sqlite, when the database file has changed.
+    </comment-en>
+    """
+
+    def __init__(self, ttl=None):
+        if ttl is None:
+            from karesansui.lib.const import WATCH_INDEX_TTL
+            ttl = WATCH_INDEX_TTL
+        self.ttl = ttl
+        self.rules = None
+        self.loaded = 0
+        self.signature = None
+
+    def _signature(self):
+        bind = karesansui.config.get('database.bind', '')
+        if bind[:10] != 'sqlite:///':
+            return None
+        try:
+            st = os.stat(bind[10:])
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime)
 
+    def load(self):
+        import karesansui.db
+        from karesansui.db.access.watch import findbyall as w_findbyall
+
+        rules = {}
+        kss_session = karesansui.db.get_session()
+        try:
+            for watch in w_findbyall(kss_session):
+                key = (str(watch.plugin), str(watch.plugin_selector))
+                rules.setdefault(key, []).append(watch_to_data(watch))
+        finally:
+            kss_session.close()
+        self.rules = rules
+
+    def lookup(self, plugin, plugin_selector):
+        now = time.time()
+        signature = self._signature()
+        if self.rules is None or now >= self.loaded + self.ttl \
+           or signature != self.signature:
+            self.load()
+            self.loaded = now
+            self.signature = signature
+        return list(self.rules.get((str(plugin), str(plugin_selector)), []))
+
+_watch_index = None
+
+def get_watch_index():
+    """<comment-ja>
+    監視設定のインデックスを返します。(Optimistic Singleton)
+    </comment-ja>
+    <comment-en>
+    Return the WatchRuleIndex of this process.
+    </comment-en>
+    """
+    global _watch_index
+    if _watch_index is None:
+        _watch_index = WatchRuleIndex()
+    return _watch_index
+
+def query_watch_data(plugin,plugin_instance,type,type_instance,ds,host=None):
     myhostname = os.uname()[1]
     if host == myhostname:
         host = None
 
-    from karesansui.db.access.watch import    \
-        findbyall       as w_findbyall,       \
-        findby1         as w_findby1,         \
-        findby1name     as w_findby1name,     \
-        findbyallplugin as w_findbyallplugin, \
-        findbyand       as w_findbyand
-
-    retval = []
-
     plugin_selector = create_plugin_selector(plugin_instance,type,type_instance,ds,host)
     try:
-        watchs = w_findbyallplugin(kss_session,plugin)
-        for watch in watchs:
-            if str(plugin_selector) == str(watch.plugin_selector):
-                name  = watch.name
-
-                check_continuation = watch.continuation_count
-                check_span         = watch.prohibition_period
-
-                warning_value     = threshold_value_to_dict(watch.warning_value)
-                warning_script    = watch.warning_script
-                warning_mail_body = watch.warning_mail_body
-                is_warning_percentage = watch.is_warning_percentage
-                is_warning_script     = watch.is_warning_script
-                is_warning_mail       = watch.is_warning_mail
-
-                failure_value     = threshold_value_to_dict(watch.failure_value)
-                failure_script    = watch.failure_script
-                failure_mail_body = watch.failure_mail_body
-                is_failure_percentage = watch.is_failure_percentage
-                is_failure_script     = watch.is_failure_script
-                is_failure_mail       = watch.is_failure_mail
-
-                okay_script    = watch.okay_script
-                okay_mail_body = watch.okay_mail_body
-                is_okay_script = watch.is_okay_script
-                is_okay_mail   = watch.is_okay_mail
-
-                notify_mail_from  = watch.notify_mail_from
-                notify_mail_to    = watch.notify_mail_to
-
-                data = {"name"                  :name,
-                        "check_continuation"    :check_continuation,
-                        "check_span"            :check_span,
-                        "warning_value"         :warning_value,
-                        "warning_script"        :warning_script,
-                        "warning_mail_body"     :warning_mail_body,
-                        "is_warning_percentage" :is_warning_percentage,
-                        "is_warning_script"     :is_warning_script,
-                        "is_warning_mail"       :is_warning_mail,
-                        "failure_value"         :failure_value,
-                        "failure_script"        :failure_script,
-                        "failure_mail_body"     :failure_mail_body,
-                        "is_failure_percentage" :is_failure_percentage,
-                        "is_failure_script"     :is_failure_script,
-                        "is_failure_mail"       :is_failure_mail,
-                        "okay_script"           :okay_script,
-                        "okay_mail_body"        :okay_mail_body,
-                        "is_okay_script"        :is_okay_script,
-                        "is_okay_mail"          :is_okay_mail,
-                        "notify_mail_from"      :notify_mail_from,
-                        "notify_mail_to"        :notify_mail_to,
-                        }
-                retval.append(data)
+        return get_watch_index().lookup(plugin, plugin_selector)
     except:
-        pass
-
-    return retval
+        return []
 
 
 def evaluate_macro(string,macros={}):
@@ -34,7 +34,9 @@ from karesansui.lib.const import KARESANSUI_PREFIX, KARESANSUI_DATA_DIR, \
                                  KARESANSUI_USER, KARESANSUI_GROUP, \
                                  CONFIGURE_COMMAND_READ, CONFIGURE_COMMAND_WRITE
 from karesansui.lib.dict_op import DictOp
-from karesansui.lib.utils import preprint_r, r_chmod, r_chown, r_chgrp, base64_encode
+from karesansui.lib import dict_op_wire
+from karesansui.lib.conf_server import read_conf_from_server
+from karesansui.lib.utils import r_chmod, r_chown, r_chgrp, base64_encode
 
 CONF_TMP_DIR = "%s/tmp/.conf" % (KARESANSUI_DATA_DIR,)
 
@@ -64,6 +66,15 @@ def read_conf(modules, webobj=None, machine=None, extra_args={}):
     except:
         pass
 
+    # ask the configuration read server (bin/read_conf_server.py) first.
+    conf_arrs = read_conf_from_server(modules, include=options.get('include'))
+    if conf_arrs is not None:
+        dop = DictOp()
+        for module in modules:
+            if module in conf_arrs:
+                dop.addconf(module, conf_arrs[module])
+        return dop
+
     #cmd_name = u"Get Settings - %s" % ":".join(modules)
     cmd_name = "Get Settings" 
 
@@ -115,17 +126,15 @@ def read_conf(modules, webobj=None, machine=None, extra_args={}):
 
         cmd_res = "\n".join(res)
 
-    dop = DictOp()
     try:
-        exec(cmd_res)
+        conf_arrs = dict_op_wire.loads(cmd_res)
     except Exception:
         return False
 
+    dop = DictOp()
     for module in modules:
-        try:
-            exec("dop.addconf('%s',Config_Dict_%s)" % (module,module,))
-        except:
-            pass
+        if module in conf_arrs:
+            dop.addconf(module, conf_arrs[module])
 
     return dop
 
@@ -163,8 +172,8 @@ def write_conf(dop, webobj=None, machine=None, modules=[], extra_args={}):
     for _module in modules:
         if _module in dop.ModuleNames:
             filename = "%s/%s.%s" % (CONF_TMP_DIR,_module,serial,)
-            data = preprint_r(dop.getconf(_module),return_var=True)
-            ConfigFile(filename).write(data+"\n")
+            data = dict_op_wire.dumps(_module,dop.getconf(_module))
+            ConfigFile(filename).write(data)
             r_chmod(filename,0o660)
             r_chown(filename,KARESANSUI_USER)
             r_chgrp(filename,KARESANSUI_GROUP)
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui Core.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+"""
+Long-running reader of configuration files.
+
+bin/read_conf_server.py runs ConfigReadServer as root and read_conf() asks it
+for parsed configurations over a UNIX socket, instead of starting
+bin/read_conf.py for every request. The parsed trees are kept per module and
+thrown away when one of the source files (or the directory holding them) is
+changed.
+
+Protocol: the request is one JSON line. The response is a JSON status line,
+followed on success by the configurations in the karesansui.lib.dict_op_wire
+format, until the server closes the connection.
+
+  request : {"modules": ["ifcfg", "resolv"], "include": null}
+  response: {"status": "ok"}
+            {"format":"karesansui-dictop","version":1,"module":"ifcfg"}
+            ...
+            {"status": "error", "message": "..."}
+"""
+
+import os
+import re
+import json
+import stat
+import socket
+import logging
+import threading
+import importlib
+import socketserver
+
+from karesansui.lib import dict_op_wire
+from karesansui.lib.const import CONFIGURE_SERVER_SOCKET, \
+                                 CONFIGURE_SERVER_TIMEOUT
+
+MODULE_NAME_REGEX = re.compile(r"^[a-z][a-z0-9_]*$")
+
+logger = logging.getLogger('karesansui.lib.conf_server')
+
+def _file_signature(paths):
+    """<comment-ja>
+    ファイルとそのディレクトリの更新情報を返します。
+    </comment-ja>
+    <comment-en>
+    Return (path, inode, size, mtime) of the files and of the directories
+    holding them, so files being added or removed are noticed too.
+    </comment-en>
+    """
+    signature = []
+    for path in sorted(set(paths) | set([os.path.dirname(x) for x in paths])):
+        try:
+            st = os.stat(path)
+            signature.append((path, st.st_ino, st.st_size, st.st_mtime_ns))
+        except OSError:
+            signature.append((path, None, None, None))
+    return tuple(signature)
+
+class ConfigReadCache:
+    """<comment-ja>
+    パーサーで読み込んだ設定をモジュール毎に保持します。
+    </comment-ja>
+    <comment-en>
+    Parsed configurations, per (module, include).
+    Entries are validated against the mtime of the parser's source files on
+    every lookup, which costs a few stat() calls. Parsers whose data also
+    holds command output (_cacheable = False, e.g. the iptables status)
+    are read every time.
+    </comment-en>
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get_parser(self, module):
+        if MODULE_NAME_REGEX.match(module) is None:
+            raise ValueError("invalid module name - %s" % module)
+        mod = importlib.import_module("karesansui.lib.parser.%s" % module)
+        return getattr(mod, "%sParser" % module)()
+
+    def get(self, module, include=None):
+        key = (module, include)
+        with self.lock:
+            parser = self.get_parser(module)
+            if getattr(parser, "_cacheable", True) is False:
+                return parser.read_conf(extra_args={"include": include})
+            sources = parser.source_file()
+            signature = _file_signature(sources)
+
+            try:
+                (cached_signature, conf_arr) = self.entries[key]
+                if len(sources) > 0 and cached_signature == signature:
+                    return conf_arr
+            except KeyError:
+                pass
+
+            conf_arr = parser.read_conf(extra_args={"include": include})
+            self.entries[key] = (signature, conf_arr)
+            logger.debug('Parsed configuration - module=%s, include=%s' % (module, include))
+            return conf_arr
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+
+class ConfigReadHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line.decode("utf-8"))
+            config = []
+            for module in request["modules"]:
+                config.append((module, self.server.cache.get(module, request.get("include"))))
+        except Exception as e:
+            logger.warn('Failed to read configuration - %s' % str(e))
+            response = {"status": "error", "message": str(e)}
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            return
+
+        self.wfile.write(json.dumps({"status": "ok"}).encode("utf-8") + b"\n")
+        for (module, conf_arr) in config:
+            for wire_line in dict_op_wire.iterencode(module, conf_arr):
+                self.wfile.write(wire_line.encode("utf-8") + b"\n")
+
+class ConfigReadServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """<comment-ja>
+    UNIXソケットで設定の読み込み要求を受け付けます。
+    </comment-ja>
+    <comment-en>
+    Answer configuration read requests on a UNIX socket.
+    </comment-en>
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path=CONFIGURE_SERVER_SOCKET, group=None, mode=0o660):
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+        socketserver.UnixStreamServer.__init__(self, path, ConfigReadHandler)
+        if group is not None:
+            import grp
+            os.chown(path, -1, grp.getgrnam(group).gr_gid)
+        os.chmod(path, mode)
+        self.cache = ConfigReadCache()
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+def read_conf_from_server(modules, include=None,
+                          path=CONFIGURE_SERVER_SOCKET,
+                          timeout=CONFIGURE_SERVER_TIMEOUT):
+    """<comment-ja>
+    設定読み込みサーバーから設定を取得します。
+    @return: モジュール名をキーとした設定の辞書、サーバーが利用できない場合はNone
+    </comment-ja>
+    <comment-en>
+    Ask the configuration read server for modules.
+    Returns {module: conf_arr}, or None when the server is not running or
+    fails, so that the caller can fall back to bin/read_conf.py.
+    </comment-en>
+    """
+    if not os.path.exists(path):
+        return None
+
+    request = json.dumps({"modules": modules, "include": include})
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            sock.sendall(request.encode("utf-8") + b"\n")
+            fp = sock.makefile("rb")
+
+            response = json.loads(fp.readline().decode("utf-8"))
+            if response.get("status") != "ok":
+                logger.warn('Configuration read server error - %s' % response.get("message"))
+                return None
+            return dict_op_wire.load(fp)
+
+        except (socket.error, socket.timeout) as e:
+            logger.debug('Configuration read server is not available - %s' % str(e))
+            return None
+        except ValueError as e:
+            logger.warn('Invalid response from configuration read server - %s' % str(e))
+            return None
+    finally:
+        sock.close()
@@ -76,17 +76,50 @@ XEN_SYSCONF_DIR    = "/etc/xen"
 
 #LOGOUT_FILE_PREFIX = "%s/logout." % karesansui.config['application.tmp.dir']
 LOGOUT_FILE_PREFIX = KARESANSUI_TMP_DIR + "/logout."
+AUTH_CACHE_SIZE = 256
+AUTH_CACHE_TTL = 300
+AUTH_CACHE_STAMP_FILE = KARESANSUI_TMP_DIR + "/.auth_stamp"
 ICON_DIR_TPL = "%s/static/icon/%s"
 MSG_LIMIT = 5
 TAG_CLIPPING_RANGE = 12
 MACHINE_NAME_CLIPPING_RANGE = 20
 
+# use for template
+TEMPLATE_MODULE_DIR = KARESANSUI_TMP_DIR + "/.mako"
+TEMPLATE_EXTENSIONS = (".html", ".part", ".input", ".json", ".js")
+
+# use for static files
+STATIC_FINGERPRINT_LENGTH = 12
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+STATIC_CHUNK_SIZE = 64 * 1024
+STATIC_COMPRESS_TYPES = ("css", "js")
+STATIC_CONTENT_TYPES = {"css"  : "text/css; charset=utf-8",
+                        "js"   : "text/javascript; charset=utf-8",
+                        "png"  : "image/png",
+                        "gif"  : "image/gif",
+                        "jpg"  : "image/jpeg",
+                        "jpeg" : "image/jpeg",
+                        "ico"  : "image/x-icon",
+                        "jar"  : "application/java-archive",
+                        }
+
 DEFAULT_LIST_RANGE = 10
 JOB_LIST_RANGE = DEFAULT_LIST_RANGE
 USER_LIST_RANGE = DEFAULT_LIST_RANGE
 TAG_LIST_RANGE = DEFAULT_LIST_RANGE
 WATCH_LIST_RANGE = DEFAULT_LIST_RANGE
 MAILTEMPLATE_LIST_RANGE = DEFAULT_LIST_RANGE
+# seconds a COUNT of a paged query is reused (0: not cached)
+PAGER_COUNT_CACHE_TTL = 10
+PAGER_COUNT_CACHE_SIZE = 64
+# most results of a search through the search index that is not paged
+SEARCH_RESULT_LIMIT = 1000
+# jobgroups looked up in the pysilhouette database per query
+JOBGROUP_SUMMARY_CHUNK_SIZE = 500
+# job history retention (bin/archive_jobs.py)
+JOB_ARCHIVE_DIR = KARESANSUI_DATA_DIR + "/archive"
+JOB_ARCHIVE_BATCH_SIZE = 500
+JOB_ARCHIVE_INTERVAL = 0.1
 
 # use for virt library
 VIRT_LIBVIRT_DATA_DIR    = "/var/lib/libvirt"
@@ -95,6 +128,11 @@ VIRT_XENDOMAINS_AUTO_DIR = XEN_SYSCONF_DIR + "/auto"
 VIRT_LIBVIRT_SOCKET_RW = VENDOR_LIBVIRT_RUN_DIR + "/libvirt-sock";
 VIRT_LIBVIRT_SOCKET_RO = VENDOR_LIBVIRT_RUN_DIR + "/libvirt-sock-ro";
 
+# seconds before watching the domain events of a hypervisor is tried
+# again after a failure (doubled on every failure up to the max)
+VIRT_EVENT_RETRY_MIN = 10
+VIRT_EVENT_RETRY_MAX = 600
+
 # kvm
 KVM_VIRTUAL_DISK_PREFIX = "hd"
 KVM_VIRT_CONFIG_DIR  = "/etc/karesansui/virt/kvm"
@@ -184,6 +222,8 @@ ISCSI_COMMAND_STOP = "stop_iscsi.py"
 ISCSI_COMMAND_UPDATE = "update_iscsi.py"
 CONFIGURE_COMMAND_READ = "read_conf.py"
 CONFIGURE_COMMAND_WRITE = "write_conf.py"
+CONFIGURE_SERVER_SOCKET = KARESANSUI_TMP_DIR + "/.read_conf.sock"
+CONFIGURE_SERVER_TIMEOUT = 10
 IPTABLES_COMMAND_CONTROL = "control_iptables.py"
 SERVICE_COMMAND_START = "start_service.py"
 SERVICE_COMMAND_STOP = "stop_service.py"
@@ -337,10 +377,15 @@ DEFAULT_XEN_DISK_FORMAT = "raw"
 # use for log
 LOG_EPOCH_REGEX = r"(^[0-9]+\.[0-9]+)"
 LOG_SYSLOG_REGEX = r"(^[a-zA-Z]{3} [ 0-9]{2} [0-9]{2}:[0-9]{2}:[0-9]{2})"
+LOG_INDEX_DIR = KARESANSUI_TMP_DIR + "/.logindex"
+LOG_INDEX_INTERVAL = 64 * 1024
 
 # use for collectd
 COLLECTD_LOG_DIR  = "/var/log/collectd"
 COLLECTD_DATA_DIR = "%s/collectd" % VENDOR_DATA_DIR
+COLLECTD_RRDCACHED_ADDRESS = "unix:/var/run/rrdcached/rrdcached.sock"
+# rrdcached may hold data points for this many seconds (its -w plus -z).
+COLLECTD_RRDCACHED_FLUSH_WINDOW = 3600
 
 COLLECTD_PLUGIN_CPU = "cpu"
 COLLECTD_PLUGIN_DF = "df"
@@ -370,6 +415,8 @@ WATCH_PLUGINS = {"cpu"       : COLLECTD_PLUGIN_CPU,
                  "load"      : COLLECTD_PLUGIN_LOAD,
                  "memory"    : COLLECTD_PLUGIN_MEMORY,
                  }
+# seconds the notification plugin keeps watch rules without reloading them.
+WATCH_INDEX_TTL = 60
 
 COLLECTD_CPU_TYPE = "cpu"
 COLLECTD_CPU_TYPE_INSTANCE = {"IDLE" : "idle",
@@ -433,6 +480,12 @@ COLLECTD_LIBVIRT_TYPE = {"CPU_TOTAL" : "virt_cpu_total",
 COLLECTD_DF_RRPORT_BY_DEVICE = True
 
 COUNTUP_DATABASE_PATH = KARESANSUI_DATA_DIR + "/notify_count.db"
+COUNTUP_CHECKPOINT_INTERVAL = 300
+COUNTUP_JOURNAL_MAX = 10000
+ALERT_ACTION_WORKERS = 2
+ALERT_ACTION_QUEUE_SIZE = 100
+ALERT_ACTION_COALESCE_WINDOW = 60
+ALERT_SMTP_IDLE_TIMEOUT = 60
 VALUE_BOUNDS_UPPER = "1"
 VALUE_BOUNDS_LOWER = "0"
 
@@ -493,6 +546,10 @@ MAIL_TEMPLATE_COLLECTD_OKAY = {COLLECTD_PLUGIN_CPU:"collectd_okay_cpu.eml",
 SERVICE_XML_FILE  = KARESANSUI_SYSCONF_DIR + "/service.xml"
 
 # use for Report
+GRAPH_CACHE_SIZE = 32 * 1024 * 1024
+GRAPH_CACHE_DEFAULT_STEP = 10
+GRAPH_RENDER_WORKERS = 4
+GRAPH_BATCH_MAX = 32
 GRAPH_COMMON_PARAM = [
     "--imgformat", "PNG",
     "--font", "TITLE:0:IPAexGothic",
@@ -534,6 +591,9 @@ YES_CMD = ("echo", "y")
 # !! Genuine value in collectd config file (/etc/collectd.conf).
 WATCH_INTERVAL = 10
 
+# maximum seconds to wait for guest state changes (long-poll)
+GUEST_STATUS_WAIT_TIMEOUT = 30
+
 # use for network bonding
 BONDING_MODE = {"0" : 0,
                 "1" : 1,
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui Core.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+"""
+JSON-lines wire format of DictOp configuration trees.
+
+A stream holds one or more modules. Each module starts with a header line,
+followed by one line per leaf of the tree in depth-first order.
+
+  {"format":"karesansui-dictop","version":1,"module":"resolv"}
+  [0,["/etc/resolv.conf","value","nameserver","value"],["192.168.0.1",[["# comment"],null]]]
+  [3,["action"],"set"]
+  [1,["@ORDERS","value"],[["nameserver"]]]
+
+A leaf line is [shared, keys, value]: the first 'shared' keys of the path are
+the same as the previous leaf's, 'keys' are the rest of it. Non-empty dicts are
+never leaves, so comments, actions and @ORDERS lists are carried as-is and the
+insertion order of every dict is kept. Path keys keep their JSON type
+(string or number). Tuples in values come back as lists.
+"""
+
+import json
+
+WIRE_FORMAT  = "karesansui-dictop"
+WIRE_VERSION = 1
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",",":"))
+
+def is_wire_format(data):
+    """<comment-ja>
+    文字列がこの形式のヘッダーで始まっているかを返します。
+    </comment-ja>
+    <comment-en>
+    Tell whether data starts with a header line of this format.
+    </comment-en>
+    """
+    if isinstance(data, bytes):
+        data = data.decode("utf-8", "replace")
+    data = data.lstrip()
+    if not data.startswith("{"):
+        return False
+    try:
+        header = json.loads(data.split("\n", 1)[0])
+    except ValueError:
+        return False
+    return isinstance(header, dict) and header.get("format") == WIRE_FORMAT
+
+def iterencode(module, conf_arr):
+    """<comment-ja>
+    設定配列を1行ずつエンコードします。
+    @param module: モジュール名
+    @param conf_arr: 設定配列
+    @return: 行(改行なし)のジェネレーター
+    </comment-ja>
+    <comment-en>
+    Encode conf_arr of module, yielding one line (without newline) at a time.
+    </comment-en>
+    """
+    encode = _encoder.encode
+    yield encode({"format":WIRE_FORMAT, "version":WIRE_VERSION, "module":module})
+
+    if not isinstance(conf_arr, dict):
+        yield encode([0, [], conf_arr])
+        return
+
+    prev = []
+    path = []
+    stack = [iter(conf_arr.items())]
+    while stack:
+        try:
+            (key, value) = next(stack[-1])
+        except StopIteration:
+            stack.pop()
+            if path:
+                path.pop()
+            continue
+
+        if isinstance(value, dict) and value:
+            path.append(key)
+            stack.append(iter(value.items()))
+            continue
+
+        leaf = path + [key]
+        shared = 0
+        limit = min(len(prev), len(leaf))
+        while shared < limit and prev[shared] == leaf[shared]:
+            shared += 1
+        yield encode([shared, leaf[shared:], value])
+        prev = leaf
+
+def dumps(module, conf_arr):
+    """<comment-ja>
+    設定配列をエンコードした文字列を返します。
+    </comment-ja>
+    <comment-en>
+    Return conf_arr of module encoded as a string.
+    Streams of several modules can be concatenated.
+    </comment-en>
+    """
+    return "\n".join(iterencode(module, conf_arr)) + "\n"
+
+class DictOpWireDecoder:
+    """<comment-ja>
+    1行ずつ与えて設定配列を復元します。
+    </comment-ja>
+    <comment-en>
+    Streaming decoder. Lines can be fed as they arrive (e.g. from a pipe or
+    a socket); the decoded trees are in 'result', keyed by module name.
+    </comment-en>
+    """
+
+    def __init__(self):
+        self.result = {}
+        self.module = None
+        self.path = []
+        self.nodes = []
+
+    def feed(self, line):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.strip()
+        if not line:
+            return
+
+        item = json.loads(line)
+        if isinstance(item, dict):
+            if item.get("format") != WIRE_FORMAT:
+                raise ValueError("unknown format - %s" % item.get("format"))
+            if item.get("version") != WIRE_VERSION:
+                raise ValueError("unsupported version - %s" % item.get("version"))
+            self.module = item["module"]
+            self.result[self.module] = {}
+            self.path = []
+            self.nodes = [self.result[self.module]]
+            return
+
+        if self.module is None:
+            raise ValueError("missing header line")
+        (shared, keys, value) = item
+
+        path = self.path[:shared] + keys
+        if not path:
+            self.result[self.module] = value
+            self.path = []
+            self.nodes = [value]
+            return
+
+        nodes = self.nodes[:shared + 1]
+        node = nodes[-1]
+        for key in path[len(nodes) - 1:-1]:
+            node = node.setdefault(key, {})
+            nodes.append(node)
+        node[path[-1]] = value
+
+        self.path = path
+        self.nodes = nodes
+
+def loads(data):
+    """<comment-ja>
+    文字列をデコードし、モジュール名をキーとした設定配列の辞書を返します。
+    </comment-ja>
+    <comment-en>
+    Decode data and return {module: conf_arr}.
+    </comment-en>
+    """
+    if isinstance(data, bytes):
+        data = data.decode("utf-8")
+    decoder = DictOpWireDecoder()
+    for line in data.split("\n"):
+        decoder.feed(line)
+    return decoder.result
+
+def load(fp):
+    """<comment-ja>
+    ファイルオブジェクトから読み込んでデコードします。
+    </comment-ja>
+    <comment-en>
+    Decode from the file object fp line by line.
+    </comment-en>
+    """
+    decoder = DictOpWireDecoder()
+    for line in fp:
+        decoder.feed(line)
+    return decoder.result
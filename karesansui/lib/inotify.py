@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui Core.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+import os
+import time
+import errno
+import select
+import struct
+import logging
+
+try:
+    import ctypes
+    import ctypes.util
+    _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    _libc.inotify_init.restype = ctypes.c_int
+    _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    _libc.inotify_add_watch.restype = ctypes.c_int
+except (ImportError, OSError, AttributeError):
+    _libc = None
+
+IN_MODIFY      = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+# polling interval used when inotify is not available.
+POLL_INTERVAL_MIN = 0.05
+
+logger = logging.getLogger('karesansui.lib.inotify')
+
+class FileWatcher:
+    """<comment-ja>
+    ファイルの更新を待ち合わせます。
+    inotifyが利用できない環境では短い間隔から徐々に延ばすポーリングで待ちます。
+    </comment-ja>
+    <comment-en>
+    Wait until a file is modified.
+    Files are watched through their directory, so journal files written next to
+    them (e.g. sqlite's -journal and -wal) also wake the waiter. When inotify is
+    not available, wait() falls back to a backoff sleep starting at
+    POLL_INTERVAL_MIN.
+    </comment-en>
+    """
+
+    def __init__(self, path=None,
+                 mask=IN_MODIFY|IN_CLOSE_WRITE|IN_MOVED_TO|IN_CREATE|IN_DELETE):
+        self.path = path
+        self.fd = None
+        self.interval = POLL_INTERVAL_MIN
+        if path is None or _libc is None:
+            return
+
+        dirname = os.path.dirname(os.path.abspath(path))
+        self.prefix = os.path.basename(path).encode("utf-8")
+        fd = _libc.inotify_init()
+        if fd < 0:
+            logger.debug('inotify_init failed - errno=%d' % ctypes.get_errno())
+            return
+        if _libc.inotify_add_watch(fd, dirname.encode("utf-8"), mask) < 0:
+            logger.debug('inotify_add_watch failed - path=%s, errno=%d' \
+                         % (dirname, ctypes.get_errno()))
+            os.close(fd)
+            return
+        self.fd = fd
+
+    def is_notified(self):
+        return self.fd is not None
+
+    def wait(self, timeout):
+        """<comment-ja>
+        ファイルが更新されるか、timeout秒経過するまで待ちます。
+        @return: 更新を検知した場合はTrue
+        </comment-ja>
+        <comment-en>
+        Block until the watched file changes or timeout seconds have passed.
+        Returns True if a change was seen.
+        </comment-en>
+        """
+        if timeout <= 0:
+            return False
+
+        if self.fd is None:
+            time.sleep(min(self.interval, timeout))
+            self.interval = self.interval * 2
+            return False
+
+        end_time = time.time() + timeout
+        while True:
+            remaining = end_time - time.time()
+            if remaining <= 0:
+                return False
+            try:
+                (readable, _w, _x) = select.select([self.fd], [], [], remaining)
+            except select.error as e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise
+            if not readable:
+                return False
+            if self._read_events() is True:
+                return True
+
+    def _read_events(self):
+        data = os.read(self.fd, 4096)
+        found = False
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            (wd, mask, cookie, length) = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if name.startswith(self.prefix):
+                found = True
+        return found
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui Core.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+"""
+<comment-ja>
+ログファイルの時刻インデックス
+</comment-ja>
+<comment-en>
+Sparse time index of log files.
+
+For every LOG_INDEX_INTERVAL bytes of a plain log file, the offset and time
+of the first line starting there are kept, together with the time of the
+first and the last line. gzip files only get the time range. Indexes are
+stored as JSON in LOG_INDEX_DIR (the web process cannot write next to the
+files in /var/log) and are extended when the file grows.
+</comment-en>
+"""
+
+import os
+import json
+import time
+import gzip
+import bisect
+import logging
+from hashlib import sha1
+
+from karesansui.lib.const import LOG_INDEX_DIR, LOG_INDEX_INTERVAL
+from karesansui.lib.utils import reverse_file
+
+LOG_INDEX_VERSION = 1
+
+# how many lines are looked at after an index mark to find a timestamp.
+LOG_INDEX_SCAN_LINES = 100
+
+# bytes hashed to notice that a file was truncated and written again.
+LOG_INDEX_HEAD_SIZE = 1024
+
+logger = logging.getLogger('karesansui.lib.log.index')
+
+def parse_log_datetime(line, pattern, time_format):
+    """<comment-ja>
+    ログの1行から時刻を取得します。
+    @return: time.struct_time、時刻がない場合はNone
+    </comment-ja>
+    <comment-en>
+    Return the time of a log line as time.struct_time, or None.
+    </comment-en>
+    """
+    matched = pattern.findall(line)
+    if len(matched) == 0:
+        return None
+    if time_format == "epoch":
+        return time.localtime(float(matched[0]))
+    elif time_format == "syslog":
+        return time.strptime("2000 %s" % matched[0], "%Y %b %d %H:%M:%S")
+    else:
+        return time.strptime(matched[0], time_format)
+
+def index_key(datetime):
+    """<comment-ja>
+    インデックス内で比較に使う時刻の形式に変換します。
+    </comment-ja>
+    <comment-en>
+    Convert a time.struct_time to the form compared in the index.
+    </comment-en>
+    """
+    return list(datetime[:6])
+
+class LogTimeIndex:
+
+    def __init__(self, path, pattern, time_format,
+                 interval=LOG_INDEX_INTERVAL, index_dir=LOG_INDEX_DIR):
+        self.path = path
+        self.pattern = pattern
+        self.time_format = time_format
+        self.interval = interval
+        self.index_dir = index_dir
+
+        name = "%s\0%s\0%s" % (path, pattern.pattern, time_format)
+        self.index_file = "%s/%s.json" % (index_dir, sha1(name.encode("utf-8")).hexdigest())
+        self.data = None
+
+    def _line_time(self, line):
+        try:
+            datetime = parse_log_datetime(line.decode("utf-8", "replace"),
+                                          self.pattern, self.time_format)
+        except ValueError:
+            return None
+        if datetime is None:
+            return None
+        return index_key(datetime)
+
+    def _empty(self, st, head, compressed):
+        return {"version"   : LOG_INDEX_VERSION,
+                "path"      : self.path,
+                "interval"  : self.interval,
+                "compressed": compressed,
+                "inode"     : st.st_ino,
+                "head"      : head,
+                "size"      : 0,
+                "mtime"     : None,
+                "next_mark" : 0,
+                "first"     : None,
+                "last"      : None,
+                "entries"   : [],
+                }
+
+    def load(self):
+        try:
+            data = json.load(open(self.index_file))
+        except (IOError, OSError, ValueError):
+            return None
+        if data.get("version") != LOG_INDEX_VERSION \
+           or data.get("path") != self.path \
+           or data.get("interval") != self.interval:
+            return None
+        return data
+
+    def save(self):
+        try:
+            if not os.path.exists(self.index_dir):
+                os.makedirs(self.index_dir)
+            tmp_file = "%s.%d" % (self.index_file, os.getpid())
+            fp = open(tmp_file, "w")
+            try:
+                json.dump(self.data, fp)
+            finally:
+                fp.close()
+            os.rename(tmp_file, self.index_file)
+        except (IOError, OSError) as e:
+            logger.debug('Failed to save log index - %s : %s' % (self.index_file, str(e)))
+
+    def update(self):
+        """<comment-ja>
+        インデックスを読み込み、ファイルが更新されていれば追加分を登録します。
+        </comment-ja>
+        <comment-en>
+        Load the index and bring it up to date with the file. A file that was
+        replaced or truncated is indexed again from the start.
+        </comment-en>
+        """
+        st = os.stat(self.path)
+        fp = open(self.path, "rb")
+        try:
+            head = fp.read(LOG_INDEX_HEAD_SIZE)
+            compressed = (head[:2] == b"\x1f\x8b")
+            head = sha1(head).hexdigest()
+
+            data = self.load()
+            if data is None or data["inode"] != st.st_ino \
+               or data["size"] > st.st_size \
+               or (data["head"] != head and st.st_size >= LOG_INDEX_HEAD_SIZE):
+                data = self._empty(st, head, compressed)
+
+            if data["size"] == st.st_size and data["mtime"] == st.st_mtime:
+                self.data = data
+                return self.data
+
+            if compressed is True:
+                self._update_compressed(data)
+            else:
+                self._update_plain(data, fp, st.st_size)
+            data["size"] = st.st_size
+            data["mtime"] = st.st_mtime
+            data["head"] = head
+        finally:
+            fp.close()
+
+        self.data = data
+        self.save()
+        return self.data
+
+    def _update_plain(self, data, fp, size):
+        entries = data["entries"]
+        mark = data["next_mark"]
+        while mark < size:
+            if mark == 0:
+                fp.seek(0)
+            else:
+                # skip the rest of the line running over the mark.
+                fp.seek(mark - 1)
+                fp.readline()
+
+            found = False
+            for i in range(LOG_INDEX_SCAN_LINES):
+                offset = fp.tell()
+                line = fp.readline()
+                if not line.endswith(b"\n"):
+                    # the last line is still being written.
+                    break
+                key = self._line_time(line)
+                if key is not None:
+                    if not entries or entries[-1][0] < offset:
+                        entries.append([offset, key])
+                        if data["first"] is None:
+                            data["first"] = key
+                    found = True
+                    break
+
+            if found is False and not line.endswith(b"\n"):
+                break
+            mark = max(mark + self.interval, (fp.tell() // self.interval) * self.interval)
+        data["next_mark"] = mark
+
+        last = self._last_time(open(self.path, "rb"))
+        if last is not None:
+            data["last"] = last
+
+    def _update_compressed(self, data):
+        fp = gzip.open(self.path, "rb")
+        try:
+            for i in range(LOG_INDEX_SCAN_LINES):
+                line = fp.readline()
+                if not line:
+                    break
+                key = self._line_time(line)
+                if key is not None:
+                    data["first"] = key
+                    break
+        finally:
+            fp.close()
+        data["last"] = self._last_time(gzip.open(self.path, "rb"))
+
+    def _last_time(self, fp):
+        rfp = reverse_file(fp)
+        try:
+            for i in range(LOG_INDEX_SCAN_LINES):
+                try:
+                    line = next(rfp)
+                except StopIteration:
+                    break
+                key = self._line_time(line.encode("utf-8"))
+                if key is not None:
+                    return key
+        finally:
+            rfp.close()
+        return None
+
+    def time_range(self):
+        """<comment-ja>
+        ファイルの最初と最後の時刻を返します。
+        </comment-ja>
+        <comment-en>
+        Return (first, last) times of the file, in index_key() form.
+        Either may be None when unknown.
+        </comment-en>
+        """
+        return (self.data["first"], self.data["last"])
+
+    def find_offset(self, datetime):
+        """<comment-ja>
+        指定時刻より後の時刻を持つ最初のインデックス位置を返します。
+        </comment-ja>
+        <comment-en>
+        Return the offset of the first indexed line whose time is later than
+        datetime, or None if there is none. Lines after that offset are
+        assumed to be later too.
+        </comment-en>
+        """
+        entries = self.data["entries"]
+        if not entries:
+            return None
+        keys = [entry[1] for entry in entries]
+        i = bisect.bisect_right(keys, index_key(datetime))
+        if i >= len(entries):
+            return None
+        return entries[i][0]
+
+def get_log_index(path, pattern, time_format):
+    """<comment-ja>
+    更新済みのインデックスを返します。作成できない場合はNoneを返します。
+    </comment-ja>
+    <comment-en>
+    Return an up to date LogTimeIndex of path, or None if it cannot be built.
+    </comment-en>
+    """
+    if pattern is None:
+        return None
+    index = LogTimeIndex(path, pattern, time_format)
+    try:
+        index.update()
+    except (IOError, OSError, EOFError, ValueError) as e:
+        logger.debug('Failed to update log index - %s : %s' % (path, str(e)))
+        return None
+    return index
@@ -42,6 +42,7 @@ except:
 
 from karesansui.lib.const import DEFAULT_DATE_FORMAT, LOG_SYSLOG_REGEX, LOG_EPOCH_REGEX
 from karesansui.lib.utils import reverse_file
+from karesansui.lib.log.index import get_log_index, index_key
 
 def read_all_log(log_configs, max_line, start_datetime="", end_datetime="", keyword=""):
     lines = []
@@ -106,7 +107,7 @@ def is_gzip(fd):
     header = fd.read(2)
     fd.seek(0)
     
-    if header == '\x1f\x8b':
+    if header == b'\x1f\x8b':
         ## GZIP形式
         return 1
     else:
@@ -139,23 +140,28 @@ def read_log(path, max_line, log_config, start_datetime="", end_datetime="", key
         raise Exception("invalid time_format.")
 
 
-    try:
-        fd = open(path, "r")
-    except Exception as e:
-        raise
-        
-    if is_gzip(fd):
-        fd.close()
-        fd = gzip.open(path, "r")
+    # 時刻インデックスで範囲外のファイルを除外し、読み込み開始位置を決める
+    read_end = None
+    if start_datetime or end_datetime:
+        index = get_log_index(path, pattern, time_format)
+        if index is not None:
+            (first, last) = index.time_range()
+            if start_datetime and last is not None and last < index_key(start_datetime):
+                return []
+            if end_datetime and first is not None and first > index_key(end_datetime):
+                return []
+            if end_datetime:
+                read_end = index.find_offset(end_datetime)
 
     # ログの読み込み
     lines = []
     max_line = int(max_line)
 
-    fd = file(path)
+    fd = open(path, "rb")
     if is_gzip(fd):
-        fd = gzip.open(path, "r")
-    fd = reverse_file(fd)
+        fd.close()
+        fd = gzip.open(path, "rb")
+    fd = reverse_file(fd, end=read_end)
     fcntl.lockf(fd.fileno(), fcntl.LOCK_SH)
     try:
         count_line = 0
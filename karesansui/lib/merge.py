@@ -80,48 +80,47 @@ class MergeHost:
                             )
                 notebook = Notebook("", "")
 
-                for guest_name in kvc.list_active_guest() + kvc.list_inactive_guest():
+                for _virt in kvc.search_kvg_guests_by_inventory():
+                    guest_name = _virt.get_domain_name()
                     #print guest_name
                     self.logger.info("Reading guest '%s' on '%s' ..." % (guest_name,uri_join(uri_split(model.hostname),without_auth=True)))
 
-                    _virt = kvc.search_kvg_guests(guest_name)
-                    if len(_virt) > 0:
-                        #uuid = _virt[0].get_info()["uuid"]
-                        uuid = _virt[0]._conn.lookupByName(guest_name).UUIDString()
-
-                        #import pdb; pdb.set_trace()
-                        guest = Machine(user,
-                                        user,
-                                        "%s" % uuid,
-                                        "%s" % guest_name,
-                                        MACHINE_ATTRIBUTE['GUEST'],
-                                        MACHINE_HYPERVISOR['URI'],
-                                        notebook,
-                                        [],
-                                        "%s" % "",
-                                        'icon-guest3.png',
-                                        False,
-                                        None,
-                                        )
-
-                        self.guests.append(MergeGuest(guest, _virt[0]))
+                    uuid = _virt.inventory["uuid"]
+
+                    #import pdb; pdb.set_trace()
+                    guest = Machine(user,
+                                    user,
+                                    "%s" % uuid,
+                                    "%s" % guest_name,
+                                    MACHINE_ATTRIBUTE['GUEST'],
+                                    MACHINE_HYPERVISOR['URI'],
+                                    notebook,
+                                    [],
+                                    "%s" % "",
+                                    'icon-guest3.png',
+                                    False,
+                                    None,
+                                    )
+
+                    self.guests.append(MergeGuest(guest, _virt))
 
             else:
+                kvgs = {}
+                for _virt in kvc.search_kvg_guests_by_inventory():
+                    kvgs[_virt.inventory["uuid"]] = _virt
+
                 for guest in model.children:
                     if self.if_deleted == 0:
-                        _virt = kvc.search_kvg_guests(guest.uniq_key)
-                        if len(_virt) > 0:
-                            self.guests.append(MergeGuest(guest, _virt[0]))
+                        if guest.uniq_key in kvgs:
+                            self.guests.append(MergeGuest(guest, kvgs[guest.uniq_key]))
                     elif self.if_deleted == 1:
                         if guest.is_deleted is True:
-                            _virt = kvc.search_kvg_guests(guest.uniq_key)
-                            if len(_virt) > 0:
-                                self.guests.append(MergeGuest(guest, _virt[0]))
+                            if guest.uniq_key in kvgs:
+                                self.guests.append(MergeGuest(guest, kvgs[guest.uniq_key]))
                     elif self.if_deleted == 2:
                         if guest.is_deleted is False:
-                            _virt = kvc.search_kvg_guests(guest.uniq_key)
-                            if len(_virt) > 0:
-                                self.guests.append(MergeGuest(guest, _virt[0]))
+                            if guest.uniq_key in kvgs:
+                                self.guests.append(MergeGuest(guest, kvgs[guest.uniq_key]))
                     else:
                         raise Karesansui.KaresansuiLibException("Flag is not expected. if_deleted=%d" % if_deleted)
                 
@@ -173,15 +173,24 @@ class MAIL_LIB:
             _part.add_header('Content-Type', content_type, name=os.path.basename(_attach))
             self.msg.attach(_part)
 
-    def send(self):
-
-        if self.timeout is not None:
-            if self.verbose is True:
-                print("set timeout %d seconds" % self.timeout)
-            socket.setdefaulttimeout(self.timeout)
+    def connect(self):
+        """<comment-ja>
+        SMTPサーバーに接続します。
+        @return: smtplib.SMTP
+        </comment-ja>
+        <comment-en>
+        Connect to the SMTP server (with STARTTLS and login when they are
+        set) and return the smtplib.SMTP object.
+        </comment-en>
+        """
+        timeout = self.timeout
+        if timeout is None:
+            timeout = default_timeout
+        if self.verbose is True:
+            print("set timeout %d seconds" % timeout)
 
         try:
-            s = smtplib.SMTP(self.smtp_server,self.smtp_port)
+            s = smtplib.SMTP(self.smtp_server,self.smtp_port,timeout=timeout)
         except socket.error as msg:
             if self.verbose is True:
                 print("Error: %s." % msg, file=sys.stderr)
@@ -201,10 +210,30 @@ class MAIL_LIB:
                 print("send login cmd...")
             s.login(self.auth_user, self.auth_passwd)
 
+        return s
+
+    def send(self, connection=None):
+        """<comment-ja>
+        メールを送信します。
+        @param connection: connect()で接続済みのsmtplib.SMTP。指定した場合は送信後も切断しない
+        </comment-ja>
+        <comment-en>
+        Send the message. When connection (an smtplib.SMTP from connect())
+        is given it is used and left open, so that it can be reused.
+        </comment-en>
+        """
+        if connection is None:
+            s = self.connect()
+        else:
+            s = connection
+
         if self.verbose is True:
             print("send mail to %s..." % ",".join(self.recipients))
-        s.sendmail(self.sender, self.recipients, self.msg.as_string())
-        s.close()
+        try:
+            s.sendmail(self.sender, self.recipients, self.msg.as_string())
+        finally:
+            if connection is None:
+                s.close()
 
 """
 subject = "root@localhost"
@@ -24,9 +24,13 @@
 # THE SOFTWARE.
 #
 
+import time
+import threading
+
 from karesansui.lib.checker import Checker, \
     CHECK_EMPTY, CHECK_VALID, CHECK_MIN, CHECK_MAX
-from karesansui.lib.const import PAGE_MIN_SIZE, PAGE_MAX_SIZE
+from karesansui.lib.const import PAGE_MIN_SIZE, PAGE_MAX_SIZE, \
+    PAGER_COUNT_CACHE_SIZE
 from karesansui.lib.utils import is_param
 
 def validates_page(obj):
@@ -48,35 +52,97 @@ def validates_page(obj):
     obj.view.alert = checker.errors
     return check
 
+_counts = {}
+_counts_lock = threading.Lock()
+
+def is_query(target):
+    """<comment-ja>
+    targetがSQLAlchemyのQueryかどうかを返します。
+    </comment-ja>
+    <comment-en>
+    Tell whether target is a SQLAlchemy Query rather than a list.
+    </comment-en>
+    """
+    return hasattr(target, 'statement') and hasattr(target, 'offset') \
+           and hasattr(target, 'limit')
+
+def count_query(query, ttl=0):
+    """<comment-ja>
+    Queryの件数をCOUNTで取得します。
+    @param query: 対象のQuery
+    @type query: sqlalchemy.orm.query.Query
+    @param ttl: 件数をキャッシュする秒数(0の場合はキャッシュしない)
+    @type ttl: int
+    @return: 件数
+    </comment-ja>
+    <comment-en>
+    Return the number of rows of query, counted by the database. With a ttl,
+    the count of the same SQL and parameters is reused for ttl seconds, so
+    a large list is not counted again on every page.
+    </comment-en>
+    """
+    if not ttl:
+        return query.order_by(None).count()
+
+    compiled = query.statement.compile()
+    params = sorted([(name, repr(value)) for (name, value) in compiled.params.items()])
+    key = (str(compiled), tuple(params))
+
+    now = time.time()
+    entry = _counts.get(key)
+    if entry is not None and now < entry[0]:
+        return entry[1]
+
+    total = query.order_by(None).count()
+    _counts_lock.acquire()
+    try:
+        if PAGER_COUNT_CACHE_SIZE <= len(_counts):
+            for k in [k for (k, v) in _counts.items() if v[0] <= now]:
+                del _counts[k]
+            if PAGER_COUNT_CACHE_SIZE <= len(_counts):
+                _counts.clear()
+        _counts[key] = (now + ttl, total)
+    finally:
+        _counts_lock.release()
+    return total
+
 class Pager(object):
     """<comment-ja>
     karesansui.db.model.Modelのリストを任意の数で表示する
     ページを作成するクラス。
     </comment-ja>
     <comment-en>
-    TODO: English Comment
+    Split a list of models, or the rows of a SQLAlchemy Query, into pages.
+    A Query is counted and sliced by the database (COUNT, LIMIT/OFFSET), so
+    only the rows of the displayed page are loaded.
     </comment-en>
     """
 
-    def __init__(self, target, now, limit):
+    def __init__(self, target, now, limit, count_ttl=0):
         """<comment-ja>
         1ページに表示する対象の数をlimitで指定します。
         表示するページ番号をnowで指定します。
-        @param target: ページで区切る対象のリスト
-        @type target: [karesansui.db.model.Model...]
+        @param target: ページで区切る対象のリストまたはQuery
+        @type target: [karesansui.db.model.Model...] or sqlalchemy.orm.query.Query
         @param now: 表示するページ番号
         @type now: int
         @param limit: 1ページに表示する対象の数
         @type limit: int 
+        @param count_ttl: Queryの件数をキャッシュする秒数
+        @type count_ttl: int
         </comment-ja>
         <comment-en>
-        TODO: English Comment
+        target is a list or an ordered Query. count_ttl is passed to
+        count_query().
         </comment-en>
         """
         self.now = now
         self.limit = limit
-        self.total = len(target)
-        self.page = self.total / limit
+        if is_query(target):
+            self.total = count_query(target, count_ttl)
+        else:
+            self.total = len(target)
+        self.page = self.total // limit
         self.rpage = self.total % limit
         self.start = self.now * self.limit
         self.end = (self.now * self.limit) + self.limit
@@ -84,7 +150,12 @@ class Pager(object):
         if 0 < self.rpage:
             self.page += 1
 
-        self.displays = target[self.start:self.end]
+        if not is_query(target):
+            self.displays = target[self.start:self.end]
+        elif self.start < self.total:
+            self.displays = target.offset(self.start).limit(self.limit).all()
+        else:
+            self.displays = []
 
         page_list_size = 6 
 
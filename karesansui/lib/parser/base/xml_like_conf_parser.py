@@ -171,7 +171,7 @@ class xmlLikeConfParser:
 
                 match = False
                 for _type in ['uni','multi','sect']:
-                    exec("regex = '|'.join(self.opt_%s)" % _type)
+                    regex = '|'.join(getattr(self, "opt_%s" % _type))
                     if _type == "sect":
                         regex = "[ \t]*(?P<comment>#*)[ \t]*<(?P<key>%s)(?P<section>.*)>" % regex
                     elif _type == "multi":
@@ -52,6 +52,9 @@ PARSER_IPTABLES_CONF_FOOTER="(# Completed on ).*"
 class iptablesParser:
 
     _module = "iptables"
+    # ["status"] is the output of iptables-save, which the source file
+    # does not tell about; karesansui.lib.conf_server must not cache it.
+    _cacheable = False
 
     def __init__(self):
         self.dop = DictOp()
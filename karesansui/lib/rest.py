@@ -39,6 +39,7 @@ import logging
 import traceback
 import os
 import sys
+import threading
 
 import web
 from web.utils import Storage
@@ -52,9 +53,12 @@ import karesansui
 from karesansui.lib.utils import is_int, is_param, karesansui_database_exists
 from karesansui.db.access.user import login as dba_login
 from karesansui.db.access.machine import is_findbyhost1, is_findbyguest1
-from karesansui.lib.const import LOGOUT_FILE_PREFIX, DEFAULT_LANGS
+from karesansui.lib.const import LOGOUT_FILE_PREFIX, DEFAULT_LANGS, \
+     TEMPLATE_MODULE_DIR, TEMPLATE_EXTENSIONS, STATIC_CHUNK_SIZE
 from karesansui.db.access.user import findby1email
 from karesansui.db import get_session
+from karesansui.lib.static import get_sendfile_header
+from karesansui.lib.auth_cache import get_auth_cache
 BASIC_REALM = 'KARESANSUI_AUTHORIZE'
 """<comment-ja>
 Basic Authの Basic realm 名
@@ -99,6 +103,7 @@ TODO: English Comment
 OUTPUT_TYPE_NORMAL = 0
 OUTPUT_TYPE_FILE = 1
 OUTPUT_TYPE_STREAM = 2
+OUTPUT_TYPE_STATIC = 3
 """<comment-ja>
 
 </comment-ja>
@@ -178,6 +183,11 @@ class Rest:
         self.download.stream = None
         self.download.type = OUTPUT_TYPE_NORMAL
         self.download.once = False
+        self.download.etag = None
+        self.download.content_type = None
+        self.download.encoding = None
+        self.download.lastmodified = None
+        self.download.cache_control = None
 
     def _pre(self, *param, **params):
         """<comment-ja>
@@ -262,17 +272,40 @@ class Rest:
         #else:
         #    web.header('Content-Type', 'text/plain; charset=utf-8', True)
 
-        # HTTP Header - No Cache
-        now = datetime.now()
-        web.lastmodified(now)
-        web.httpdate(now)
-        # TODO
-        #web.expire(0)
-        #web.header('Expires', web.httpdate(datetime(1970,1,1)))
-        #web.header('Last-Modified',  web.httpdate(datetime(1970,1,1)))
-        #web.header('ETag', 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
-        web.header('Cache-Control', 'no-cache,private')
-        web.header('Pragma', 'no-cache')
+        if self.download.cache_control is None:
+            # HTTP Header - No Cache
+            now = datetime.now()
+            web.lastmodified(now)
+            web.httpdate(now)
+            # TODO
+            #web.expire(0)
+            #web.header('Expires', web.httpdate(datetime(1970,1,1)))
+            #web.header('Last-Modified',  web.httpdate(datetime(1970,1,1)))
+            #web.header('ETag', 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
+            web.header('Cache-Control', 'no-cache,private')
+            web.header('Pragma', 'no-cache')
+        else:
+            # HTTP Header - Cache (set by the gadget, e.g. static files)
+            web.header('Cache-Control', self.download.cache_control)
+            if self.download.lastmodified is not None:
+                web.lastmodified(self.download.lastmodified)
+
+        # ETag - the client still revalidates (no-cache), but gets 304 when
+        # the content is unchanged.
+        if_none_match = web.ctx.env.get('HTTP_IF_NONE_MATCH')
+        if self.download.etag is not None:
+            web.header('ETag', self.download.etag)
+            if if_none_match is not None \
+               and (self.download.etag in [x.strip() for x in if_none_match.split(',')] \
+                    or if_none_match.strip() == '*'):
+                raise web.notmodified()
+
+        # Last-Modified - only used when the client did not send an ETag.
+        if self.download.lastmodified is not None and if_none_match is None:
+            if_modified_since = web.parsehttpdate(web.ctx.env.get('HTTP_IF_MODIFIED_SINCE', ''))
+            if if_modified_since is not None \
+               and if_modified_since >= self.download.lastmodified.replace(microsecond=0):
+                raise web.notmodified()
 
         ##
         if self.download.type == OUTPUT_TYPE_NORMAL: # Nomal
@@ -328,8 +361,27 @@ class Rest:
         elif self.download.type == OUTPUT_TYPE_STREAM: # io stream download
             if self.download.stream is None:
                 self.logger.error("Data stream has not been set.")
+            if self.download.content_type is not None:
+                web.header('Content-Type', self.download.content_type, True)
             return self.download.stream
 
+        elif self.download.type == OUTPUT_TYPE_STATIC: # static file
+            if isinstance(f, web.HTTPError) is True:
+                raise f
+            if self.download.content_type is not None:
+                web.header('Content-Type', self.download.content_type, True)
+            if self.download.encoding is not None:
+                web.header('Content-Encoding', self.download.encoding)
+
+            # hand the file over to the front-end server if it can send it.
+            sendfile = get_sendfile_header(self.download.file)
+            if sendfile is not None:
+                web.header(*sendfile)
+                return ''
+
+            web.header('Content-Length', str(os.path.getsize(self.download.file)))
+            return read_file_chunks(self.download.file, STATIC_CHUNK_SIZE)
+
         else:
             self.logger.error('Was specified assuming no output type. - type=%d' % self.download.type)
             raise web.internalerror()
@@ -820,6 +872,7 @@ def auth(func):
                 fname = '%s%s' % (LOGOUT_FILE_PREFIX, self.me.email,)
                 if os.access(fname, os.F_OK):
                     os.unlink(fname)
+                    get_auth_cache().invalidate(self.me.email)
                     return web.unauthorized()
 
                 # Login: Success
@@ -862,14 +915,141 @@ def login():
     """
     _http_auth = web.ctx.env['HTTP_AUTHORIZATION'].strip()
     if _http_auth[:5] == 'Basic':
-        b = bytes(_http_auth[6:].strip(), 'utf-8')
-        print(b)
+        credentials = _http_auth[6:].strip()
+        b = bytes(credentials, 'utf-8')
         email, password = b64decode(b).decode('utf-8').split(':')
         session = web.ctx.orm
+
+        # the cached user is detached, a copy is attached to this session
+        # without a query.
+        cache = get_auth_cache()
+        stamp = cache.stamp()
+        user = cache.get(credentials, stamp)
+        if user is not None:
+            return (session.merge(user, load=False), email)
+
         user = dba_login(session, str(email), str(password))
+        if user is not None:
+            session.expunge(user)
+            cache.set(credentials, user, stamp)
+            user = session.merge(user, load=False)
         return (user, email)
 
+def read_file_chunks(filename, size):
+    """<comment-ja>
+    ファイルをsizeバイトずつ返すジェネレーター
+    </comment-ja>
+    <comment-en>
+    Yield the content of filename in chunks of size bytes, so that large
+    files are not read into memory at once.
+    </comment-en>
+    """
+    fp = open(filename, "rb")
+    try:
+        while True:
+            data = fp.read(size)
+            if not data:
+                break
+            yield data
+    finally:
+        fp.close()
+
 # -- Template Engine
+_template_lookups = {}
+_template_lookup_lock = threading.Lock()
+
+def get_template_theme():
+    """<comment-ja>
+    テンプレートのテーマ名を返します。
+    </comment-ja>
+    <comment-en>
+    Return the configured template theme.
+    </comment-en>
+    """
+    if 'application.template.theme' in karesansui.config:
+        return karesansui.config['application.template.theme']
+    return 'default'
+
+def get_template_lookup(theme=None):
+    """<comment-ja>
+    テーマ毎のTemplateLookupを返します。
+    コンパイルしたテンプレートはTEMPLATE_MODULE_DIRに保存され、プロセス再起動後も使われます。
+    @param theme: テーマ名
+    @type theme: str
+    @rtype: mako.lookup.TemplateLookup
+    </comment-ja>
+    <comment-en>
+    Return the process-wide TemplateLookup of theme.
+    Compiled templates are kept in memory and written to
+    TEMPLATE_MODULE_DIR/<theme>, so a restarted process loads them instead of
+    compiling again. Mako recompiles a module whose template is newer.
+    Template files are checked for changes in debug mode only.
+    </comment-en>
+    """
+    if theme is None:
+        theme = get_template_theme()
+
+    lookup = _template_lookups.get(theme)
+    if lookup is not None:
+        return lookup
+
+    _template_lookup_lock.acquire()
+    try:
+        if theme in _template_lookups:
+            return _template_lookups[theme]
+
+        logger = logging.getLogger('karesansui.rest.mako')
+        module_directory = '/'.join([TEMPLATE_MODULE_DIR, theme])
+        try:
+            if not os.path.isdir(module_directory):
+                os.makedirs(module_directory)
+        except OSError as e:
+            logger.warning('Compiled templates are not saved. - %s : %s'
+                           % (module_directory, str(e)))
+            module_directory = None
+
+        lookup = TemplateLookup(directories='/'.join([karesansui.dirname, 'templates', theme]),
+                                module_directory=module_directory,
+                                filesystem_checks=bool(web.config.get('debug', False)),
+                                input_encoding='utf-8',
+                                output_encoding='utf-8',
+                                default_filters=['decode.utf8'],
+                                encoding_errors='replace')
+        _template_lookups[theme] = lookup
+        return lookup
+    finally:
+        _template_lookup_lock.release()
+
+def precompile_templates(theme=None):
+    """<comment-ja>
+    テーマのテンプレートを全てコンパイルします。
+    @param theme: テーマ名
+    @type theme: str
+    @return: コンパイルしたテンプレート数
+    @rtype: int
+    </comment-ja>
+    <comment-en>
+    Compile every template of theme, so the first requests do not have to.
+    Templates failing to compile are logged and skipped.
+    </comment-en>
+    """
+    logger = logging.getLogger('karesansui.rest.mako')
+    lookup = get_template_lookup(theme)
+    count = 0
+    for template_dir in lookup.directories:
+        for (dirpath, dirnames, filenames) in os.walk(template_dir):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if not filename.endswith(TEMPLATE_EXTENSIONS):
+                    continue
+                uri = os.path.relpath(os.path.join(dirpath, filename), template_dir)
+                try:
+                    lookup.get_template(uri)
+                    count += 1
+                except Exception as e:
+                    logger.warning('Failed to compile the template. - %s : %s' % (uri, str(e)))
+    return count
+
 def mako_render(_, templatename, **kwargs):
     """<comment-ja>
     テンプレート実行結果の出力
@@ -896,24 +1076,13 @@ def mako_render(_, templatename, **kwargs):
         finally:
             fp.close()
 
-    else:
-        directories = [karesansui.dirname, 'templates']
-        if 'application.template.theme' in karesansui.config:
-            directories.append(karesansui.config['application.template.theme'])
-        else:
-            directories.append('default')
-
-    tl = TemplateLookup(directories='/'.join(directories),
-                        input_encoding='utf-8',
-                        output_encoding='utf-8',
-                        default_filters=['decode.utf8'],
-                        encoding_errors='replace')
+    tl = get_template_lookup()
     
     try:
         t = tl.get_template(templatename)
     except exceptions.TopLevelLookupException as tlle:
         logger.error('We could not find the template directory. - %s/%s'
-                     % ('/'.join(directories), templatename))
+                     % ('/'.join(tl.directories), templatename))
         return web.notfound()
         
     logger.info('Template file path=%s' % t.filename)
@@ -933,6 +1102,8 @@ def mako_render(_, templatename, **kwargs):
         traceback.format_exc()
         raise
 
+_translations = {}
+
 def mako_translation(languages, domain='messages', localedir='locale'):
     """<comment-ja>
     国際化処理
@@ -945,11 +1116,18 @@ def mako_translation(languages, domain='messages', localedir='locale'):
     @return: gettext.GNUTranslations
     </comment-ja>
     <comment-en>
-    TODO: English Comment
+    Return the gettext function of languages.
+    Catalogs are looked up once per (domain, localedir, languages) and kept
+    for the life of the process.
     </comment-en>
     """
-    localedir = '/'.join([karesansui.dirname, localedir])
-    return translation(domain, localedir, tuple(languages)).gettext 
+    key = (domain, localedir, tuple(languages))
+    _gettext = _translations.get(key)
+    if _gettext is None:
+        _localedir = '/'.join([karesansui.dirname, localedir])
+        _gettext = translation(domain, _localedir, tuple(languages)).gettext
+        _translations[key] = _gettext
+    return _gettext
 
 if __name__ == "__main__":
     pass
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui Core.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+import time
+import threading
+from hashlib import sha1
+from collections import OrderedDict
+
+from karesansui.lib.const import GRAPH_CACHE_SIZE
+
+class RRDGraphCacheEntry:
+
+    def __init__(self, data, expires=None):
+        self.data = data
+        self.etag = '"%s"' % sha1(data).hexdigest()
+        self.expires = expires
+
+    def is_expired(self, now=None):
+        if self.expires is None:
+            return False
+        if now is None:
+            now = time.time()
+        return now >= self.expires
+
+class RRDGraphCache:
+    """<comment-ja>
+    描画したグラフ画像をLRUで保持します。
+    @param size: 保持する画像の合計サイズの上限(バイト)
+    </comment-ja>
+    <comment-en>
+    Rendered graph images, evicted least recently used first once the total
+    size of the images exceeds size bytes.
+    </comment-en>
+    """
+
+    def __init__(self, size=GRAPH_CACHE_SIZE):
+        self.size = size
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.is_expired():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, data, expires=None):
+        entry = RRDGraphCacheEntry(data, expires)
+        if len(data) > self.size:
+            return entry
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = entry
+            self.used += len(data)
+            while self.used > self.size:
+                self._remove(next(iter(self.entries)))
+        return entry
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.used -= len(entry.data)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.used = 0
+
+# private
+__cache = None
+
+def get_graph_cache():
+    """<comment-ja>
+    グラフキャッシュを返却します。(Optimistic Singleton)
+    </comment-ja>
+    <comment-en>
+    Return the graph cache of this process.
+    </comment-en>
+    """
+    global __cache
+    if __cache is None:
+        __cache = RRDGraphCache(GRAPH_CACHE_SIZE)
+    return __cache
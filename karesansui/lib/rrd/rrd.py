@@ -26,6 +26,13 @@
 
 import re
 import os
+import glob
+import time
+import threading
+import logging
+import gettext
+import multiprocessing
+import rrdtool
 
 import karesansui
 from karesansui.lib.rrd.cpu       import create_cpu_graph, is_cpu_file_exist
@@ -43,9 +50,87 @@ from karesansui.lib.rrd.libvirt   import create_libvirt_cpu_graph, \
                                          is_libvirt_disk_file_exist, \
                                          is_libvirt_interface_file_exist
 
-from karesansui.lib.const import COLLECTD_DATA_DIR, KARESANSUI_TMP_DIR
+from karesansui.lib.rrd.cache import get_graph_cache
+from karesansui.lib.rrd.xport import export_series, get_series_files, \
+                                   XPORT_MAX_ROWS
+
+from karesansui.lib.const import COLLECTD_DATA_DIR, KARESANSUI_TMP_DIR, \
+                                 GRAPH_CACHE_DEFAULT_STEP, GRAPH_RENDER_WORKERS, \
+                                 COLLECTD_RRDCACHED_ADDRESS, \
+                                 COLLECTD_RRDCACHED_FLUSH_WINDOW
 from karesansui.lib.utils import get_hostname, locale_dummy
 
+# step of the RRD files per rrd dir.
+_rrd_steps = {}
+
+logger = logging.getLogger('karesansui.lib.rrd')
+
+def get_rrdcached_address(address=COLLECTD_RRDCACHED_ADDRESS):
+    """<comment-ja>
+    rrdcachedが動作していればそのアドレスを返します。
+    </comment-ja>
+    <comment-en>
+    Return the address of rrdcached, or None if it is not running.
+    A UNIX socket is looked for; TCP addresses are returned as they are.
+    </comment-en>
+    """
+    if address.startswith("unix:"):
+        if os.path.exists(address[5:]) is False:
+            return None
+    elif address.startswith("/"):
+        if os.path.exists(address) is False:
+            return None
+    return address
+
+# process pool rendering the graphs of RRD.get_graphs(), shared by all
+# requests of the process.
+_render_pool = None
+_render_lock = threading.Lock()
+
+# RRD objects of a render worker, per (lang, graph_dir, rrd_dir).
+_render_rrds = {}
+
+def _get_render_pool():
+    """<comment-ja>
+    グラフ描画用のプロセスプールを返します。
+    </comment-ja>
+    <comment-en>
+    Return the render pool of this process, starting GRAPH_RENDER_WORKERS
+    workers on first use. The workers are forked from a forkserver, not
+    from the (threaded) web process, so they do not inherit its locks,
+    libvirt event thread or database connections.
+    </comment-en>
+    """
+    global _render_pool
+    with _render_lock:
+        if _render_pool is None:
+            context = multiprocessing.get_context("forkserver")
+            _render_pool = context.Pool(GRAPH_RENDER_WORKERS)
+        return _render_pool
+
+def _get_render_rrd(lang, graph_dir, rrd_dir):
+    key = (lang, graph_dir, rrd_dir)
+    rrd = _render_rrds.get(key)
+    if rrd is None:
+        locale = None
+        if lang is not None:
+            locale = gettext.translation("messages", "%s/locale" % karesansui.dirname,
+                                         [lang], fallback=True).gettext
+        rrd = RRD(locale, lang, graph_dir, rrd_dir)
+        _render_rrds[key] = rrd
+    return rrd
+
+def _render_graph_group(args):
+    (settings, graphs, start, end) = args
+    rrd = _get_render_rrd(*settings)
+    result = []
+    for (target, dev, type, libvirt_target) in graphs:
+        try:
+            result.append(rrd.read_graph(target, dev, type, start, end, libvirt_target))
+        except Exception:
+            result.append(None)
+    return result
+
 class RRD:
     _graph_dir = KARESANSUI_TMP_DIR
     _rrd_dir = "%s/%s" % (COLLECTD_DATA_DIR, get_hostname())
@@ -169,3 +254,195 @@ class RRD:
                 filepath = create_libvirt_interface_graph(self._, self._lang, self._graph_dir, self._rrd_dir, start, end, dev, type)
 
         return filepath
+
+    def get_step(self):
+        """<comment-ja>
+        RRDファイルのステップ(秒)を返します。
+        </comment-ja>
+        <comment-en>
+        Return the step of the RRD files in the rrd dir. collectd writes all of
+        them with the same interval, so the first one found is asked.
+        </comment-en>
+        """
+        try:
+            return _rrd_steps[self._rrd_dir]
+        except KeyError:
+            pass
+
+        step = GRAPH_CACHE_DEFAULT_STEP
+        for filepath in glob.glob("%s/*/*.rrd" % self._rrd_dir)[:1]:
+            try:
+                step = int(rrdtool.info(filepath)["step"])
+            except Exception:
+                pass
+        _rrd_steps[self._rrd_dir] = step
+        return step
+
+    def get_graph(self, target, dev, type, start, end, libvirt_target=None):
+        """<comment-ja>
+        グラフ画像を返します。同じ条件で描画済みの画像があればそれを返します。
+        @return: RRDGraphCacheEntry、描画できない場合はNone
+        </comment-ja>
+        <comment-en>
+        Return the graph as a RRDGraphCacheEntry (data and etag), or None.
+        Graphs are cached by (rrd dir, target, dev, type, libvirt target,
+        start and end rounded down to the RRD step, lang). A graph whose end
+        is not yet a step in the past is only kept for one step, since new
+        data points may still be added to it.
+        </comment-en>
+        """
+        step = self.get_step()
+        start = int(start) // step * step
+        end = int(end) // step * step
+        key = self._graph_key(target, dev, type, libvirt_target, start, end)
+
+        cache = get_graph_cache()
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+
+        now = time.time()
+        data = self.read_graph(target, dev, type, start, end, libvirt_target)
+        if data is None:
+            return None
+        return cache.put(key, data, self._graph_expires(end, step, now))
+
+    def get_graphs(self, graphs, start, end, workers=GRAPH_RENDER_WORKERS):
+        """<comment-ja>
+        複数のグラフ画像をまとめて返します。キャッシュにないグラフは
+        プロセスで共有する描画用プロセスプールで並行して描画します。
+        (workersが1の場合はこのプロセスで描画します)
+        @param graphs: (target, dev, type, libvirt_target)のリスト
+        @return: graphsと同じ順のRRDGraphCacheEntryのリスト(描画できない場合はNone)
+        </comment-ja>
+        <comment-en>
+        Return the graphs (a list of (target, dev, type, libvirt_target)) as
+        a list of RRDGraphCacheEntry or None, in the same order, and keep
+        them in the graph cache.
+        Graphs not in the cache are rendered by the render pool of the
+        process (GRAPH_RENDER_WORKERS processes shared by all requests), or
+        here when workers is 1. Graphs of the same target and dev (e.g. the
+        graphs of the cpu-N/cpu-*.rrd files) are rendered one after another
+        by the same worker, so the files they share are read from disk only
+        once. The workers render with the translation of the language of
+        this object.
+        </comment-en>
+        """
+        step = self.get_step()
+        start = int(start) // step * step
+        end = int(end) // step * step
+
+        cache = get_graph_cache()
+        entries = {}
+        groups = {}
+        for graph in graphs:
+            (target, dev, type, libvirt_target) = graph
+            entry = cache.get(self._graph_key(target, dev, type, libvirt_target, start, end))
+            if entry is not None:
+                entries[graph] = entry
+            elif graph not in entries:
+                entries[graph] = None
+                groups.setdefault((target, dev, libvirt_target), []).append(graph)
+
+        groups = list(groups.values())
+        now = time.time()
+        if len(groups) > 1 and workers > 1:
+            lang = None
+            if self._ is not locale_dummy:
+                lang = self._lang
+            settings = (lang, self._graph_dir, self._rrd_dir)
+            rendered = _get_render_pool().map(_render_graph_group,
+                                              [(settings, group, start, end) for group in groups])
+        else:
+            rendered = [[self.read_graph(target, dev, type, start, end, libvirt_target)
+                         for (target, dev, type, libvirt_target) in group]
+                        for group in groups]
+
+        expires = self._graph_expires(end, step, now)
+        for (group, datas) in zip(groups, rendered):
+            for ((target, dev, type, libvirt_target), data) in zip(group, datas):
+                if data is not None:
+                    key = self._graph_key(target, dev, type, libvirt_target, start, end)
+                    entries[(target, dev, type, libvirt_target)] = cache.put(key, data, expires)
+
+        return [entries[graph] for graph in graphs]
+
+    def read_graph(self, target, dev, type, start, end, libvirt_target=None):
+        """<comment-ja>
+        グラフを描画し、画像データを返します。
+        @return: PNG画像のデータ、描画できない場合はNone
+        </comment-ja>
+        <comment-en>
+        Render a graph and return the PNG data, or None.
+        </comment-en>
+        """
+        self.flush_cached(target, dev, type, end, libvirt_target)
+        filepath = self.create_graph(target, dev, type, start, end, libvirt_target)
+        if filepath == "":
+            return None
+        try:
+            fp = open(filepath, "rb")
+            try:
+                return fp.read()
+            finally:
+                fp.close()
+        finally:
+            if os.path.isfile(filepath) is True:
+                os.unlink(filepath)
+
+    def _graph_key(self, target, dev, type, libvirt_target, start, end):
+        return (self._rrd_dir, str(target), str(dev), str(type), libvirt_target,
+                start, end, self._lang)
+
+    def _graph_expires(self, end, step, now):
+        if end + step > now:
+            return now + step
+        return None
+
+    def export(self, target, dev, type, start, end, libvirt_target=None,
+               cf="AVERAGE", max_rows=XPORT_MAX_ROWS):
+        """<comment-ja>
+        グラフと同じデータを数値の配列として返します。
+        @return: 辞書、データがない場合はNone
+        </comment-ja>
+        <comment-en>
+        Return the data behind a graph as arrays of numbers.
+        See karesansui.lib.rrd.xport.export_series().
+        </comment-en>
+        """
+        self.flush_cached(target, dev, type, end, libvirt_target)
+        return export_series(self._rrd_dir, target, dev, type, start, end,
+                             libvirt_target, cf, max_rows)
+
+    def flush_cached(self, target, dev, type, end, libvirt_target=None):
+        """<comment-ja>
+        rrdcachedが保持しているデータのうち、グラフが読み込むファイルの分だけを書き出させます。
+        @return: 書き出しを要求した場合はTrue
+        </comment-ja>
+        <comment-en>
+        Ask rrdcached (--daemon) to write out the pending updates of the RRD
+        files read by a graph, and of no other file.
+        Nothing is flushed when rrdcached is not running, or when the graph
+        ends more than COLLECTD_RRDCACHED_FLUSH_WINDOW seconds ago, since
+        those data points are already in the files.
+        Returns True if a flush was requested.
+        </comment-en>
+        """
+        if int(end) < time.time() - COLLECTD_RRDCACHED_FLUSH_WINDOW:
+            return False
+
+        address = get_rrdcached_address()
+        if address is None:
+            return False
+
+        files = [x for x in get_series_files(self._rrd_dir, target, dev, type, libvirt_target)
+                 if os.path.exists(x)]
+        if len(files) == 0:
+            return False
+
+        try:
+            rrdtool.flushcached("--daemon", address, *files)
+        except (rrdtool.error, AttributeError) as e:
+            logger.debug('Failed to flush rrdcached - %s : %s' % (address, str(e)))
+            return False
+        return True
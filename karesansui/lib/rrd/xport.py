@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui Core.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+import math
+import struct
+
+import rrdtool
+
+from karesansui.lib.utils import is_readable
+
+XPORT_CONSOLIDATIONS = ("AVERAGE", "MIN", "MAX")
+XPORT_MAX_ROWS = 400
+
+def _cpu_series(rrd_dir, dev, type):
+    names = ("idle", "interrupt", "nice", "user", "wait", "system", "softirq", "steal")
+    return [(name, "%s/cpu-%s/cpu-%s.rrd" % (rrd_dir, dev, name), "value") for name in names]
+
+def _memory_series(rrd_dir, dev, type):
+    names = ("free", "cached", "buffered", "used")
+    return [(name, "%s/memory/memory-%s.rrd" % (rrd_dir, name), "value") for name in names]
+
+def _df_series(rrd_dir, dev, type):
+    filepath = "%s/df/df-%s.rrd" % (rrd_dir, dev)
+    return [("used", filepath, "used"), ("free", filepath, "free")]
+
+def _disk_series(rrd_dir, dev, type):
+    filepath = "%s/disk-%s/disk_%s.rrd" % (rrd_dir, dev, type)
+    return [("read", filepath, "read"), ("write", filepath, "write")]
+
+def _interface_series(rrd_dir, dev, type):
+    filepath = "%s/interface/if_%s-%s.rrd" % (rrd_dir, type, dev)
+    return [("rx", filepath, "rx"), ("tx", filepath, "tx")]
+
+def _load_series(rrd_dir, dev, type):
+    filepath = "%s/load/load.rrd" % (rrd_dir)
+    return [(name, filepath, name) for name in ("shortterm", "midterm", "longterm")]
+
+def _uptime_series(rrd_dir, dev, type):
+    return [("uptime", "%s/uptime/uptime.rrd" % (rrd_dir), "value")]
+
+def _users_series(rrd_dir, dev, type):
+    return [("users", "%s/users/users.rrd" % (rrd_dir), "users")]
+
+def _libvirt_cpu_series(rrd_dir, dev, type):
+    if dev == "total":
+        filepath = "%s/libvirt/virt_cpu_total.rrd" % (rrd_dir)
+    else:
+        filepath = "%s/libvirt/virt_vcpu-%s.rrd" % (rrd_dir, dev)
+    return [("ns", filepath, "ns")]
+
+def _libvirt_disk_series(rrd_dir, dev, type):
+    filepath = "%s/libvirt/disk_%s-%s.rrd" % (rrd_dir, type, dev)
+    return [("read", filepath, "read"), ("write", filepath, "write")]
+
+def _libvirt_interface_series(rrd_dir, dev, type):
+    filepath = "%s/libvirt/if_%s-%s.rrd" % (rrd_dir, type, dev)
+    return [("rx", filepath, "rx"), ("tx", filepath, "tx")]
+
+# the same data sources as the graphs of karesansui.lib.rrd.*
+XPORT_SERIES = {
+    ("cpu", None)            : _cpu_series,
+    ("memory", None)         : _memory_series,
+    ("df", None)             : _df_series,
+    ("disk", None)           : _disk_series,
+    ("interface", None)      : _interface_series,
+    ("load", None)           : _load_series,
+    ("uptime", None)         : _uptime_series,
+    ("users", None)          : _users_series,
+    ("libvirt", "vcpu")      : _libvirt_cpu_series,
+    ("libvirt", "disk")      : _libvirt_disk_series,
+    ("libvirt", "interface") : _libvirt_interface_series,
+    }
+
+def get_series_files(rrd_dir, target, dev, type, libvirt_target=None):
+    """<comment-ja>
+    グラフが読み込むRRDファイルのリストを返します。
+    </comment-ja>
+    <comment-en>
+    Return the RRD files read by a graph, or [] for an unknown target.
+    </comment-en>
+    """
+    if target != "libvirt":
+        libvirt_target = None
+    try:
+        series = XPORT_SERIES[(target, libvirt_target)](rrd_dir, str(dev), str(type))
+    except KeyError:
+        return []
+    files = []
+    for (name, filepath, ds) in series:
+        if filepath not in files:
+            files.append(filepath)
+    return files
+
+def export_series(rrd_dir, target, dev, type, start, end,
+                  libvirt_target=None, cf="AVERAGE", max_rows=XPORT_MAX_ROWS):
+    """<comment-ja>
+    グラフと同じデータをrrdtool.xportで取得します。
+    @param cf: 集約関数 (AVERAGE, MIN, MAX)
+    @param max_rows: 最大行数。これを超える場合はrrdtoolが集約します
+    @return: 結果の辞書、データがない場合はNone
+    </comment-ja>
+    <comment-en>
+    Export the data behind a report graph with rrdtool.xport, consolidated
+    with cf and downsampled by rrdtool to at most max_rows rows.
+    Returns {"start", "end", "step", "columns", "data"} where data holds one
+    list of values per column (None for unknown), or None.
+    </comment-en>
+    """
+    if target != "libvirt":
+        libvirt_target = None
+    try:
+        series = XPORT_SERIES[(target, libvirt_target)](rrd_dir, str(dev), str(type))
+    except KeyError:
+        return None
+    if cf not in XPORT_CONSOLIDATIONS:
+        return None
+
+    args = ["--start", str(start),
+            "--end", str(end),
+            "--maxrows", str(int(max_rows)),
+            ]
+    for (name, filepath, ds) in series:
+        if is_readable(filepath) is False:
+            return None
+        args.append("DEF:%s=%s:%s:%s" % (name, filepath, ds, cf))
+    for (name, filepath, ds) in series:
+        args.append("XPORT:%s:%s" % (name, name))
+
+    result = rrdtool.xport(*args)
+    meta = result["meta"]
+    columns = [[] for name in series]
+    for row in result["data"]:
+        for i, value in enumerate(row):
+            if value is not None and math.isnan(value):
+                value = None
+            columns[i].append(value)
+
+    return {"start"   : int(meta["start"]),
+            "end"     : int(meta["end"]),
+            "step"    : int(meta["step"]),
+            "columns" : [name for (name, filepath, ds) in series],
+            "data"    : columns,
+            }
+
+def pack_series(series):
+    """<comment-ja>
+    取得したデータをfloat32(リトルエンディアン)の配列に変換します。
+    </comment-ja>
+    <comment-en>
+    Pack the data of export_series() as little endian float32, column after
+    column, unknown values as NaN.
+    </comment-en>
+    """
+    values = []
+    for column in series["data"]:
+        values.extend([float("nan") if x is None else x for x in column])
+    return struct.pack("<%df" % len(values), *values)
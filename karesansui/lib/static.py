@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui Core.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+"""
+<comment-ja>
+静的ファイルの配信情報
+</comment-ja>
+<comment-en>
+Static files: content hashes, fingerprinted URLs and precompressed variants.
+
+A fingerprinted URL carries the first STATIC_FINGERPRINT_LENGTH characters
+of the file's SHA-1 as "?v=...". It changes whenever the file does, so
+responses to it can be cached as immutable. The .gz and .br files next to
+a static file are built by compress_static() at install time.
+</comment-en>
+"""
+
+import os
+import gzip
+import stat
+import threading
+from hashlib import sha1
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+import karesansui
+from karesansui.lib.const import STATIC_FINGERPRINT_LENGTH, \
+     STATIC_CONTENT_TYPES, STATIC_COMPRESS_TYPES
+
+# content encodings in order of preference, with the suffix of their files.
+STATIC_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# files smaller than this are not worth compressing.
+STATIC_COMPRESS_MIN_SIZE = 256
+
+class StaticFile:
+
+    def __init__(self, path, filename, st, digest):
+        self.path = path
+        self.filename = filename
+        self.size = st.st_size
+        self.mtime = st.st_mtime
+        self.signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+        self.digest = digest
+        self.fingerprint = digest[:STATIC_FINGERPRINT_LENGTH]
+        ext = os.path.splitext(filename)[1][1:].lower()
+        self.content_type = STATIC_CONTENT_TYPES.get(ext, "application/octet-stream")
+
+    def etag(self, encoding=None):
+        if encoding is None:
+            return '"%s"' % self.fingerprint
+        return '"%s-%s"' % (self.fingerprint, encoding)
+
+    def variant(self, accept_encoding):
+        """<comment-ja>
+        Accept-Encodingに合う圧縮済みファイルを返します。
+        @return: (ファイルパス, エンコーディング) 圧縮済みファイルがない場合は(元のファイル, None)
+        </comment-ja>
+        <comment-en>
+        Return (filename, encoding) of the best precompressed variant the
+        client accepts, or (filename, None). Variants older than the file
+        are ignored.
+        </comment-en>
+        """
+        accepted = []
+        for value in (accept_encoding or "").split(","):
+            params = value.split(";")
+            q = 1.0
+            for param in params[1:]:
+                (name, _, number) = param.strip().partition("=")
+                if name == "q":
+                    try:
+                        q = float(number)
+                    except ValueError:
+                        q = 0.0
+            if q > 0:
+                accepted.append(params[0].strip().lower())
+
+        for (encoding, suffix) in STATIC_ENCODINGS:
+            if encoding not in accepted:
+                continue
+            try:
+                st = os.stat(self.filename + suffix)
+            except OSError:
+                continue
+            if st.st_mtime >= self.mtime:
+                return (self.filename + suffix, encoding)
+        return (self.filename, None)
+
+_static_files = {}
+_static_lock = threading.Lock()
+
+def get_static_dir():
+    return "%s/static" % karesansui.dirname
+
+def _file_digest(filename):
+    digest = sha1()
+    fp = open(filename, "rb")
+    try:
+        while True:
+            data = fp.read(65536)
+            if not data:
+                break
+            digest.update(data)
+    finally:
+        fp.close()
+    return digest.hexdigest()
+
+def get_static_file(path):
+    """<comment-ja>
+    静的ファイルの情報を返します。
+    @param path: staticディレクトリからの相対パス
+    @type path: str
+    @return: StaticFile、ファイルがない場合はNone
+    </comment-ja>
+    <comment-en>
+    Return the StaticFile of path (relative to the static directory), or
+    None if there is no such file. Digests are kept until the file changes.
+    </comment-en>
+    """
+    static_dir = get_static_dir()
+    filename = os.path.normpath(os.path.join(static_dir, path))
+    if not filename.startswith(static_dir + os.sep):
+        return None
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+
+    static = _static_files.get(filename)
+    if static is not None and static.signature == (st.st_ino, st.st_size, st.st_mtime_ns):
+        return static
+
+    static = StaticFile(path, filename, st, _file_digest(filename))
+    _static_lock.acquire()
+    try:
+        _static_files[filename] = static
+    finally:
+        _static_lock.release()
+    return static
+
+def static_url(homepath, path):
+    """<comment-ja>
+    フィンガープリント付きのURLを返します。
+    </comment-ja>
+    <comment-en>
+    Return the fingerprinted URL of path. Falls back to the plain URL when
+    the file does not exist.
+    </comment-en>
+    """
+    static = get_static_file(path)
+    if static is None:
+        return "%s/static/%s" % (homepath, path)
+    return "%s/static/%s?v=%s" % (homepath, path, static.fingerprint)
+
+def get_sendfile_header(filename):
+    """<comment-ja>
+    フロントエンドのWebサーバーにファイルの送信を任せるためのヘッダーを返します。
+    @return: (ヘッダー名, 値)、設定されていない場合はNone
+    </comment-ja>
+    <comment-en>
+    Return the (header, value) handing filename over to the front-end
+    server, or None when application.static.sendfile is not set.
+    X-Sendfile (lighttpd, Apache mod_xsendfile) takes the file path.
+    X-Accel-Redirect (nginx) takes a URI below
+    application.static.sendfile.prefix, which nginx maps to the static
+    directory.
+    </comment-en>
+    """
+    if not karesansui.config.get('application.static.sendfile'):
+        return None
+    header = karesansui.config['application.static.sendfile']
+    if is_accel_redirect() is True:
+        value = karesansui.config['application.static.sendfile.prefix'] \
+                + os.path.relpath(filename, get_static_dir())
+        return (header, value)
+    return (header, filename)
+
+def is_accel_redirect():
+    """<comment-ja>
+    nginxのX-Accel-Redirectを使うかどうかを返します。
+    </comment-ja>
+    <comment-en>
+    Tell whether files are handed over with X-Accel-Redirect. nginx then
+    picks the precompressed variant itself (gzip_static).
+    </comment-en>
+    """
+    header = karesansui.config.get('application.static.sendfile') or ''
+    return header.lower() == 'x-accel-redirect'
+
+def compress_static(static_dir=None, force=False):
+    """<comment-ja>
+    圧縮済みファイル(.gz, .br)を作成します。
+    @param static_dir: staticディレクトリ
+    @param force: 最新の圧縮済みファイルも作成し直す
+    @return: 作成したファイル数
+    </comment-ja>
+    <comment-en>
+    Write .gz (and .br, when the brotli module is available) variants of
+    the files with an extension in STATIC_COMPRESS_TYPES. Variants that are
+    not smaller than their file are not kept. Returns the number of files
+    written.
+    </comment-en>
+    """
+    if static_dir is None:
+        static_dir = get_static_dir()
+
+    encoders = [(".gz", lambda data: gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        encoders.append((".br", lambda data: brotli.compress(data, quality=11)))
+
+    count = 0
+    for (dirpath, dirnames, filenames) in os.walk(static_dir):
+        for name in filenames:
+            ext = os.path.splitext(name)[1][1:].lower()
+            if ext not in STATIC_COMPRESS_TYPES:
+                continue
+            filename = os.path.join(dirpath, name)
+            st = os.stat(filename)
+            if st.st_size < STATIC_COMPRESS_MIN_SIZE:
+                continue
+
+            data = None
+            for (suffix, encode) in encoders:
+                target = filename + suffix
+                if force is False and os.path.exists(target) \
+                   and os.stat(target).st_mtime >= st.st_mtime:
+                    continue
+                if data is None:
+                    fp = open(filename, "rb")
+                    try:
+                        data = fp.read()
+                    finally:
+                        fp.close()
+                encoded = encode(data)
+                if len(encoded) >= len(data):
+                    if os.path.exists(target):
+                        os.unlink(target)
+                    continue
+                fp = open(target, "wb")
+                try:
+                    fp.write(encoded)
+                finally:
+                    fp.close()
+                os.utime(target, (st.st_atime, st.st_mtime))
+                count += 1
+    return count
@@ -378,3 +378,20 @@ def total_progress(jobs):
 def newline2br(text):
     import re
     return re.compile(r"[\r\n]+").sub('<br/>', text)
+
+def static_url(path):
+    """<comment-ja>
+    静的ファイルのフィンガープリント付きURLを返します。
+    @param path: staticディレクトリからの相対パス
+    @type path: str
+    @rtype: str
+    </comment-ja>
+    <comment-en>
+    Return the fingerprinted URL of a static file, e.g.
+    ${static_url('lib/jquery.js')}. The URL changes with the file, so
+    browsers can keep it cached.
+    </comment-en>
+    """
+    import web
+    from karesansui.lib.static import static_url as _static_url
+    return _static_url(web.ctx.homepath, path)
@@ -56,6 +56,8 @@ import math
 import glob
 import fcntl
 import gzip
+import mmap
+import zlib
 
 import karesansui
 import karesansui.lib.locale
@@ -968,57 +970,127 @@ def get_xml_parse(file):
 
     return document
 
+def get_xml_tree(file):
+    """
+    <comment-ja>
+    XMLを一度だけ解析し、lxmlのルート要素を返す
+
+    @param file: XMLファイルパス、または、XMLデータそのもの
+    @return: lxml.etree._Element
+    </comment-ja>
+    <comment-en>
+    Parse the XML once and return its lxml root element.
+    The result can be passed to get_xml_xpath/get_nums_xml_xpath repeatedly
+    without being serialized and reparsed for each expression.
+
+    @param file: Path to XML file, or the XML data itself
+    @return: lxml.etree._Element
+    </comment-en>
+    """
+    from lxml import etree
+
+    if os.path.exists(file):
+        return etree.parse(file).getroot()
+
+    if isinstance(file, str):
+        file = file.encode("utf-8")
+    return etree.fromstring(file)
+
+_xml_xpath_cache = {}
+def compile_xml_xpath(expression):
+    """
+    <comment-ja>
+    XPath式をコンパイルする (プロセス内でキャッシュされる)
+
+    @param expression: XPath 式
+    @return: lxml.etree.XPath
+    </comment-ja>
+    <comment-en>
+    Compile the XPath expression (cached for the whole process)
+
+    @param expression: The XPath expression
+    @return: lxml.etree.XPath
+    </comment-en>
+    """
+    try:
+        return _xml_xpath_cache[expression]
+    except KeyError:
+        from lxml import etree
+        compiled = etree.XPath(expression)
+        _xml_xpath_cache[expression] = compiled
+        return compiled
+
+def _xml_xpath_context(document):
+    # xml.dom.minidom.Document is converted to lxml here for the
+    # backward compatibility. Use get_xml_tree() to avoid it.
+    if hasattr(document, "toxml"):
+        from lxml import etree
+        return etree.fromstring(document.toxml())
+    return document
+
 def get_xml_xpath(document, expression):
     """
     <comment-ja>
     XPathロケーションパスを評価する
 
-    @param document: xml.dom.minidom.Document
+    @param document: lxml.etree._Element または xml.dom.minidom.Document
     @param expression: 実行する XPath 式
     @return: 与えられた XPath 式 にマッチするすべてのノードを含む ノード一覧
     </comment-ja>
     <comment-en>
     Evaluates the XPath Location Path in the given string
 
-    @param file: Path to XML file
+    @param document: lxml.etree._Element or xml.dom.minidom.Document
     @param expression: The XPath expression to execute
     @return: Returns node list containing all nodes matching the given XPath expression
     </comment-en>
     """
 
-    from lxml import etree
-
-    tree = etree.fromstring(document.toxml())
-
-    result = tree.xpath(expression)
+    result = compile_xml_xpath(expression)(_xml_xpath_context(document))
     if result:
         return result[0]
     else:
         return None
 
+def get_all_xml_xpath(document, expression):
+    """
+    <comment-ja>
+    XPathロケーションパスを評価し、マッチしたすべてのノードを返す
+
+    @param document: lxml.etree._Element または xml.dom.minidom.Document
+    @param expression: 実行する XPath 式
+    @return: 与えられた XPath 式 にマッチするすべてのノードのリスト
+    </comment-ja>
+    <comment-en>
+    Evaluates the XPath Location Path and returns all matched nodes
+
+    @param document: lxml.etree._Element or xml.dom.minidom.Document
+    @param expression: The XPath expression to execute
+    @return: Returns list of all nodes matching the given XPath expression
+    </comment-en>
+    """
+
+    return compile_xml_xpath(expression)(_xml_xpath_context(document))
 
 def get_nums_xml_xpath(document, expression):
     """
     <comment-ja>
     XPathロケーションパスを評価する
 
-    @param file: XMLファイルパス、または、XMLデータそのもの
+    @param document: lxml.etree._Element または xml.dom.minidom.Document
     @param expression: 実行する XPath 式
     @return: 与えられた XPath 式 にマッチするすべてのノードを含む ノード数
     </comment-ja>
     <comment-en>
     Evaluates the XPath Location Path in the given string
 
-    @param file: Path to XML file
+    @param document: lxml.etree._Element or xml.dom.minidom.Document
     @param expression: The XPath expression to execute
     @return: Returns the number of node containing all nodes matching the given XPath expression
     </comment-en>
     """
-    from lxml import etree
 
-    tree = etree.fromstring(document.toxml())
-    result = tree.xpath('count(%s)' % expression)
-    return result
+    return compile_xml_xpath('count(%s)' % expression)(_xml_xpath_context(document))
 
 def gettimeofday():
     """
@@ -2104,11 +2176,13 @@ def sh_config_write(filename,opts):
 
     return ret
 
+_virt_uris_cache = {}
 def available_virt_uris():
     """<comment-ja>
     </comment-ja>
     <comment-en>
     get list of libvirt's uri
+    The result is cached until libvirtd.conf is modified.
     </comment-en>
     """
     from karesansui.lib.const import VIRT_LIBVIRTD_CONFIG_FILE, \
@@ -2121,6 +2195,16 @@ def available_virt_uris():
     if len(mechs) == 0:
         mechs = ['KVM']
 
+    try:
+        mtime = os.stat(VIRT_LIBVIRTD_CONFIG_FILE).st_mtime
+    except OSError:
+        mtime = None
+    cache_key = (tuple(mechs), mtime)
+    try:
+        return dict(_virt_uris_cache[cache_key])
+    except KeyError:
+        pass
+
     for _mech in mechs:
         hostname = "127.0.0.1"
         if _mech == "XEN":
@@ -2167,6 +2251,8 @@ def available_virt_uris():
             else:
                 uris[_mech] = KVM_VIRT_URI_RW
 
+    _virt_uris_cache.clear()
+    _virt_uris_cache[cache_key] = dict(uris)
     return uris
 
 def file_type(file):
@@ -3105,51 +3191,185 @@ def karesansui_database_exists():
         return False
     return True
 
+REVERSE_FILE_BLOCK_SIZE = 1024 * 1024
+REVERSE_FILE_GZIP_SEGMENT_SIZE = 16 * 1024 * 1024
+
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+def _gzip_inflate(decomp, data):
+    """<comment-ja>
+    gzipの圧縮データを伸長します。複数のメンバーが連結されたファイルにも対応します。
+    @return: (伸長オブジェクト, 伸長したデータ)
+    </comment-ja>
+    <comment-en>
+    Inflate data with decomp, going on with a new decompressor at each gzip
+    member boundary. Anything after the last member that is not a gzip header
+    is ignored as gzip(1) does, and None is returned as the decompressor.
+    @return: (decompressor to feed the next data to, inflated bytes)
+    </comment-en>
+    """
+    out = []
+    while data and decomp is not None:
+        if decomp.eof:
+            if data[:1] != b"\x1f":
+                decomp = None
+                break
+            decomp = zlib.decompressobj(_GZIP_WBITS)
+        out.append(decomp.decompress(data))
+        if decomp.eof:
+            data = decomp.unused_data
+        else:
+            data = b""
+    return (decomp, b"".join(out))
+
+def _copy_decompressor(decomp):
+    if decomp is None:
+        return None
+    return decomp.copy()
+
 class ReverseFile(object):
-    def __init__(self, fp):
+    """<comment-ja>
+    ファイルを末尾から1行ずつ読み込みます。
+    通常のファイルはmmapで、gzipファイルは先頭から伸長しながら
+    REVERSE_FILE_GZIP_SEGMENT_SIZE毎に伸長状態を記録し、
+    末尾の区間から順に伸長し直して読み込みます。
+    @param fp: ファイルオブジェクト(バイナリモード)またはgzip.GzipFile
+    @param end: 読み込みを開始する位置(通常のファイルのみ)
+    </comment-ja>
+    <comment-en>
+    Iterate over the lines of a file from the last one to the first one.
+    Lines are returned with their newline, decoded as utf-8.
+
+    Plain files are read in aligned blocks of blocksize bytes from the end,
+    through mmap when possible. gzip files are inflated once from the start,
+    recording the inflater state every REVERSE_FILE_GZIP_SEGMENT_SIZE bytes of
+    output; the segments are then inflated again from the last one, so only
+    one segment is held in memory at a time.
+    For plain files, end gives the offset to start reading backward from.
+    </comment-en>
+    """
+
+    def __init__(self, fp, blocksize=REVERSE_FILE_BLOCK_SIZE,
+                 segment_size=REVERSE_FILE_GZIP_SEGMENT_SIZE,
+                 encoding="utf-8", end=None):
         self.fp = fp
-        if isinstance(self.fp ,gzip.GzipFile):
-            self.fp.readlines()
-            self.end = self.fp.size
-            self.fp.seek(self.end)
+        self.blocksize = blocksize
+        self.segment_size = segment_size
+        self.encoding = encoding
+        self.mmap = None
+
+        if isinstance(self.fp, gzip.GzipFile):
+            self.raw = self.fp.fileobj
+            chunks = self._gzip_chunks()
         else:
-            self.fp.seek(0, 2)
-            self.end = self.fp.tell()
+            self.raw = self.fp
+            self.raw.seek(0, 2)
+            self.end = self.raw.tell()
+            if end is not None:
+                self.end = min(end, self.end)
+            try:
+                self.mmap = mmap.mmap(self.raw.fileno(), 0, access=mmap.ACCESS_READ)
+            except (AttributeError, ValueError, EnvironmentError):
+                self.mmap = None
+            chunks = self._block_chunks()
+        self.lines = self._reverse_lines(chunks)
 
     def __enter__(self):
         return self
 
     def __exit__(self, exception_type, exception_value, exception_traceback):
-        self.fp.close()
+        self.close()
 
     def __iter__(self):
         return self
 
     def __next__(self):
-        if self.end == 0:
-            raise StopIteration
-
-        start = self.end - 2
-        while start >= 0:
-            self.fp.seek(start)
-            if self.fp.read(1) == '\n':
-                end = self.end
-                self.end = start
-                return self.fp.read(end - start)
-            start -= 1
-
-        end = self.end + 1
-        self.end = 0
-        self.fp.seek(0)
-        return self.fp.read(end)
+        return next(self.lines).decode(self.encoding, "replace")
+
+    def _block_chunks(self):
+        end = self.end
+        if end == 0:
+            return
+        start = ((end - 1) // self.blocksize) * self.blocksize
+        while end > 0:
+            if self.mmap is not None:
+                yield self.mmap[start:end]
+            else:
+                self.raw.seek(start)
+                yield self.raw.read(end - start)
+            end = start
+            start = max(0, start - self.blocksize)
+
+    def _gzip_chunks(self):
+        # pass 1: inflate everything, keeping (compressed offset,
+        # inflated offset, inflater state) at each segment boundary.
+        raw = self.raw
+        raw.seek(0)
+        decomp = zlib.decompressobj(_GZIP_WBITS)
+        checkpoints = [(0, 0, _copy_decompressor(decomp))]
+        offset = 0
+        inflated = 0
+        next_mark = self.segment_size
+        while True:
+            data = raw.read(self.blocksize)
+            if not data:
+                break
+            (decomp, out) = _gzip_inflate(decomp, data)
+            offset += len(data)
+            inflated += len(out)
+            if inflated >= next_mark:
+                checkpoints.append((offset, inflated, _copy_decompressor(decomp)))
+                next_mark = inflated + self.segment_size
+        checkpoints.append((offset, inflated, None))
+
+        # pass 2: inflate each segment again, from the last one.
+        for i in range(len(checkpoints) - 2, -1, -1):
+            (offset, inflated, decomp) = checkpoints[i]
+            (next_offset, next_inflated, _d) = checkpoints[i + 1]
+            decomp = _copy_decompressor(decomp)
+            raw.seek(offset)
+            out = []
+            while offset < next_offset:
+                data = raw.read(min(self.blocksize, next_offset - offset))
+                if not data:
+                    break
+                (decomp, inflated_data) = _gzip_inflate(decomp, data)
+                out.append(inflated_data)
+                offset += len(data)
+            yield b"".join(out)
+
+    def _reverse_lines(self, chunks):
+        tail = b""
+        # the last line of the file may not end with a newline.
+        final = True
+        for chunk in chunks:
+            pieces = (chunk + tail).split(b"\n")
+            tail = pieces[0]
+            for i in range(len(pieces) - 1, 0, -1):
+                if final is True:
+                    final = False
+                    if pieces[i]:
+                        yield pieces[i]
+                else:
+                    yield pieces[i] + b"\n"
+        if final is False:
+            yield tail + b"\n"
+        elif tail:
+            yield tail
 
     def readline(self):
-        return next(self)
+        try:
+            return next(self)
+        except StopIteration:
+            return ""
 
     def fileno(self):
         return self.fp.fileno()
 
     def close(self):
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
         return self.fp.close()
 
 reverse_file = ReverseFile
@@ -62,7 +62,8 @@ from karesansui.lib.const import KVM_VIRT_CONFIG_DIR, \
 
 from karesansui.lib.utils import get_xml_xpath as XMLXpath, \
      get_nums_xml_xpath as XMLXpathNum, \
-     get_xml_parse as XMLParse, \
+     get_all_xml_xpath as XMLXpathAll, \
+     get_xml_tree as XMLTree, \
      uniq_filename, r_chgrp, r_chmod, isset
 
 from karesansui.lib.file.configfile import ConfigFile
@@ -388,7 +389,8 @@ class ConfigParam:
         #if not os.path.exists(path):
         #    raise KaresansuiConfigParamException("no such file: %s" % path)
 
-        document = XMLParse(path)
+        # parse once, every expression below is evaluated on the same tree.
+        document = XMLTree(path)
 
         domain_type = XMLXpath(document,'/domain/@type')
         self.set_domain_type(str(domain_type))
@@ -469,53 +471,51 @@ class ConfigParam:
                 self.set_graphics_passwd(graphics_passwd)
 
         self.interfaces = []
-        interface_num = XMLXpathNum(document,'/domain/devices/interface')
-        for n in range(1, int(interface_num) + 1):
-            type = XMLXpath(document,'/domain/devices/interface[%i]/@type' % n)
-            mac = XMLXpath(document,'/domain/devices/interface[%i]/mac/@address' % n)
+        for interface in XMLXpathAll(document,'/domain/devices/interface'):
+            type = XMLXpath(interface,'@type')
+            mac = XMLXpath(interface,'mac/@address')
             if str(type) == "network":
-                name = XMLXpath(document,'/domain/devices/interface[%i]/source/@network' % n)
+                name = XMLXpath(interface,'source/@network')
             else:
-                name = XMLXpath(document,'/domain/devices/interface[%i]/source/@bridge' % n)
-            script = XMLXpath(document,'/domain/devices/interface[%i]/script/@path' % n)
+                name = XMLXpath(interface,'source/@bridge')
+            script = XMLXpath(interface,'script/@path')
             if script != None:
                 script = str(script)
-            target = XMLXpath(document,'/domain/devices/interface[%i]/target/@dev' % n)
+            target = XMLXpath(interface,'target/@dev')
             if target != None:
                 target = str(target)
-            model = XMLXpath(document,'/domain/devices/interface[%i]/model/@type' % n)
+            model = XMLXpath(interface,'model/@type')
             if model != None:
                 model = str(model)
             self.add_interface(str(mac), str(type), str(name), script, target, model=model)
 
         self.disks = []
-        disk_num = XMLXpathNum(document,'/domain/devices/disk')
-        for n in range(1, int(disk_num) + 1):
-            device_type = XMLXpath(document,'/domain/devices/disk[%i]/@device' % n)
+        for disk in XMLXpathAll(document,'/domain/devices/disk'):
+            device_type = XMLXpath(disk,'@device')
             if device_type == None:
                 device_type = "disk"
-            disk_type = XMLXpath(document,'/domain/devices/disk[%i]/@type' % n)
-            source_dev = XMLXpath(document,'/domain/devices/disk[%i]/source/@dev' % n) # block
-            source_file = XMLXpath(document,'/domain/devices/disk[%i]/source/@file' % n) # file
+            disk_type = XMLXpath(disk,'@type')
+            source_dev = XMLXpath(disk,'source/@dev') # block
+            source_file = XMLXpath(disk,'source/@file') # file
             source_attribute = ""
             if source_dev:
                 source_attribute = source_dev
             elif source_file:
                 source_attribute = source_file
 
-            target_dev = XMLXpath(document,'/domain/devices/disk[%i]/target/@dev' % n)
-            target_bus = XMLXpath(document,'/domain/devices/disk[%i]/target/@bus' % n)
+            target_dev = XMLXpath(disk,'target/@dev')
+            target_bus = XMLXpath(disk,'target/@bus')
 
-            driver_name = XMLXpath(document,'/domain/devices/disk[%i]/driver/@name' % n)
-            driver_type = XMLXpath(document,'/domain/devices/disk[%i]/driver/@type' % n)
+            driver_name = XMLXpath(disk,'driver/@name')
+            driver_type = XMLXpath(disk,'driver/@type')
 
             shareable = None
-            shareable_num = XMLXpathNum(document,'/domain/devices/disk[%i]/shareable' % n)
+            shareable_num = XMLXpathNum(disk,'shareable')
             if shareable_num > 0:
                 shareable = True
 
             readonly = None
-            readonly_num = XMLXpathNum(document,'/domain/devices/disk[%i]/readonly' % n)
+            readonly_num = XMLXpathNum(disk,'readonly')
             if readonly_num > 0:
                 readonly = True
 
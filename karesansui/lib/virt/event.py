@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui Core.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+""" 
+<comment-ja>
+libvirtのドメインイベントを受信し、ゲストOSの状態をメモリ上で管理する
+</comment-ja>
+<comment-en>
+Receive libvirt domain events and keep the state of guests in memory.
+</comment-en>
+
+@file:   event.py
+
+@copyright:    
+
+"""
+
+import time
+import threading
+import logging
+
+import libvirt
+
+import karesansui
+from karesansui.lib.const import VIRT_EVENT_RETRY_MIN, VIRT_EVENT_RETRY_MAX
+
+EVENT_TO_STATE = {
+    libvirt.VIR_DOMAIN_EVENT_STARTED     : libvirt.VIR_DOMAIN_RUNNING,
+    libvirt.VIR_DOMAIN_EVENT_SUSPENDED   : libvirt.VIR_DOMAIN_PAUSED,
+    libvirt.VIR_DOMAIN_EVENT_RESUMED     : libvirt.VIR_DOMAIN_RUNNING,
+    libvirt.VIR_DOMAIN_EVENT_STOPPED     : libvirt.VIR_DOMAIN_SHUTOFF,
+    libvirt.VIR_DOMAIN_EVENT_SHUTDOWN    : libvirt.VIR_DOMAIN_SHUTDOWN,
+    getattr(libvirt, "VIR_DOMAIN_EVENT_PMSUSPENDED", 7) : getattr(libvirt, "VIR_DOMAIN_PMSUSPENDED", 7),
+    getattr(libvirt, "VIR_DOMAIN_EVENT_CRASHED", 8)     : libvirt.VIR_DOMAIN_CRASHED,
+}
+"""
+<comment-ja>
+ライフサイクルイベントとドメインの状態の対応
+</comment-ja>
+<comment-en>
+Map of lifecycle events to domain states
+</comment-en>
+"""
+
+class KaresansuiVirtEventMonitor:
+    """
+    <comment-ja>
+    libvirtのイベントループを別スレッドで実行し、接続しているハイパーバイザー毎に
+    全ドメインの状態テーブルを保持するクラス
+    </comment-ja>
+    <comment-en>
+    Run the libvirt event loop in a background thread and keep the state
+    table of all domains per connected hypervisor.
+    </comment-en>
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger('karesansui.virt.event')
+        self.serial = 0
+        self._cond = threading.Condition()
+        self._conns = {}
+        self._states = {}
+        self._connecting = set()
+        # uri -> (time of the next try, delay) of the failed hypervisors
+        self._failed = {}
+        self._thread = None
+
+    def start(self):
+        """
+        <comment-ja>
+        イベントループを開始する。libvirtのコネクションを開く前に呼び出すこと。
+        </comment-ja>
+        <comment-en>
+        Start the event loop. It must be called before any libvirt connection is opened.
+        </comment-en>
+        """
+        if self._thread is not None:
+            return
+        libvirt.virEventRegisterDefaultImpl()
+        self._thread = threading.Thread(target=self._run, name="karesansui-virt-event")
+        self._thread.daemon = True
+        self._thread.start()
+        self.logger.info('libvirt event loop started')
+
+    def _run(self):
+        while True:
+            try:
+                libvirt.virEventRunDefaultImpl()
+            except:
+                self.logger.error('libvirt event loop error')
+                time.sleep(1)
+
+    def watch(self, uri, opener):
+        """
+        <comment-ja>
+        ハイパーバイザーのドメインイベントの監視を開始する。既に監視中なら何もしない。
+
+        @param uri: 接続URI
+        @param opener: 監視用の libvirt.virConnect を返す関数
+        @return: 監視中であれば True
+        </comment-ja>
+        <comment-en>
+        Start watching domain events of the hypervisor. Nothing is done if it is already watched.
+        After a failure (e.g. no event support), the hypervisor is not tried
+        again for VIRT_EVENT_RETRY_MIN seconds, doubled on every failure up
+        to VIRT_EVENT_RETRY_MAX.
+
+        @param uri: connection URI
+        @param opener: function which returns libvirt.virConnect used for watching
+        @return: True if it is watched
+        </comment-en>
+        """
+        self._cond.acquire()
+        try:
+            if uri in self._conns:
+                return True
+            if uri in self._connecting:
+                return False
+            if uri in self._failed and time.time() < self._failed[uri][0]:
+                return False
+            self._connecting.add(uri)
+        finally:
+            self._cond.release()
+
+        conn = None
+        try:
+            try:
+                conn = opener()
+                try:
+                    conn.setKeepAlive(5, 3)
+                except (AttributeError, libvirt.libvirtError):
+                    pass
+
+                conn.domainEventRegisterAny(None,
+                                            libvirt.VIR_DOMAIN_EVENT_ID_LIFECYCLE,
+                                            self._lifecycle_cb,
+                                            uri)
+                try:
+                    conn.registerCloseCallback(self._close_cb, uri)
+                except (AttributeError, libvirt.libvirtError):
+                    pass
+
+                # seed the table after registering, so no event is lost.
+                states = {}
+                for dom in conn.listAllDomains(0):
+                    states[dom.UUIDString()] = {
+                        "name"  : dom.name(),
+                        "state" : dom.info()[0],
+                        "serial": 0,
+                        }
+            except (AttributeError, libvirt.libvirtError) as e:
+                self.logger.error('failed to watch libvirt events - %s: %s' % (uri, str(e)))
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except:
+                        pass
+                self._cond.acquire()
+                try:
+                    if uri in self._failed:
+                        delay = min(self._failed[uri][1] * 2, VIRT_EVENT_RETRY_MAX)
+                    else:
+                        delay = VIRT_EVENT_RETRY_MIN
+                    self._failed[uri] = (time.time() + delay, delay)
+                finally:
+                    self._cond.release()
+                return False
+
+            self._cond.acquire()
+            try:
+                self.serial += 1
+                for entry in states.values():
+                    entry["serial"] = self.serial
+                # events received while seeding win.
+                states.update(self._states.get(uri, {}))
+                self._states[uri] = states
+                self._conns[uri] = conn
+                self._failed.pop(uri, None)
+                self._cond.notify_all()
+            finally:
+                self._cond.release()
+
+            self.logger.info('watching libvirt events - %s' % uri)
+            return True
+        finally:
+            self._cond.acquire()
+            try:
+                self._connecting.discard(uri)
+            finally:
+                self._cond.release()
+
+    def _lifecycle_cb(self, conn, dom, event, detail, uri):
+        uuid = dom.UUIDString()
+        self._cond.acquire()
+        try:
+            states = self._states.setdefault(uri, {})
+            self.serial += 1
+            if event == libvirt.VIR_DOMAIN_EVENT_UNDEFINED:
+                state = None
+            elif event == libvirt.VIR_DOMAIN_EVENT_DEFINED:
+                try:
+                    state = states[uuid]["state"]
+                except KeyError:
+                    state = None
+                if state is None:
+                    state = libvirt.VIR_DOMAIN_SHUTOFF
+            else:
+                state = EVENT_TO_STATE.get(event, libvirt.VIR_DOMAIN_NOSTATE)
+            states[uuid] = {
+                "name"  : dom.name(),
+                "state" : state,
+                "serial": self.serial,
+                }
+            self._cond.notify_all()
+        finally:
+            self._cond.release()
+        self.logger.debug('domain event %s: %s event=%d detail=%d' % (uri, dom.name(), event, detail))
+
+    def _close_cb(self, conn, reason, uri):
+        self.logger.info('libvirt event connection closed - %s (reason=%d)' % (uri, reason))
+        self._cond.acquire()
+        try:
+            self._conns.pop(uri, None)
+            self._states.pop(uri, None)
+            self.serial += 1
+            self._cond.notify_all()
+        finally:
+            self._cond.release()
+
+    def get_states(self, uri):
+        """
+        <comment-ja>
+        ドメインの状態テーブルを取得する。
+
+        @param uri: 接続URI
+        @return: {UUID: {"name", "state", "serial"}} 監視していなければ None
+        </comment-ja>
+        <comment-en>
+        Get the state table of domains.
+
+        @param uri: connection URI
+        @return: {UUID: {"name", "state", "serial"}}, None if not watched
+        </comment-en>
+        """
+        self._cond.acquire()
+        try:
+            if (uri in self._conns) is False:
+                return None
+            states = {}
+            for uuid, entry in self._states.get(uri, {}).items():
+                if entry["state"] is not None:
+                    states[uuid] = dict(entry)
+            return states
+        finally:
+            self._cond.release()
+
+    def wait_changes(self, uri, serial, timeout):
+        """
+        <comment-ja>
+        serial 以降に状態が変化したドメインを、変化があるか timeout 秒経過するまで待って返す。
+
+        @param uri: 接続URI
+        @param serial: 前回取得したシリアル番号
+        @param timeout: 最大待ち時間(秒)
+        @return: (現在のシリアル番号, {UUID: {"name", "state", "serial"}}) 監視していなければ None
+        </comment-ja>
+        <comment-en>
+        Wait until any domain changes its state after serial, or timeout
+        seconds elapse, and return the changed domains.
+        Removed domains are returned with the state None.
+
+        @param uri: connection URI
+        @param serial: serial number returned last time
+        @param timeout: maximum seconds to wait
+        @return: (current serial, {UUID: {"name", "state", "serial"}}), None if not watched
+        </comment-en>
+        """
+        deadline = time.time() + timeout
+        self._cond.acquire()
+        try:
+            while True:
+                if (uri in self._conns) is False:
+                    return None
+                changes = {}
+                for uuid, entry in self._states.get(uri, {}).items():
+                    if entry["serial"] > serial:
+                        changes[uuid] = dict(entry)
+                remaining = deadline - time.time()
+                if changes or remaining <= 0:
+                    return (self.serial, changes)
+                self._cond.wait(remaining)
+        finally:
+            self._cond.release()
+
+__monitor = None
+__monitor_lock = threading.Lock()
+
+def get_monitor():
+    """<comment-ja>
+    プロセスで共有するイベント監視を返却します。
+    libvirt.event.status が 1 でない、または start_monitor() が呼ばれていない場合は None を返却します。
+    </comment-ja>
+    <comment-en>
+    Return the event monitor shared in the process.
+    None is returned unless libvirt.event.status is 1 and start_monitor() has been called.
+    </comment-en>
+    """
+    return __monitor
+
+def start_monitor():
+    """<comment-ja>
+    libvirt.event.status が 1 であればイベント監視を開始します。
+    </comment-ja>
+    <comment-en>
+    Start the event monitor if libvirt.event.status is 1.
+    </comment-en>
+    """
+    global __monitor
+    config = karesansui.config
+    if not config or config.get('libvirt.event.status', '0') != '1':
+        return None
+
+    __monitor_lock.acquire()
+    try:
+        if __monitor is None:
+            monitor = KaresansuiVirtEventMonitor()
+            monitor.start()
+            __monitor = monitor
+    finally:
+        __monitor_lock.release()
+    return __monitor
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui Core.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+""" 
+<comment-ja>
+libvirtのコネクションをプロセス内でプールする
+</comment-ja>
+<comment-en>
+Pool libvirt connections in the process.
+</comment-en>
+
+@file:   pool.py
+
+@copyright:    
+
+"""
+
+import time
+import threading
+import logging
+
+import libvirt
+
+import karesansui
+
+class KaresansuiVirtPooledConnection:
+    """
+    <comment-ja>
+    プールされるlibvirtのコネクション
+    ドメイン設定のキャッシュ(ConfigParam)もコネクションと共に保持される。
+    </comment-ja>
+    <comment-en>
+    libvirt connection held by the pool.
+    The cache of domain configurations (ConfigParam) lives with it.
+    </comment-en>
+    """
+
+    def __init__(self, key, conn):
+        self.key = key
+        self.conn = conn
+        self.config_param_cache = {}
+        self.opened = time.time()
+
+    def is_alive(self):
+        try:
+            try:
+                return self.conn.isAlive() == 1
+            except AttributeError:
+                self.conn.getLibVersion()
+                return True
+        except libvirt.libvirtError:
+            return False
+
+    def close(self):
+        try:
+            self.conn.close()
+        except:
+            pass
+
+class KaresansuiVirtConnectionPool:
+    """
+    <comment-ja>
+    URI(と認証情報)毎にlibvirtのコネクションをプールするクラス
+    取り出し時に死活確認を行い、切断されていれば再接続する。
+    </comment-ja>
+    <comment-en>
+    Pool of libvirt connections keyed by URI (and credentials).
+    Connections are health-checked on checkout and reconnected if dead.
+    </comment-en>
+    """
+
+    def __init__(self, size=1):
+        """
+        <comment-ja>
+        @param size: URI毎に保持する未使用コネクションの最大数
+        </comment-ja>
+        <comment-en>
+        @param size: maximum number of idle connections kept per URI
+        </comment-en>
+        """
+        self.size = size
+        self.logger = logging.getLogger('karesansui.virt.pool')
+        self._lock = threading.Lock()
+        self._idle = {}
+
+    def checkout(self, key, opener):
+        """
+        <comment-ja>
+        コネクションを取り出す。未使用のものがなければ opener で新たに接続する。
+
+        @param key: プールのキー (uri, 認証情報)
+        @param opener: libvirt.virConnect を返す関数
+        @rtype: KaresansuiVirtPooledConnection
+        </comment-ja>
+        <comment-en>
+        Take out a connection. If there is no idle one, open new one by opener.
+
+        @param key: key of the pool (uri, credentials)
+        @param opener: function which returns libvirt.virConnect
+        @rtype: KaresansuiVirtPooledConnection
+        </comment-en>
+        """
+        while True:
+            self._lock.acquire()
+            try:
+                try:
+                    pooled = self._idle[key].pop()
+                except (KeyError, IndexError):
+                    pooled = None
+            finally:
+                self._lock.release()
+
+            if pooled is None:
+                break
+            if pooled.is_alive() is True:
+                return pooled
+
+            self.logger.info('libvirt connection is dead, reconnecting - %s' % key[0])
+            pooled.close()
+
+        conn = opener()
+        if conn is None:
+            raise libvirt.libvirtError("failed to open connection to %s" % key[0])
+        self.logger.debug('libvirt connection opened - %s' % key[0])
+        return KaresansuiVirtPooledConnection(key, conn)
+
+    def checkin(self, pooled):
+        """
+        <comment-ja>
+        コネクションをプールへ戻す。上限を超える場合や切断されている場合は閉じる。
+
+        @param pooled: KaresansuiVirtPooledConnection
+        </comment-ja>
+        <comment-en>
+        Return the connection to the pool. It is closed if the pool is full
+        or the connection is dead.
+
+        @param pooled: KaresansuiVirtPooledConnection
+        </comment-en>
+        """
+        if pooled.is_alive() is not True:
+            pooled.close()
+            return
+
+        self._lock.acquire()
+        try:
+            idle = self._idle.setdefault(pooled.key, [])
+            if len(idle) < self.size:
+                idle.append(pooled)
+                pooled = None
+        finally:
+            self._lock.release()
+
+        if pooled is not None:
+            pooled.close()
+
+    def clear(self):
+        """
+        <comment-ja>
+        プールされている全てのコネクションを閉じる。
+        </comment-ja>
+        <comment-en>
+        Close all of the pooled connections.
+        </comment-en>
+        """
+        self._lock.acquire()
+        try:
+            idle = self._idle
+            self._idle = {}
+        finally:
+            self._lock.release()
+
+        for pooled_list in idle.values():
+            for pooled in pooled_list:
+                pooled.close()
+
+__pool = None
+__pool_lock = threading.Lock()
+
+def get_pool():
+    """<comment-ja>
+    プロセスで共有するコネクションプールを返却します。(Optimistic Singleton)
+    libvirt.pool.status が 1 でない場合は None を返却します。
+    </comment-ja>
+    <comment-en>
+    Return the connection pool shared in the process. (Optimistic Singleton)
+    None is returned unless libvirt.pool.status is 1.
+    </comment-en>
+    """
+    global __pool
+    if __pool is None:
+        config = karesansui.config
+        if not config or config.get('libvirt.pool.status', '0') != '1':
+            return None
+
+        __pool_lock.acquire()
+        try:
+            if __pool is None:
+                __pool = KaresansuiVirtConnectionPool(int(config.get('libvirt.pool.size', 1)))
+        finally:
+            __pool_lock.release()
+
+    return __pool
@@ -49,6 +49,7 @@ import libvirt
 import libvirtmod
 import logging
 import glob
+from hashlib import sha1
 
 # define
 from libvirt import VIR_DOMAIN_NOSTATE,VIR_DOMAIN_RUNNING,\
@@ -104,6 +105,9 @@ from karesansui.lib.virt.config_export import ExportConfigParam, ExportXMLGenera
 
 from karesansui.lib.virt.config_capabilities import CapabilitiesConfigParam
 
+from karesansui.lib.virt.pool import get_pool
+from karesansui.lib.virt.event import get_monitor
+
 from karesansui.lib.utils import uniq_sort            as UniqSort
 from karesansui.lib.utils import generate_mac_address as GenMAC
 from karesansui.lib.utils import execute_command      as ExecCmd
@@ -130,6 +134,9 @@ class KaresansuiVirtException(karesansui.KaresansuiLibException):
 
 class KaresansuiVirtConnection:
 
+    _prepared = False
+    _pooled = None
+
     def __init__(self,uri=None,readonly=True):
         self.__prep()
         self.logger.debug(get_inspect_stack())
@@ -148,14 +155,19 @@ class KaresansuiVirtConnection:
         <comment-en>
         </comment-en>
         """
+        self.logger = logging.getLogger('karesansui.virt')
+        # long-lived (pooled) processes need this only once.
+        if KaresansuiVirtConnection._prepared is True:
+            return
         if not os.path.exists(VIRT_DOMAINS_DIR):
           os.makedirs(VIRT_DOMAINS_DIR)
         if not os.path.exists(VIRT_XML_CONFIG_DIR):
           os.makedirs(VIRT_XML_CONFIG_DIR)
-        self.logger = logging.getLogger('karesansui.virt')
         if os.getuid() == 0:
             r_chgrp(VIRT_LIBVIRT_DATA_DIR,KARESANSUI_GROUP)
             r_chmod(VIRT_DOMAINS_DIR,"o-rwx")
+        if get_pool() is not None:
+            KaresansuiVirtConnection._prepared = True
 
     def __prep2(self):
         try:
@@ -216,14 +228,30 @@ class KaresansuiVirtConnection:
                 self.logger.info('libvirt.open - %s' % self.uri)
                 self._conn = libvirt.open(self.uri)
             """
-            self.logger.debug('libvirt.open - %s' % self.uri)
-            self._conn = libvirt.open(self.uri)
+            pool = get_pool()
+            if pool is not None:
+                self.logger.debug('libvirt pool checkout - %s' % self.uri)
+                self._pooled = pool.checkout((self.uri, None), lambda: libvirt.open(self.uri))
+                self._conn = self._pooled.conn
+            else:
+                self.logger.debug('libvirt.open - %s' % self.uri)
+                self._conn = libvirt.open(self.uri)
         except:
             self.logger.error('failed to libvirt open - %s' % self.uri)
 
         self.logger.debug('succeed to libvirt open - %s' % self.uri)
         self.logger.debug('hypervisor_type - %s' % self.get_hypervisor_type())
 
+        if self._pooled is not None:
+            self._config_param_cache = self._pooled.config_param_cache
+        else:
+            self._config_param_cache = {}
+
+        monitor = get_monitor()
+        if monitor is not None:
+            uri = self.uri
+            monitor.watch(uri, lambda: libvirt.open(uri))
+
         self.guest = KaresansuiVirtGuest(self)
         self.network = KaresansuiVirtNetwork(self)
         self.storage_volume = KaresansuiVirtStorageVolume(self)
@@ -239,15 +267,159 @@ class KaresansuiVirtConnection:
         </comment-en>
         """
         self.logger.debug(get_inspect_stack())
+        if self._pooled is not None and (conn is None or conn is self._pooled.conn):
+            get_pool().checkin(self._pooled)
+            # the connection belongs to the pool now; closing it again
+            # would close it under its next user.
+            self._pooled = None
+            self._conn = None
+            self.logger.debug('libvirt pool checkin - %s' % self.uri)
+            return
         if conn == None:
-            try:
-                conn = self._conn
-            except NameError:
-                pass
+            conn = getattr(self, '_conn', None)
         if conn != None:
             conn.__del__()
+            if conn is getattr(self, '_conn', None):
+                self._conn = None
             self.logger.debug('succeed to libvirt close - %s' % self.uri)
 
+    def sync_domain_xml_file(self, dom):
+        """
+        <comment-ja>
+        ドメインのXML設定ファイルが存在しなければ作成します。
+        </comment-ja>
+        <comment-en>
+        Write the XML configuration file of the domain if it does not exist.
+        </comment-en>
+        """
+        xml_file = "%s/%s.xml" % (VIRT_XML_CONFIG_DIR, dom.name())
+        if not os.path.exists(xml_file):
+            if dom._conn.getURI() in list(available_virt_uris().values()):
+                ConfigFile(xml_file).write(dom.XMLDesc(0))
+                if os.getuid() == 0 and os.path.exists(xml_file):
+                    r_chgrp(xml_file,KARESANSUI_GROUP)
+
+    def get_domain_config_param(self, dom, flags=VIR_DOMAIN_XML_INACTIVE):
+        """
+        <comment-ja>
+        ドメインの設定を解析したConfigParamを取得します。
+        解析結果はドメインのUUIDとXMLのハッシュ値でキャッシュされ、
+        XMLが変更されていなければ再解析しません。
+        返却されたConfigParamは共有されるため変更しないでください。
+
+        @param dom: libvirt.virDomain
+        @param flags: virDomainGetXMLDesc に渡すフラグ
+        @return: ConfigParam
+        </comment-ja>
+        <comment-en>
+        Get the parsed ConfigParam of the domain.
+        The result is cached by the domain UUID and the hash of its XML,
+        so the XML is not parsed again until it changes.
+        The returned ConfigParam is shared, do not modify it.
+
+        @param dom: libvirt.virDomain
+        @param flags: flags passed to virDomainGetXMLDesc
+        @return: ConfigParam
+        </comment-en>
+        """
+        self.sync_domain_xml_file(dom)
+
+        xml = dom.XMLDesc(flags)
+        generation = sha1(xml.encode("utf-8")).hexdigest()
+
+        key = (dom.UUIDString(), flags)
+        try:
+            cached_generation, param = self._config_param_cache[key]
+            if cached_generation == generation:
+                return param
+        except KeyError:
+            pass
+
+        param = ConfigParam(dom.name())
+        param.load_xml_config(xml)
+        self._config_param_cache[key] = (generation, param)
+        return param
+
+    def invalidate_domain_config_param(self, uuid=None):
+        """
+        <comment-ja>
+        キャッシュされたConfigParamを破棄します。
+
+        @param uuid: ドメインのUUID (Noneの場合は全て)
+        </comment-ja>
+        <comment-en>
+        Discard the cached ConfigParam.
+
+        @param uuid: UUID of the domain (all domains if None)
+        </comment-en>
+        """
+        if uuid is None:
+            self._config_param_cache.clear()
+            return
+        for key in list(self._config_param_cache.keys()):
+            if key[0] == uuid:
+                del self._config_param_cache[key]
+
+    def get_domain_states(self):
+        """
+        <comment-ja>
+        ドメインイベントにより更新される全ドメインの状態テーブルを取得します。
+
+        @return: {UUID: {"name", "state", "serial"}}
+                 イベント監視が有効でない場合は None
+        </comment-ja>
+        <comment-en>
+        Get the state table of all domains kept up to date by domain events.
+
+        @return: {UUID: {"name", "state", "serial"}}
+                 None if event monitoring is not enabled
+        </comment-en>
+        """
+        monitor = get_monitor()
+        if monitor is None:
+            return None
+        return monitor.get_states(self.uri)
+
+    def get_domain_state(self, uuid):
+        """
+        <comment-ja>
+        状態テーブルからドメインの状態(virDomainState)を取得します。
+
+        @param uuid: ドメインのUUID
+        @return: virDomainState 状態テーブルに無い場合は None
+        </comment-ja>
+        <comment-en>
+        Get the state (virDomainState) of the domain from the state table.
+
+        @param uuid: UUID of the domain
+        @return: virDomainState, None if it is not in the state table
+        </comment-en>
+        """
+        states = self.get_domain_states()
+        if states is None or (uuid in states) is False:
+            return None
+        return states[uuid]["state"]
+
+    def wait_domain_state_changes(self, serial, timeout):
+        """
+        <comment-ja>
+        serial 以降のドメインの状態変化を最大 timeout 秒待って取得します。
+
+        @return: (シリアル番号, {UUID: {"name", "state", "serial"}})
+                 イベント監視が有効でない場合は None
+        </comment-ja>
+        <comment-en>
+        Wait up to timeout seconds for state changes of domains after serial.
+
+        @return: (serial, {UUID: {"name", "state", "serial"}})
+                 None if event monitoring is not enabled
+        </comment-en>
+        """
+        monitor = get_monitor()
+        if monitor is None:
+            return None
+        return monitor.wait_changes(self.uri, serial, timeout)
+
     def get_hypervisor_type(self):
         """<comment-ja>
         使用中のハイパーバイザーの種類を取得する。
@@ -485,8 +657,11 @@ class KaresansuiVirtConnection:
         </comment-en>
         """
         names = []
-        for id in self._conn.listDomainsID():
-            dom = self._conn.lookupByID(id);
+        try:
+            doms = self._conn.listAllDomains(libvirt.VIR_CONNECT_LIST_DOMAINS_ACTIVE)
+        except (AttributeError, libvirt.libvirtError):
+            doms = [self._conn.lookupByID(id) for id in self._conn.listDomainsID()]
+        for dom in doms:
             if type == "uuid":
                 names.append(dom.UUIDString())
             else:
@@ -509,14 +684,22 @@ class KaresansuiVirtConnection:
         try:
             guests = self.result_search_guests
         except:
-            ids = self._conn.listDomainsID()
-            for id in ids:
-                if self._conn.lookupByID(id).name() == "Domain-0" and self.get_hypervisor_type() == 'Xen':
-                    continue
-                guests.append(self._conn.lookupByID(id))
-            names = self.list_inactive_guest()
-            for _name in names:
-                guests.append(self._conn.lookupByName(_name))
+            try:
+                doms = self._conn.listAllDomains(0)
+                # active domains first, same order as listDomainsID + listDefinedDomains
+                doms.sort(key=lambda dom: dom.ID() < 0)
+            except (AttributeError, libvirt.libvirtError):
+                doms = [self._conn.lookupByID(id) for id in self._conn.listDomainsID()]
+                for _name in self.list_inactive_guest():
+                    doms.append(self._conn.lookupByName(_name))
+            is_xen = None
+            for dom in doms:
+                if dom.name() == "Domain-0":
+                    if is_xen is None:
+                        is_xen = self.get_hypervisor_type() == 'Xen'
+                    if is_xen is True:
+                        continue
+                guests.append(dom)
             self.result_search_guests = guests
 
         if name == None:
@@ -529,6 +712,123 @@ class KaresansuiVirtConnection:
         #return []
         raise KaresansuiVirtException("guest %s not found" % name)
 
+    def get_guest_inventory(self):
+        """
+        <comment-ja>
+        全てのゲストOSの状態、メモリ、仮想CPU、CPU時間、ディスクとネットワークの
+        カウンタを一括で取得します。
+        virConnectGetAllDomainStats が利用できる場合、ゲストの数に関わらず
+        libvirtの呼び出しは1回です。
+
+        @return: ゲストOS毎の辞書のリスト
+        </comment-ja>
+        <comment-en>
+        Get state, memory, vCPUs, CPU time, block and interface counters
+        of all guests at once.
+        When virConnectGetAllDomainStats is available, it takes a single
+        libvirt call regardless of the number of guests.
+
+        @return: list of dictionaries per guest
+        </comment-en>
+        """
+        try:
+            stats = libvirt.VIR_DOMAIN_STATS_STATE \
+                  | libvirt.VIR_DOMAIN_STATS_CPU_TOTAL \
+                  | libvirt.VIR_DOMAIN_STATS_BALLOON \
+                  | libvirt.VIR_DOMAIN_STATS_VCPU \
+                  | libvirt.VIR_DOMAIN_STATS_INTERFACE \
+                  | libvirt.VIR_DOMAIN_STATS_BLOCK
+            records = self._conn.getAllDomainStats(stats, 0)
+        except (AttributeError, libvirt.libvirtError):
+            records = [(dom, None) for dom in self.search_guests()]
+
+        inventory = []
+        is_xen = None
+        for dom, record in records:
+            if dom.name() == "Domain-0":
+                if is_xen is None:
+                    is_xen = self.get_hypervisor_type() == 'Xen'
+                if is_xen is True:
+                    continue
+            inventory.append(self._domain_inventory(dom, record))
+
+        # active domains first, same order as search_guests()
+        inventory.sort(key=lambda info: info["id"] < 0)
+        return inventory
+
+    def _domain_inventory(self, dom, record=None):
+        info = {
+                "domain"    : dom,
+                "name"      : dom.name(),
+                "uuid"      : dom.UUIDString(),
+                "id"        : dom.ID(),
+                "block"     : [],
+                "interface" : [],
+               }
+
+        if record is None:
+            data = dom.info()
+            info.update({
+                "state"     : data[0],
+                "maxMem"    : data[1],
+                "memory"    : data[2],
+                "nrVirtCpu" : data[3],
+                "cpuTime"   : data[4],
+                })
+            return info
+
+        info.update({
+            "state"     : record.get("state.state", VIR_DOMAIN_NOSTATE),
+            "maxMem"    : record.get("balloon.maximum", 0),
+            "memory"    : record.get("balloon.current", 0),
+            "nrVirtCpu" : record.get("vcpu.current", 0),
+            "cpuTime"   : record.get("cpu.time", 0),
+            })
+
+        for i in range(record.get("block.count", 0)):
+            prefix = "block.%d." % i
+            info["block"].append({
+                "name"     : record.get(prefix + "name"),
+                "rd_reqs"  : record.get(prefix + "rd.reqs", 0),
+                "rd_bytes" : record.get(prefix + "rd.bytes", 0),
+                "wr_reqs"  : record.get(prefix + "wr.reqs", 0),
+                "wr_bytes" : record.get(prefix + "wr.bytes", 0),
+                })
+
+        for i in range(record.get("net.count", 0)):
+            prefix = "net.%d." % i
+            info["interface"].append({
+                "name"       : record.get(prefix + "name"),
+                "rx_bytes"   : record.get(prefix + "rx.bytes", 0),
+                "rx_packets" : record.get(prefix + "rx.pkts", 0),
+                "rx_errs"    : record.get(prefix + "rx.errs", 0),
+                "rx_drop"    : record.get(prefix + "rx.drop", 0),
+                "tx_bytes"   : record.get(prefix + "tx.bytes", 0),
+                "tx_packets" : record.get(prefix + "tx.pkts", 0),
+                "tx_errs"    : record.get(prefix + "tx.errs", 0),
+                "tx_drop"    : record.get(prefix + "tx.drop", 0),
+                })
+
+        return info
+
+    def search_kvg_guests_by_inventory(self):
+        """<comment-ja>
+        get_guest_inventory() で一括取得した情報を保持したKaresansuiVirtGuestオブジェクトの
+        listを返却する。status() はlibvirtを呼び出さずにその情報を返す。
+        </comment-ja>
+        <comment-en>
+        Return list of KaresansuiVirtGuest objects holding the information
+        collected by get_guest_inventory(). Their status() answers from it
+        without calling libvirt.
+        </comment-en>
+        """
+        guests = []
+        for info in self.get_guest_inventory():
+            guests.append(
+                KaresansuiVirtGuest(conn=self, name=info["name"], inventory=info))
+
+        return guests
+
     def search_kvg_guests(self, name=None):
         """<comment-ja>
         指定されたゲストOSオブジェクトをKaresansuiVirtGuestオブジェクトのlistにして返却する。
@@ -560,16 +860,7 @@ class KaresansuiVirtConnection:
         ports = []
         for guest in self.search_guests(None):
 
-            param = ConfigParam(guest.name())
-            xml_file = "%s/%s.xml" % (VIRT_XML_CONFIG_DIR, guest.name())
-            dom = self._conn.lookupByName(guest.name())
-            if not os.path.exists(xml_file):
-                if dom._conn.getURI() in list(available_virt_uris().values()):
-                    ConfigFile(xml_file).write(dom.XMLDesc(0))
-                    if os.getuid() == 0 and os.path.exists(xml_file):
-                        r_chgrp(xml_file,KARESANSUI_GROUP)
-            #param.load_xml_config(xml_file)
-            param.load_xml_config(dom.XMLDesc(VIR_DOMAIN_XML_INACTIVE))
+            param = self.get_domain_config_param(guest)
 
             graphics_port = param.graphics_port
             if graphics_port and int(graphics_port) > 0:
@@ -589,16 +880,7 @@ class KaresansuiVirtConnection:
         addrs = []
         for guest in self.search_guests(None):
 
-            param = ConfigParam(guest.name())
-            xml_file = "%s/%s.xml" % (VIRT_XML_CONFIG_DIR, guest.name())
-            dom = self._conn.lookupByName(guest.name())
-            if not os.path.exists(xml_file):
-                if dom._conn.getURI() in list(available_virt_uris().values()):
-                    ConfigFile(xml_file).write(dom.XMLDesc(0))
-                    if os.getuid() == 0 and os.path.exists(xml_file):
-                        r_chgrp(xml_file,KARESANSUI_GROUP)
-            #param.load_xml_config(xml_file)
-            param.load_xml_config(dom.XMLDesc(VIR_DOMAIN_XML_INACTIVE))
+            param = self.get_domain_config_param(guest)
 
             for info in param.interfaces:
                 mac_addr = info['mac']
@@ -3031,10 +3313,11 @@ class KaresansuiVirtConnection:
 
 class KaresansuiVirtGuest:
 
-    def __init__(self, conn, name=None):
+    def __init__(self, conn, name=None, inventory=None):
         self.connection = conn
         self._conn = self.connection._conn
         self.set_domain_name(name)
+        self.inventory = inventory
 
     def get_json(self):
         """<comment-ja>
@@ -3060,8 +3343,17 @@ class KaresansuiVirtGuest:
         return self.domain
 
     def get_info(self):
-        dom = self._conn.lookupByName(self.get_domain_name())
-        data = dom.info()
+        if self.inventory is not None:
+            dom = self.inventory["domain"]
+            data = (self.inventory["state"],
+                    self.inventory["maxMem"],
+                    self.inventory["memory"],
+                    self.inventory["nrVirtCpu"],
+                    self.inventory["cpuTime"],
+                    )
+        else:
+            dom = self._conn.lookupByName(self.get_domain_name())
+            data = dom.info()
         try:
             os_type = dom.OSType()
         except:
@@ -3072,15 +3364,7 @@ class KaresansuiVirtGuest:
             uuid = None
 
         try:
-            param = ConfigParam(dom.name())
-            xml_file = "%s/%s.xml" % (VIRT_XML_CONFIG_DIR, dom.name())
-            if not os.path.exists(xml_file):
-                if dom._conn.getURI() in list(available_virt_uris().values()):
-                    ConfigFile(xml_file).write(dom.XMLDesc(0))
-                    if os.getuid() == 0 and os.path.exists(xml_file):
-                        r_chgrp(xml_file,KARESANSUI_GROUP)
-            #param.load_xml_config(xml_file)
-            param.load_xml_config(dom.XMLDesc(VIR_DOMAIN_XML_INACTIVE))
+            param = self.connection.get_domain_config_param(dom)
 
             vm_type = param.domain_type
             os_root = param.os_root
@@ -3147,15 +3431,7 @@ class KaresansuiVirtGuest:
         infos = []
         dom = self._conn.lookupByName(self.get_domain_name())
 
-        param = ConfigParam(dom.name())
-        xml_file = "%s/%s.xml" % (VIRT_XML_CONFIG_DIR, dom.name())
-        if not os.path.exists(xml_file):
-            if dom._conn.getURI() in list(available_virt_uris().values()):
-                ConfigFile(xml_file).write(dom.XMLDesc(0))
-                if os.getuid() == 0 and os.path.exists(xml_file):
-                    r_chgrp(xml_file,KARESANSUI_GROUP)
-        #param.load_xml_config(xml_file)
-        param.load_xml_config(dom.XMLDesc(VIR_DOMAIN_XML_INACTIVE))
+        param = self.connection.get_domain_config_param(dom)
 
         for info in param.disks:
             driver = {}
@@ -3205,23 +3481,16 @@ class KaresansuiVirtGuest:
     def get_vcpus_info(self):
         dom = self._conn.lookupByName(self.get_domain_name())
 
-        param = ConfigParam(dom.name())
-        xml_file = "%s/%s.xml" % (VIRT_XML_CONFIG_DIR, dom.name())
-        if not os.path.exists(xml_file):
-            if dom._conn.getURI() in list(available_virt_uris().values()):
-                ConfigFile(xml_file).write(dom.XMLDesc(1))
-                if os.getuid() == 0 and os.path.exists(xml_file):
-                    r_chgrp(xml_file,KARESANSUI_GROUP)
-        #param.load_xml_config(xml_file)
-        param.load_xml_config(dom.XMLDesc(VIR_DOMAIN_XML_INACTIVE))
+        param = self.connection.get_domain_config_param(dom)
 
         try:
             max_vcpus = int(param.max_vcpus)
         except:
             max_vcpus = None
         try:
-            if self.status() != VIR_DOMAIN_SHUTOFF:
-                vcpus = self.get_info()['nrVirtCpu']
+            data = dom.info()
+            if data[0] != VIR_DOMAIN_SHUTOFF:
+                vcpus = data[3]
             else:
                 vcpus = None
         except:
@@ -3241,15 +3510,7 @@ class KaresansuiVirtGuest:
         infos = []
         dom = self._conn.lookupByName(self.get_domain_name())
 
-        param = ConfigParam(dom.name())
-        xml_file = "%s/%s.xml" % (VIRT_XML_CONFIG_DIR, dom.name())
-        if not os.path.exists(xml_file):
-            if dom._conn.getURI() in list(available_virt_uris().values()):
-                ConfigFile(xml_file).write(dom.XMLDesc(0))
-                if os.getuid() == 0 and os.path.exists(xml_file):
-                    r_chgrp(xml_file,KARESANSUI_GROUP)
-        #param.load_xml_config(xml_file)
-        param.load_xml_config(dom.XMLDesc(0))
+        param = self.connection.get_domain_config_param(dom, 0)
 
         for info in param.interfaces:
             mac = {}
@@ -3286,15 +3547,7 @@ class KaresansuiVirtGuest:
         dom = self._conn.lookupByName(self.get_domain_name())
 
         """ current info """
-        param = ConfigParam(dom.name())
-        xml_file = "%s/%s.xml" % (VIRT_XML_CONFIG_DIR, dom.name())
-        if not os.path.exists(xml_file):
-            if dom._conn.getURI() in list(available_virt_uris().values()):
-                ConfigFile(xml_file).write(dom.XMLDesc(0))
-                if os.getuid() == 0 and os.path.exists(xml_file):
-                    r_chgrp(xml_file,KARESANSUI_GROUP)
-        #param.load_xml_config(xml_file)
-        param.load_xml_config(dom.XMLDesc(0))
+        param = self.connection.get_domain_config_param(dom, 0)
 
         type     = param.get_graphics_type()
         port     = param.get_graphics_port()
@@ -3310,16 +3563,7 @@ class KaresansuiVirtGuest:
                        }
 
         """ current setting """
-        param = ConfigParam(self.get_domain_name())
-        xml_file = "%s/%s.xml" % (VIRT_XML_CONFIG_DIR, self.get_domain_name())
-        dom = self._conn.lookupByName(self.get_domain_name())
-        if not os.path.exists(xml_file):
-            if dom._conn.getURI() in list(available_virt_uris().values()):
-                ConfigFile(xml_file).write(dom.XMLDesc(0))
-                if os.getuid() == 0 and os.path.exists(xml_file):
-                    r_chgrp(xml_file,KARESANSUI_GROUP)
-        #param.load_xml_config(xml_file)
-        param.load_xml_config(dom.XMLDesc(VIR_DOMAIN_XML_INACTIVE))
+        param = self.connection.get_domain_config_param(dom)
 
         type     = param.get_graphics_type()
         port     = param.get_graphics_port()
@@ -3339,6 +3583,7 @@ class KaresansuiVirtGuest:
         return {"info":current_info,"setting":current_setting}
 
     def create(self):
+        self.inventory = None
         if self.is_creatable() is True:
             time.sleep(1)
             dom = self._conn.lookupByName(self.get_domain_name())
@@ -3349,6 +3594,7 @@ class KaresansuiVirtGuest:
                     break
 
     def shutdown(self):
+        self.inventory = None
         if self.is_shutdownable() is True:
             time.sleep(1)
             dom = self._conn.lookupByName(self.get_domain_name())
@@ -3359,6 +3605,7 @@ class KaresansuiVirtGuest:
                     break
 
     def reboot(self):
+        self.inventory = None
         if self.is_shutdownable() is True:
             time.sleep(1)
             dom = self._conn.lookupByName(self.get_domain_name())
@@ -3379,6 +3626,7 @@ class KaresansuiVirtGuest:
                     break
 
     def destroy(self):
+        self.inventory = None
         if self.is_destroyable() is True:
             time.sleep(1)
             dom = self._conn.lookupByName(self.get_domain_name())
@@ -3389,6 +3637,7 @@ class KaresansuiVirtGuest:
                     break
 
     def suspend(self):
+        self.inventory = None
         if self.is_suspendable() is True:
             time.sleep(1)
             dom = self._conn.lookupByName(self.get_domain_name())
@@ -3399,6 +3648,7 @@ class KaresansuiVirtGuest:
                     break
 
     def resume(self):
+        self.inventory = None
         if self.is_resumable() is True:
             time.sleep(1)
             dom = self._conn.lookupByName(self.get_domain_name())
@@ -3409,11 +3659,16 @@ class KaresansuiVirtGuest:
                     break
 
     def undefine(self):
+        self.inventory = None
         dom = self._conn.lookupByName(self.get_domain_name())
+        self.connection.invalidate_domain_config_param(dom.UUIDString())
         dom.undefine()
 
     def status(self):
-        return self.get_info()["state"]
+        if self.inventory is not None:
+            return self.inventory["state"]
+        dom = self._conn.lookupByName(self.get_domain_name())
+        return dom.info()[0]
 
     def save(self,file):
         dom = self._conn.lookupByName(self.get_domain_name())
@@ -4498,13 +4753,28 @@ class KaresansuiVirtConnectionAuth(KaresansuiVirtConnection):
 
             flags = [libvirt.VIR_CRED_AUTHNAME,libvirt.VIR_CRED_PASSPHRASE]
             auth = [flags,getCredentials,creds]
-            self._conn = libvirt.openAuth(self.uri,auth,0)
+            pool = get_pool()
+            if pool is not None:
+                self._pooled = pool.checkout((self.uri, creds), lambda: libvirt.openAuth(self.uri,auth,0))
+                self._conn = self._pooled.conn
+            else:
+                self._conn = libvirt.openAuth(self.uri,auth,0)
 
         except:
             self.logger.error('failed to libvirt open - %s' % self.uri)
 
         self.logger.debug('succeed to libvirt open - %s' % self.uri)
 
+        if self._pooled is not None:
+            self._config_param_cache = self._pooled.config_param_cache
+        else:
+            self._config_param_cache = {}
+
+        monitor = get_monitor()
+        if monitor is not None:
+            uri = self.uri
+            monitor.watch(uri, lambda: libvirt.openAuth(uri,auth,0))
+
         self.guest = KaresansuiVirtGuest(self)
 
         return self._conn
@@ -184,6 +184,27 @@ def chkconfig(config):
             print('Please set "database.pool.max.overflow" to a value that is larger than "database.pool.size".', file=sys.stderr)
             check = False
 
+    # libvirt.event.status (optional)
+    if check and ("libvirt.event.status" in config) is True:
+        if check and (config["libvirt.event.status"] in ("0","1")) is False:
+            print('The mistake is found in the set value. Please set 0 or 1. - libvirt.event.status', file=sys.stderr)
+            check = False
+
+    # libvirt.pool.status (optional)
+    if check and ("libvirt.pool.status" in config) is True:
+        if check and (config["libvirt.pool.status"] in ("0","1")) is False:
+            print('The mistake is found in the set value. Please set 0 or 1. - libvirt.pool.status', file=sys.stderr)
+            check = False
+
+        if check and config["libvirt.pool.status"] == "1" and ("libvirt.pool.size" in config) is True:
+            if check and is_int(config["libvirt.pool.size"]) is False:
+                print('Please set it by the numerical value. - libvirt.pool.size', file=sys.stderr)
+                check = False
+
+            if check and int(config["libvirt.pool.size"]) <= 0:
+                print('Please set values that are larger than 0. - libvirt.pool.size', file=sys.stderr)
+                check = False
+
     return check
 
 def built_in():
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+import unittest
+
+from karesansui.lib.collectd.action.dispatcher import ActionDispatcher, SMTPConnectionCache
+
+def nop():
+    pass
+
+class TestActionDispatcher(unittest.TestCase):
+
+    def test_coalesce_same_state(self):
+        # no workers: the queued actions stay in the queue
+        dispatcher = ActionDispatcher(workers=0, queue_size=10, coalesce_window=60)
+        self.assertTrue(dispatcher.submit(("cpu", "FAILURE"), nop))
+        self.assertFalse(dispatcher.submit(("cpu", "FAILURE"), nop))
+        self.assertTrue(dispatcher.submit(("memory", "FAILURE"), nop))
+        metrics = dispatcher.get_metrics()
+        self.assertEqual(metrics["submitted"], 3)
+        self.assertEqual(metrics["coalesced"], 1)
+        self.assertEqual(metrics["queued"], 2)
+
+    def test_state_change_not_coalesced(self):
+        dispatcher = ActionDispatcher(workers=0, queue_size=10, coalesce_window=60)
+        self.assertTrue(dispatcher.submit(("cpu", "FAILURE"), nop))
+        self.assertTrue(dispatcher.submit(("cpu", "OKAY"), nop))
+        self.assertTrue(dispatcher.submit(("cpu", "FAILURE"), nop))
+        metrics = dispatcher.get_metrics()
+        self.assertEqual(metrics["coalesced"], 0)
+        self.assertEqual(metrics["queued"], 3)
+
+    def test_drop_on_full_queue(self):
+        dispatcher = ActionDispatcher(workers=0, queue_size=2, coalesce_window=60)
+        self.assertTrue(dispatcher.submit(("cpu", "FAILURE"), nop))
+        self.assertTrue(dispatcher.submit(("memory", "FAILURE"), nop))
+        self.assertFalse(dispatcher.submit(("disk", "FAILURE"), nop))
+        # a dropped action is not remembered for coalescing
+        self.assertFalse(dispatcher.submit(("disk", "FAILURE"), nop))
+        metrics = dispatcher.get_metrics()
+        self.assertEqual(metrics["submitted"], 4)
+        self.assertEqual(metrics["coalesced"], 0)
+        self.assertEqual(metrics["dropped"], 2)
+        self.assertEqual(metrics["queued"], 2)
+        self.assertEqual(metrics["queue_size"], 2)
+        self.assertEqual(metrics["high_water"], 2)
+
+    def test_run_actions(self):
+        dispatcher = ActionDispatcher(workers=2, queue_size=10, coalesce_window=0)
+        done = []
+        def fail():
+            raise Exception("failed")
+        dispatcher.submit(None, done.append, 1)
+        dispatcher.submit(None, fail)
+        dispatcher.submit(None, done.append, 2)
+        self.assertEqual(dispatcher.stop(10), 0)
+        self.assertEqual(sorted(done), [1, 2])
+        metrics = dispatcher.get_metrics()
+        self.assertEqual(metrics["done"], 2)
+        self.assertEqual(metrics["failed"], 1)
+
+    def test_stop_timeout(self):
+        dispatcher = ActionDispatcher(workers=1, queue_size=1, coalesce_window=0)
+        running = threading.Event()
+        release = threading.Event()
+        def block():
+            running.set()
+            release.wait(10)
+        try:
+            dispatcher.submit(None, block)
+            running.wait(10)
+            # the queue is full: putting the stop sentinel would block
+            dispatcher.submit(None, nop)
+            start = time.time()
+            abandoned = dispatcher.stop(0.5)
+            self.assertTrue(time.time() - start < 2)
+            self.assertEqual(abandoned, 1)
+        finally:
+            release.set()
+
+class FakeConnection:
+
+    def __init__(self):
+        self.closed = False
+
+    def quit(self):
+        self.closed = True
+
+class FakeMail:
+
+    smtp_server = "localhost"
+    smtp_port = 25
+    auth_user = None
+
+    def __init__(self):
+        self.connections = []
+        self.sent = []
+        self.fail = []
+        self.broken = False
+
+    def connect(self):
+        connection = FakeConnection()
+        self.connections.append(connection)
+        return connection
+
+    def send(self, connection=None):
+        if self.broken or connection in self.fail:
+            raise Exception("connection closed")
+        self.sent.append(connection)
+
+class TestSMTPConnectionCache(unittest.TestCase):
+
+    def test_reuse(self):
+        cache = SMTPConnectionCache(idle_timeout=60)
+        mail = FakeMail()
+        cache.send(mail)
+        cache.send(mail)
+        self.assertEqual(len(mail.connections), 1)
+        self.assertEqual(mail.sent, [mail.connections[0]] * 2)
+
+    def test_retry_stale_connection(self):
+        cache = SMTPConnectionCache(idle_timeout=60)
+        mail = FakeMail()
+        cache.send(mail)
+        stale = mail.connections[0]
+        mail.fail.append(stale)
+        cache.send(mail)
+        self.assertTrue(stale.closed)
+        self.assertEqual(len(mail.connections), 2)
+        self.assertEqual(mail.sent, [stale, mail.connections[1]])
+
+    def test_retry_once(self):
+        cache = SMTPConnectionCache(idle_timeout=60)
+        mail = FakeMail()
+        cache.send(mail)
+        # the reused and the new connection both fail: the error is raised
+        mail.broken = True
+        self.assertRaises(Exception, cache.send, mail)
+        self.assertEqual(len(mail.connections), 2)
+        self.assertEqual(len(mail.sent), 1)
+
+    def test_no_retry_fresh_connection(self):
+        cache = SMTPConnectionCache(idle_timeout=60)
+        mail = FakeMail()
+        mail.broken = True
+        self.assertRaises(Exception, cache.send, mail)
+        self.assertEqual(len(mail.connections), 1)
+        self.assertTrue(mail.connections[0].closed)
+
+class SuiteActionDispatcher(unittest.TestSuite):
+    def __init__(self):
+        tests = ['test_coalesce_same_state',
+                 'test_state_change_not_coalesced',
+                 'test_drop_on_full_queue',
+                 'test_run_actions',
+                 'test_stop_timeout',
+                 ]
+        unittest.TestSuite.__init__(self,list(map(TestActionDispatcher, tests)))
+
+class SuiteSMTPConnectionCache(unittest.TestSuite):
+    def __init__(self):
+        tests = ['test_reuse',
+                 'test_retry_stale_connection',
+                 'test_retry_once',
+                 'test_no_retry_fresh_connection',
+                 ]
+        unittest.TestSuite.__init__(self,list(map(TestSMTPConnectionCache, tests)))
+
+def all_suite_action_dispatcher():
+    return unittest.TestSuite([SuiteActionDispatcher(),
+                               SuiteSMTPConnectionCache()])
+
+def main():
+    unittest.TextTestRunner(verbosity=2).run(all_suite_action_dispatcher())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import shutil
+import tempfile
+import unittest
+
+from karesansui.lib.auth_cache import AuthCache
+
+class DummyUser:
+    def __init__(self, email):
+        self.email = email
+
+class TestAuthCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = AuthCache(size=2, ttl=60, stamp_file="%s/stamp" % self.tmp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get(self):
+        user = DummyUser("foo@example.com")
+        stamp = self.cache.stamp()
+        self.cache.set("Zm9vOmJhcg==", user, stamp)
+        self.assertTrue(self.cache.get("Zm9vOmJhcg==", stamp) is user)
+        self.assertEqual(self.cache.get("Zm9vOmJheg==", stamp), None)
+
+        self.cache.set("MQ==", DummyUser("1@example.com"), stamp)
+        self.cache.set("Mg==", DummyUser("2@example.com"), stamp)
+        self.assertEqual(self.cache.get("Zm9vOmJhcg==", stamp), None)
+        self.assertEqual(len(self.cache.entries), 2)
+
+    def test_invalidate(self):
+        user = DummyUser("foo@example.com")
+        stamp = self.cache.stamp()
+        self.cache.set("Zm9vOmJhcg==", user, stamp)
+        self.cache.invalidate("foo@example.com")
+        self.assertEqual(self.cache.get("Zm9vOmJhcg==", stamp), None)
+
+        self.cache.set("Zm9vOmJhcg==", user, stamp)
+        open(self.cache.stamp_file, "w").close()
+        self.assertEqual(self.cache.get("Zm9vOmJhcg==", self.cache.stamp()), None)
+
+        self.cache.ttl = -1
+        stamp = self.cache.stamp()
+        self.cache.set("Zm9vOmJhcg==", user, stamp)
+        self.assertEqual(self.cache.get("Zm9vOmJhcg==", stamp), None)
+
+class SuiteAuthCache(unittest.TestSuite):
+    def __init__(self):
+        tests = ['test_get',
+                 'test_invalidate',
+                 ]
+        unittest.TestSuite.__init__(self,list(map(TestAuthCache, tests)))
+
+def all_suite_auth_cache():
+    return unittest.TestSuite([SuiteAuthCache()])
+
+def main():
+    unittest.TextTestRunner(verbosity=2).run(all_suite_auth_cache())
+
+if __name__ == '__main__':
+    main()
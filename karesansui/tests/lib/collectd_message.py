@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from karesansui.lib.collectd.message import *
+
+FILTER_MESSAGE = "{'host':'host.example.com','plugin':'memory','plugin_instance':'','type':'memory','type_instance':'cached','ds_value':'4.7e+07','msg':'shikiichi wo koemashita!!'}"
+
+THRESHOLD_MESSAGE = "Host host.example.com, plugin df (instance root) type df: Data source \"used\" is currently 12.500000. That is above the warning threshold of 10.000000%. (msg {'ds':'used','watch':'df root'})"
+
+class TestCollectdMessage(unittest.TestCase):
+
+    def test_filter_message(self):
+        ret = decode_message(FILTER_MESSAGE)
+        self.assertEqual(ret["ds_value"], 47000000.0)
+        self.assertEqual(ret["msg"], "shikiichi wo koemashita!!")
+        self.assertEqual(ret["ds_name"], None)
+
+    def test_threshold_message(self):
+        ret = decode_message(THRESHOLD_MESSAGE)
+        self.assertEqual(ret["ds_name"], "used")
+        self.assertEqual(ret["ds_value"], 12.5)
+        self.assertEqual(ret["ts_value"], "10.000000")
+        self.assertEqual(ret["percentage"], True)
+        self.assertEqual(ret["params"], {"ds":"used", "watch":"df root"})
+
+    def test_literal_dict(self):
+        self.assertEqual(literal_dict("{'a':'1', 'b':'x y'}"), {"a":"1", "b":"x y"})
+        self.assertEqual(literal_dict("{'a':'1','d':{'c':2}}"), {"a":"1", "d":{"c":2}})
+        self.assertEqual(literal_dict("{'a':__import__('os').getpid()}"), None)
+        self.assertEqual(literal_dict("['a']"), None)
+
+    def test_broken_message(self):
+        ret = decode_message("{'ds_value':")
+        self.assertEqual(ret["ds_value"], None)
+        ret = decode_message("Oops, the memory cached is currently 1!")
+        self.assertEqual(ret["msg"], "Oops, the memory cached is currently 1!")
+        self.assertEqual(ret["ds_value"], None)
+
+class SuiteCollectdMessage(unittest.TestSuite):
+    def __init__(self):
+        tests = ['test_filter_message',
+                 'test_threshold_message',
+                 'test_literal_dict',
+                 'test_broken_message',
+                 ]
+        unittest.TestSuite.__init__(self,list(map(TestCollectdMessage, tests)))
+
+def all_suite_collectd_message():
+    return unittest.TestSuite([SuiteCollectdMessage()])
+
+def main():
+    unittest.TextTestRunner(verbosity=2).run(all_suite_collectd_message())
+
+if __name__ == '__main__':
+    main()
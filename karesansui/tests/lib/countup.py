@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from karesansui.lib.collectd.countup import CountUpStore
+
+class TestCountUpStore(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "countup.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def store(self):
+        return CountUpStore(self.path, checkpoint_interval=3600, journal_max=100)
+
+    def test_load_after_flush(self):
+        store = self.store()
+        store.put("a", [1, 1, 0, 10.0, 10.0, 10.0, 0])
+        store.put("b", [2, 2, 1, 20.0, 20.0, 20.0, 0])
+        store.flush()
+        store.put("a", [3, 3, 2, 10.0, 10.0, 30.0, 1])
+        store.delete("b")
+        store.put("c", [1, 1, 0, 40.0, 40.0, 40.0, 0])
+        store.flush()
+        store.put("d", [1, 1, 0, 50.0, 50.0, 50.0, 0])
+        self.assertFalse(os.path.exists(self.path))
+
+        loaded = self.store()
+        self.assertEqual(loaded.get("a"), [3, 3, 2, 10.0, 10.0, 30.0, 1])
+        self.assertEqual(loaded.get("b"), None)
+        self.assertEqual(loaded.get("c"), [1, 1, 0, 40.0, 40.0, 40.0, 0])
+        # not flushed
+        self.assertEqual(loaded.get("d"), None)
+
+    def test_truncated_last_line(self):
+        store = self.store()
+        store.put("a", [1, 1, 0, 10.0, 10.0, 10.0, 0])
+        store.flush()
+        store.put("a", [2, 2, 1, 10.0, 10.0, 20.0, 0])
+        store.flush()
+        size = os.path.getsize(store.journal_path)
+        fd = os.open(store.journal_path, os.O_WRONLY)
+        try:
+            os.ftruncate(fd, size - 5)
+        finally:
+            os.close(fd)
+
+        loaded = self.store()
+        self.assertEqual(loaded.get("a"), [1, 1, 0, 10.0, 10.0, 10.0, 0])
+        self.assertEqual(loaded.journal_lines, 1)
+
+    def test_checkpoint_then_replay(self):
+        store = self.store()
+        store.put("a", [1, 1, 0, 10.0, 10.0, 10.0, 0])
+        store.put("b", [2, 2, 1, 20.0, 20.0, 20.0, 0])
+        store.flush()
+        store.checkpoint()
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(os.path.getsize(store.journal_path), 0)
+        self.assertEqual([x for x in os.listdir(self.dir) if x.startswith("countup.db.")],
+                         ["countup.db.journal"])
+
+        store.put("a", [5, 5, 4, 10.0, 10.0, 60.0, 2])
+        store.delete("b")
+        store.flush()
+
+        loaded = self.store()
+        self.assertEqual(loaded.get("a"), [5, 5, 4, 10.0, 10.0, 60.0, 2])
+        self.assertEqual(loaded.get("b"), None)
+        self.assertEqual(sorted(loaded.keys()), ["a"])
+
+class SuiteCountUpStore(unittest.TestSuite):
+    def __init__(self):
+        tests = ['test_load_after_flush',
+                 'test_truncated_last_line',
+                 'test_checkpoint_then_replay',
+                 ]
+        unittest.TestSuite.__init__(self,list(map(TestCountUpStore, tests)))
+
+def all_suite_countup():
+    return unittest.TestSuite([SuiteCountUpStore()])
+
+def main():
+    unittest.TextTestRunner(verbosity=2).run(all_suite_countup())
+
+if __name__ == '__main__':
+    main()
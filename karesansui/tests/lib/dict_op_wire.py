@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from karesansui.lib.dict_op_wire import *
+
+CONF_ARR = {
+    "/etc/resolv.conf": {
+        "value": {
+            "nameserver": {
+                "value"  : ["192.168.0.1", [["# primary"], None]],
+                "action" : "set",
+                "comment": False,
+            },
+            "search": {
+                "value"  : {},
+                "action" : "delete",
+                "comment": False,
+            },
+            "@ORDERS": {
+                "value"  : [["search"], ["nameserver"]],
+            },
+        },
+        "action": "set",
+    },
+    "@BASE_PARSER": {
+        "value": "commentDealParser",
+    },
+}
+
+class TestDictOpWire(unittest.TestCase):
+
+    def test_round_trip(self):
+        ret = loads(dumps("resolv", CONF_ARR))
+        self.assertEqual(ret, {"resolv": CONF_ARR})
+        self.assertEqual(list(ret["resolv"]["/etc/resolv.conf"]["value"].keys()),
+                         ["nameserver", "search", "@ORDERS"])
+
+    def test_multiple_modules(self):
+        ret = loads(dumps("resolv", CONF_ARR) + dumps("hosts", {}))
+        self.assertEqual(ret, {"resolv": CONF_ARR, "hosts": {}})
+
+    def test_streaming_decode(self):
+        decoder = DictOpWireDecoder()
+        for line in iterencode("resolv", CONF_ARR):
+            decoder.feed(line.encode("utf-8"))
+        self.assertEqual(decoder.result, {"resolv": CONF_ARR})
+
+    def test_is_wire_format(self):
+        self.assertEqual(is_wire_format(dumps("resolv", CONF_ARR)), True)
+        self.assertEqual(is_wire_format(str(CONF_ARR)), False)
+
+    def test_unsupported_version(self):
+        data = '{"format":"%s","version":%d,"module":"resolv"}\n' % (WIRE_FORMAT, WIRE_VERSION + 1)
+        self.assertRaises(ValueError, loads, data)
+
+class SuiteDictOpWire(unittest.TestSuite):
+    def __init__(self):
+        tests = ['test_round_trip',
+                 'test_multiple_modules',
+                 'test_streaming_decode',
+                 'test_is_wire_format',
+                 'test_unsupported_version',
+                 ]
+        unittest.TestSuite.__init__(self,list(map(TestDictOpWire, tests)))
+
+def all_suite_dict_op_wire():
+    return unittest.TestSuite([SuiteDictOpWire()])
+
+def main():
+    unittest.TextTestRunner(verbosity=2).run(all_suite_dict_op_wire())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import gzip
+import json
+import shutil
+import datetime
+import tempfile
+import unittest
+
+import sqlalchemy
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+import pysilhouette.db.model
+import karesansui.db.access._2pysilhouette
+from karesansui.db.model import reload_mappers
+from karesansui.db.model.machine2jobgroup import Machine2Jobgroup
+from karesansui.db.model.jobgroupsummary import JobgroupSummary
+from karesansui.db.model._2pysilhouette import Job, JobGroup, JOBGROUP_STATUS
+from karesansui.db.access.jobhistory import archive_jobs
+
+class TestArchiveJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        karesansui.db.access._2pysilhouette._jobgroup_summary_missing.clear()
+
+        metadata = sqlalchemy.MetaData(bind=sqlalchemy.create_engine("sqlite:///:memory:"))
+        reload_mappers(metadata)
+        metadata.create_all()
+        self.k_session = sessionmaker(bind=metadata.bind)()
+
+        metadata = sqlalchemy.MetaData(bind=sqlalchemy.create_engine("sqlite:///:memory:"))
+        pysilhouette.db.model.reload_mappers(metadata)
+        metadata.create_all()
+        self.p_session = sessionmaker(bind=metadata.bind)()
+
+        old = datetime.datetime.now() - datetime.timedelta(days=40)
+        new = datetime.datetime.now() - datetime.timedelta(days=1)
+        # (status, created): 1, 2 are archived, 3 is running, 4 is too new
+        jobgroups = ((JOBGROUP_STATUS['OK'], old),
+                     (JOBGROUP_STATUS['NG'], old),
+                     (JOBGROUP_STATUS['RUN'], old),
+                     (JOBGROUP_STATUS['OK'], new),
+                     )
+        for (status, created) in jobgroups:
+            jobgroup = JobGroup("jobgroup", "uniq_key")
+            jobgroup.status = status
+            jobgroup.jobs.append(Job("job 1", 1, "/bin/true"))
+            jobgroup.jobs.append(Job("job 2", 2, "/bin/true"))
+            self.p_session.add(jobgroup)
+            self.p_session.flush()
+            self.add_m2j(jobgroup.id, created)
+        self.p_session.commit()
+        # a second machine2jobgroup of jobgroup 1, and one whose jobgroup is gone
+        self.add_m2j(1, old)
+        self.add_m2j(99, old)
+        self.k_session.commit()
+
+    def tearDown(self):
+        self.k_session.close()
+        self.p_session.close()
+        clear_mappers()
+        shutil.rmtree(self.dir)
+
+    def add_m2j(self, jobgroup_id, created):
+        m2j = Machine2Jobgroup(None, jobgroup_id, "uniq_key", None, None)
+        m2j.created = created
+        self.k_session.add(m2j)
+
+    def read(self, filename):
+        fp = gzip.open(filename, "rt")
+        try:
+            return [json.loads(line) for line in fp]
+        finally:
+            fp.close()
+
+    def remaining(self):
+        return (sorted(set([x.jobgroup_id for x in self.k_session.query(Machine2Jobgroup)])),
+                sorted([x.id for x in self.p_session.query(JobGroup)]),
+                sorted(set([x.jobgroup_id for x in self.p_session.query(Job)])),
+                sorted([x.jobgroup_id for x in self.k_session.query(JobgroupSummary)]),
+                )
+
+    def test_archive(self):
+        (count, filename) = archive_jobs(self.k_session, self.p_session, 30,
+                                         self.dir, batch_size=2, interval=0)
+        self.assertEqual(count, 3)
+        records = self.read(filename)
+        self.assertEqual([x["jobgroup_id"] for x in records], [1, 2, 99])
+        self.assertEqual(records[0]["jobgroup"]["status"], JOBGROUP_STATUS['OK'])
+        self.assertEqual([x["name"] for x in records[0]["jobs"]], ["job 1", "job 2"])
+        self.assertEqual(len(records[0]["machine2jobgroup"]), 2)
+        self.assertEqual(records[1]["jobgroup"]["status"], JOBGROUP_STATUS['NG'])
+        self.assertEqual(records[2]["jobgroup"], None)
+        self.assertEqual(records[2]["jobs"], [])
+        self.assertEqual(len(records[2]["machine2jobgroup"]), 1)
+
+        self.assertEqual(self.remaining(), ([3, 4], [3, 4], [3, 4], [3, 4]))
+
+        # nothing left to archive
+        self.assertEqual(archive_jobs(self.k_session, self.p_session, 30,
+                                      self.dir, interval=0), (0, None))
+
+    def test_rerun_after_interruption(self):
+        # stop between the pysilhouette and the karesansui commit
+        p_commit = self.p_session.commit
+        k_commit = self.k_session.commit
+        committed = []
+        def pysilhouette_commit():
+            p_commit()
+            committed.append(True)
+        def karesansui_commit():
+            if committed:
+                raise Exception("interrupted")
+            k_commit()
+        self.p_session.commit = pysilhouette_commit
+        self.k_session.commit = karesansui_commit
+        self.assertRaises(Exception, archive_jobs, self.k_session, self.p_session, 30,
+                          os.path.join(self.dir, "1"), batch_size=2, interval=0)
+        self.k_session.rollback()
+        del self.p_session.commit
+        del self.k_session.commit
+        self.assertEqual(self.remaining(), ([1, 2, 3, 4, 99], [3, 4], [3, 4], [1, 2, 3, 4]))
+
+        (count, filename) = archive_jobs(self.k_session, self.p_session, 30,
+                                         os.path.join(self.dir, "2"), batch_size=2, interval=0)
+        self.assertEqual(count, 3)
+        records = self.read(filename)
+        self.assertEqual([x["jobgroup_id"] for x in records], [1, 2, 99])
+        self.assertEqual(len(records[0]["machine2jobgroup"]), 2)
+        self.assertEqual(self.remaining(), ([3, 4], [3, 4], [3, 4], [3, 4]))
+
+class SuiteArchiveJobs(unittest.TestSuite):
+    def __init__(self):
+        tests = ['test_archive',
+                 'test_rerun_after_interruption',
+                 ]
+        unittest.TestSuite.__init__(self,list(map(TestArchiveJobs, tests)))
+
+def all_suite_jobhistory():
+    return unittest.TestSuite([SuiteArchiveJobs()])
+
+def main():
+    unittest.TextTestRunner(verbosity=2).run(all_suite_jobhistory())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import sqlalchemy
+from sqlalchemy.orm import sessionmaker
+
+from karesansui.lib.pager import Pager, count_query
+
+class TestPager(unittest.TestCase):
+
+    def setUp(self):
+        engine = sqlalchemy.create_engine("sqlite:///:memory:")
+        metadata = sqlalchemy.MetaData()
+        self.table = sqlalchemy.Table('item', metadata,
+                                      sqlalchemy.Column('id', sqlalchemy.Integer,
+                                                        primary_key=True))
+        metadata.create_all(engine)
+        self.session = sessionmaker(bind=engine)()
+        self.session.execute(self.table.insert(), [{"id": i} for i in range(1, 26)])
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+
+    def query(self):
+        return self.session.query(self.table).order_by(self.table.c.id.asc())
+
+    def test_list(self):
+        pager = Pager(list(range(25)), 2, 10)
+        self.assertEqual(pager.page, 3)
+        self.assertEqual(pager.get_displays(), [20, 21, 22, 23, 24])
+        self.assertEqual(pager.get_page_list(), [0, 1, 2])
+        self.assertEqual((pager.get_start(), pager.get_end()), (21, 25))
+        self.assertFalse(pager.exist_next_page())
+
+    def test_query(self):
+        pager = Pager(self.query(), 1, 10)
+        self.assertEqual(pager.get_total(), 25)
+        self.assertEqual(pager.page, 3)
+        self.assertEqual([row.id for row in pager.get_displays()], list(range(11, 21)))
+        self.assertTrue(pager.exist_next_page())
+
+        pager = Pager(self.query(), 3, 10)
+        self.assertFalse(pager.exist_now_page())
+        self.assertEqual(pager.get_displays(), [])
+
+    def test_count_cache(self):
+        self.assertEqual(count_query(self.query(), 60), 25)
+        self.session.execute(self.table.insert(), [{"id": 26}])
+        self.assertEqual(count_query(self.query(), 60), 25)
+        self.assertEqual(count_query(self.query()), 26)
+        self.assertEqual(count_query(self.query().filter(self.table.c.id > 20), 60), 6)
+
+class SuitePager(unittest.TestSuite):
+    def __init__(self):
+        tests = ['test_list',
+                 'test_query',
+                 'test_count_cache',
+                 ]
+        unittest.TestSuite.__init__(self,list(map(TestPager, tests)))
+
+def all_suite_pager():
+    return unittest.TestSuite([SuitePager()])
+
+def main():
+    unittest.TextTestRunner(verbosity=2).run(all_suite_pager())
+
+if __name__ == '__main__':
+    main()
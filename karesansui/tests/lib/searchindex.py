@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import sqlalchemy
+from sqlalchemy.orm import sessionmaker, mapper, clear_mappers
+
+from karesansui.db.searchindex import SqliteSearchIndex
+
+class Item(object):
+    pass
+
+class TestSqliteSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = sqlalchemy.create_engine("sqlite:///:memory:")
+        metadata = sqlalchemy.MetaData()
+        table = sqlalchemy.Table('item', metadata,
+                                 sqlalchemy.Column('id', sqlalchemy.Integer,
+                                                   primary_key=True))
+        metadata.create_all(self.engine)
+        mapper(Item, table)
+        self.session = sessionmaker(bind=self.engine)()
+        self.session.execute(table.insert(), [{"id": i} for i in range(1, 4)])
+
+        self.index = SqliteSearchIndex()
+        connection = self.session.connection()
+        self.assertFalse(self.index.exists(connection))
+        self.index.create(connection)
+        self.assertTrue(self.index.exists(connection))
+        self.index.put(connection, "machine",
+                       [(1, "alpha\nwebfarm"),
+                        (2, "beta\nwebfarm webfarm"),
+                        (3, "gamma")])
+        self.index.put(connection, "tag", [(3, "webfarm")])
+
+    def tearDown(self):
+        self.session.close()
+        clear_mappers()
+
+    def search(self, terms):
+        query = self.index.search(self.session.query(Item), Item, "machine", terms)
+        if query is None:
+            return None
+        return [item.id for item in query]
+
+    def test_search(self):
+        self.assertEqual(self.search(["webfarm"]), [2, 1])
+        self.assertEqual(self.search(["WEBFARM", "alp"]), [1])
+        self.assertEqual(self.search(['web"farm']), [])
+        self.assertEqual(self.search(["ab"]), None)
+
+    def test_put_remove(self):
+        connection = self.session.connection()
+        self.index.put(connection, "machine", [(3, "gamma webfarm")])
+        self.assertEqual(sorted(self.search(["webfarm"])), [1, 2, 3])
+        self.index.remove(connection, "machine", [1, 2])
+        self.assertEqual(self.search(["webfarm"]), [3])
+
+class SuiteSqliteSearchIndex(unittest.TestSuite):
+    def __init__(self):
+        tests = ['test_search',
+                 'test_put_remove',
+                 ]
+        unittest.TestSuite.__init__(self,list(map(TestSqliteSearchIndex, tests)))
+
+def all_suite_searchindex():
+    return unittest.TestSuite([SuiteSqliteSearchIndex()])
+
+def main():
+    unittest.TextTestRunner(verbosity=2).run(all_suite_searchindex())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import karesansui
+from karesansui.lib import static
+
+CSS = b"body { margin: 0; padding: 0; }\n" * 64
+
+class TestStatic(unittest.TestCase):
+
+    def setUp(self):
+        self.dirname = karesansui.dirname
+        self.tmp_dir = tempfile.mkdtemp()
+        karesansui.dirname = self.tmp_dir
+        os.makedirs("%s/static/css" % self.tmp_dir)
+        fp = open("%s/static/css/style.css" % self.tmp_dir, "wb")
+        try:
+            fp.write(CSS)
+        finally:
+            fp.close()
+
+    def tearDown(self):
+        karesansui.dirname = self.dirname
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get_static_file(self):
+        ret = static.get_static_file("css/style.css")
+        self.assertEqual(ret.content_type, "text/css; charset=utf-8")
+        self.assertEqual(len(ret.fingerprint), 12)
+        self.assertEqual(static.static_url("/k", "css/style.css"),
+                         "/k/static/css/style.css?v=%s" % ret.fingerprint)
+        self.assertEqual(static.get_static_file("../static/css/style.css").filename, ret.filename)
+        self.assertEqual(static.get_static_file("../../etc/passwd"), None)
+        self.assertEqual(static.get_static_file("css/none.css"), None)
+        self.assertEqual(static.get_static_file("css"), None)
+
+    def test_variant(self):
+        self.assertEqual(static.compress_static(), 1)
+        self.assertEqual(static.compress_static(), 0)
+        ret = static.get_static_file("css/style.css")
+        self.assertEqual(ret.variant("gzip, deflate"), (ret.filename + ".gz", "gzip"))
+        self.assertEqual(ret.variant("deflate, gzip;q=0"), (ret.filename, None))
+        self.assertEqual(ret.variant(None), (ret.filename, None))
+        self.assertEqual(ret.etag("gzip"), '"%s-gzip"' % ret.fingerprint)
+
+class SuiteStatic(unittest.TestSuite):
+    def __init__(self):
+        tests = ['test_get_static_file',
+                 'test_variant',
+                 ]
+        unittest.TestSuite.__init__(self,list(map(TestStatic, tests)))
+
+def all_suite_static():
+    return unittest.TestSuite([SuiteStatic()])
+
+def main():
+    unittest.TextTestRunner(verbosity=2).run(all_suite_static())
+
+if __name__ == '__main__':
+    main()
@@ -75,6 +75,33 @@ class TestUtils(unittest.TestCase):
         ret,res = execute_command(["invalid_command","-l"])
         self.assertNotEqual(ret,0)
 
+    def test_get_xml_xpath(self):
+        xml = "<domain type='kvm'><devices><disk device='cdrom'/><disk/></devices></domain>"
+        tree = get_xml_tree(xml)
+        self.assertEqual(get_xml_xpath(tree,'/domain/@type'),"kvm")
+        self.assertEqual(get_nums_xml_xpath(tree,'/domain/devices/disk'),2)
+        disks = get_all_xml_xpath(tree,'/domain/devices/disk')
+        self.assertEqual(get_xml_xpath(disks[0],'@device'),"cdrom")
+        self.assertEqual(get_xml_xpath(disks[1],'@device'),None)
+        self.assertEqual(get_xml_xpath(get_xml_parse(xml),'/domain/@type'),"kvm")
+
+    def test_reverse_file(self):
+        import gzip
+        import tempfile
+        data = b"".join([b"line %d\n" % i for i in range(1000)]) + b"last"
+        expected = ["last"] + ["line %d\n" % i for i in range(999, -1, -1)]
+
+        plain = tempfile.NamedTemporaryFile(suffix=".log")
+        plain.write(data)
+        plain.flush()
+        self.assertEqual(list(ReverseFile(open(plain.name, "rb"), blocksize=64)), expected)
+
+        compressed = tempfile.NamedTemporaryFile(suffix=".gz")
+        compressed.write(gzip.compress(data[:3000]) + gzip.compress(data[3000:]))
+        compressed.flush()
+        fp = gzip.open(compressed.name, "rb")
+        self.assertEqual(list(ReverseFile(fp, blocksize=64, segment_size=256)), expected)
+
 class SuiteUtils(unittest.TestSuite):
     def __init__(self):
         tests = ['test_dummy',
@@ -92,6 +119,8 @@ class SuiteUtils(unittest.TestSuite):
                  'test_generate_mac_address',
                  'test_execute_command_success',
                  'test_execute_command_failure',
+                 'test_get_xml_xpath',
+                 'test_reverse_file',
                  ]
         unittest.TestSuite.__init__(self,list(map(TestUtils, tests)))
 
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+import unittest
+
+import karesansui.lib.virt.virt
+from karesansui.lib.virt.virt import KaresansuiVirtConnection
+from karesansui.lib.virt.pool import KaresansuiVirtConnectionPool
+
+URI = "qemu:///system"
+
+class FakeConnection:
+
+    def __init__(self):
+        self.closed = 0
+
+    def isAlive(self):
+        return int(self.closed == 0)
+
+    def close(self):
+        self.closed += 1
+
+    __del__ = close
+
+class TestVirtConnectionClose(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = KaresansuiVirtConnectionPool()
+        self.get_pool = karesansui.lib.virt.virt.get_pool
+        karesansui.lib.virt.virt.get_pool = lambda: self.pool
+
+    def tearDown(self):
+        karesansui.lib.virt.virt.get_pool = self.get_pool
+
+    def checkout(self):
+        kvc = KaresansuiVirtConnection.__new__(KaresansuiVirtConnection)
+        kvc.logger = logging.getLogger('karesansui.virt')
+        kvc.uri = URI
+        kvc._pooled = self.pool.checkout((URI, None), FakeConnection)
+        kvc._conn = kvc._pooled.conn
+        return kvc
+
+    def test_close_twice(self):
+        kvc = self.checkout()
+        conn = kvc._conn
+        kvc.close()
+        kvc.close()
+        self.assertEqual(conn.closed, 0)
+
+        other = self.checkout()
+        self.assertTrue(other._conn is conn)
+        self.assertTrue(other._pooled.is_alive())
+        kvc.close()
+        self.assertEqual(conn.closed, 0)
+        other.close()
+        self.assertEqual(conn.closed, 0)
+
+class SuiteVirtConnectionClose(unittest.TestSuite):
+    def __init__(self):
+        tests = ['test_close_twice',
+                 ]
+        unittest.TestSuite.__init__(self,list(map(TestVirtConnectionClose, tests)))
+
+def all_suite_virt_pool():
+    return unittest.TestSuite([SuiteVirtConnectionClose()])
+
+def main():
+    unittest.TextTestRunner(verbosity=2).run(all_suite_virt_pool())
+
+if __name__ == '__main__':
+    main()
@@ -12,11 +12,31 @@ import unittest
 from karesansui.tests.lib.file.testk2v import all_suite_k2v
 from karesansui.tests.lib.networkaddress import all_suite_networkaddress
 from karesansui.tests.lib.utils import all_suite_utils
+from karesansui.tests.lib.dict_op_wire import all_suite_dict_op_wire
+from karesansui.tests.lib.collectd_message import all_suite_collectd_message
+from karesansui.tests.lib.static import all_suite_static
+from karesansui.tests.lib.auth_cache import all_suite_auth_cache
+from karesansui.tests.lib.pager import all_suite_pager
+from karesansui.tests.lib.searchindex import all_suite_searchindex
+from karesansui.tests.lib.virt_pool import all_suite_virt_pool
+from karesansui.tests.lib.countup import all_suite_countup
+from karesansui.tests.lib.action_dispatcher import all_suite_action_dispatcher
+from karesansui.tests.lib.jobhistory import all_suite_jobhistory
 from karesansui.tests.restapi import all_suite_restapi
 
 ts = unittest.TestSuite()
 ts.addTest(all_suite_k2v())
 ts.addTest(all_suite_networkaddress())
 ts.addTest(all_suite_utils())
+ts.addTest(all_suite_dict_op_wire())
+ts.addTest(all_suite_collectd_message())
+ts.addTest(all_suite_static())
+ts.addTest(all_suite_auth_cache())
+ts.addTest(all_suite_pager())
+ts.addTest(all_suite_searchindex())
+ts.addTest(all_suite_virt_pool())
+ts.addTest(all_suite_countup())
+ts.addTest(all_suite_action_dispatcher())
+ts.addTest(all_suite_jobhistory())
 ts.addTest(all_suite_restapi())
 unittest.TextTestRunner(verbosity=2).run(ts)  
@@ -70,6 +70,8 @@ import karesansui.gadget.hostby1staticrouteby1
 import karesansui.gadget.hostby1report
 import karesansui.gadget.hostby1reportby1
 import karesansui.gadget.hostby1reportby1by1
+import karesansui.gadget.hostby1reportby1by1series
+import karesansui.gadget.hostby1reportgraphs
 import karesansui.gadget.hostby1watch
 import karesansui.gadget.hostby1watchby1
 import karesansui.gadget.hostby1watchtemplate
@@ -87,6 +89,7 @@ import karesansui.gadget.guestexportby1
 import karesansui.gadget.guestimport
 import karesansui.gadget.guestby1
 import karesansui.gadget.guestby1status
+import karesansui.gadget.hostby1gueststatus
 import karesansui.gadget.guestby1device
 import karesansui.gadget.guestby1diskby1
 import karesansui.gadget.guestby1nicby1
@@ -148,6 +151,8 @@ urls = karesansui.gadget.index.urls \
        + karesansui.gadget.hostby1report.urls \
        + karesansui.gadget.hostby1reportby1.urls \
        + karesansui.gadget.hostby1reportby1by1.urls \
+       + karesansui.gadget.hostby1reportby1by1series.urls \
+       + karesansui.gadget.hostby1reportgraphs.urls \
        + karesansui.gadget.hostby1watch.urls \
        + karesansui.gadget.hostby1watchby1.urls \
        + karesansui.gadget.hostby1watchtemplate.urls \
@@ -165,6 +170,7 @@ urls = karesansui.gadget.index.urls \
        + karesansui.gadget.guestimport.urls \
        + karesansui.gadget.guestby1.urls \
        + karesansui.gadget.guestby1status.urls \
+       + karesansui.gadget.hostby1gueststatus.urls \
        + karesansui.gadget.guestby1device.urls \
        + karesansui.gadget.guestby1diskby1.urls \
        + karesansui.gadget.guestby1nicby1.urls \
@@ -138,6 +138,9 @@ popd
 
 %{__rm} -f $RPM_BUILD_ROOT%{python_sitelib}/karesansui*egg-info
 
+# precompressed static files
+PYTHONPATH=$RPM_BUILD_ROOT%{python_sitelib} %{__python} tools/compress_static.py $RPM_BUILD_ROOT%{python_sitelib}/karesansui/static
+
 %clean
 rm -rf $RPM_BUILD_ROOT
 
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+
+"""
+Compare the transfer formats of DictOp trees between bin/read_conf.py,
+bin/write_conf.py and the web process.
+
+ literal : "Config_Dict_<module> = {...}" evaluated with exec (the format
+           before karesansui.lib.dict_op_wire).
+ wire    : karesansui.lib.dict_op_wire JSON lines.
+
+The collectd and iptables configurations of this host are used when they
+exist, otherwise configurations of a similar shape are generated.
+
+usage: python tools/bench_dict_op_wire.py [-c COLLECTD_CONF] [-i IPTABLES_CONF] [-n LOOPS]
+"""
+
+import os
+import sys
+import time
+import tempfile
+from optparse import OptionParser
+
+import karesansui.lib.parser.collectd as collectd_parser
+from karesansui.lib.parser.base.line_parser import lineParser
+from karesansui.lib import dict_op_wire
+
+COLLECTD_PLUGINS = ["cpu", "df", "disk", "interface", "load", "memory", "swap", "uptime", "users", "libvirt"]
+
+def generate_collectd_conf(path, plugins=40):
+    lines = ["# Config file for collectd(1).", "", "Hostname    \"localhost\"",
+             "FQDNLookup   true", "BaseDir     \"/var/lib/collectd\"",
+             "Interval     3", ""]
+    for i in range(plugins):
+        name = COLLECTD_PLUGINS[i % len(COLLECTD_PLUGINS)]
+        lines.append("# plugin %d" % i)
+        lines.append("LoadPlugin %s%d" % (name, i))
+    for i in range(plugins):
+        name = COLLECTD_PLUGINS[i % len(COLLECTD_PLUGINS)]
+        lines.append("<Plugin \"%s%d\">" % (name, i))
+        lines.append("\t# watch %s" % name)
+        lines.append("\tIgnoreSelected false")
+        lines.append("\t<Threshold \"%s%d\">" % (name, i))
+        lines.append("\t\tWarningMax %d" % (i * 10))
+        lines.append("\t\tFailureMax %d" % (i * 20))
+        lines.append("\t</Threshold>")
+        lines.append("</Plugin>")
+    open(path, "w").write("\n".join(lines) + "\n")
+
+def generate_iptables_conf(path, rules=2000):
+    lines = ["# Generated by iptables-save", "*filter",
+             ":INPUT ACCEPT [0:0]", ":FORWARD ACCEPT [0:0]", ":OUTPUT ACCEPT [0:0]"]
+    for i in range(rules):
+        lines.append("-A INPUT -s 10.%d.%d.0/24 -p tcp -m tcp --dport %d -j ACCEPT" \
+                     % (i // 256 % 256, i % 256, 1024 + i))
+    lines.append("COMMIT")
+    lines.append("# Completed")
+    open(path, "w").write("\n".join(lines) + "\n")
+
+def read_collectd(path):
+    collectd_parser.PARSER_COLLECTD_CONF = path
+    return collectd_parser.collectdParser().read_conf()
+
+def read_iptables(path):
+    parser = lineParser()
+    parser.set_source_file([path])
+    lines = parser.read_conf()[path]['value']
+    return {"config": {"value": lines, "action": "set", "comment": False},
+            "lint"  : {"value": [], "action": "set", "comment": False}}
+
+def literal_dumps(module, conf_arr):
+    return "Config_Dict_%s = %s\n" % (module, str(conf_arr))
+
+def literal_loads(module, data):
+    _locals = {}
+    exec(data, {}, _locals)
+    return _locals["Config_Dict_%s" % module]
+
+def measure(loops, func, *args):
+    start = time.time()
+    for i in range(loops):
+        ret = func(*args)
+    return (ret, (time.time() - start) * 1000 / loops)
+
+def main():
+    optp = OptionParser()
+    optp.add_option('-c', '--collectd', dest='collectd', default="/etc/collectd.conf")
+    optp.add_option('-i', '--iptables', dest='iptables', default="/etc/sysconfig/iptables")
+    optp.add_option('-n', '--loops',    dest='loops', type="int", default=20)
+    (opts, args) = optp.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    if not os.path.exists(opts.collectd):
+        opts.collectd = os.path.join(tmpdir, "collectd.conf")
+        generate_collectd_conf(opts.collectd)
+    if not os.path.exists(opts.iptables):
+        opts.iptables = os.path.join(tmpdir, "iptables")
+        generate_iptables_conf(opts.iptables)
+
+    targets = (("collectd", read_collectd(opts.collectd), opts.collectd),
+               ("iptables", read_iptables(opts.iptables), opts.iptables))
+
+    print("%-8s %-7s %10s %12s %12s" % ("module", "format", "bytes", "encode msec", "decode msec"))
+    for (module, conf_arr, path) in targets:
+        (data, enc) = measure(opts.loops, literal_dumps, module, conf_arr)
+        (ret, dec)  = measure(opts.loops, literal_loads, module, data)
+        assert ret == conf_arr
+        print("%-8s %-7s %10d %12.3f %12.3f" % (module, "literal", len(data.encode("utf-8")), enc, dec))
+
+        (data, enc) = measure(opts.loops, dict_op_wire.dumps, module, conf_arr)
+        (ret, dec)  = measure(opts.loops, dict_op_wire.loads, data)
+        assert ret[module] == conf_arr
+        print("%-8s %-7s %10d %12.3f %12.3f" % (module, "wire", len(data.encode("utf-8")), enc, dec))
+
+    for path in os.listdir(tmpdir):
+        os.unlink(os.path.join(tmpdir, path))
+    os.rmdir(tmpdir)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+
+"""
+Measure the cost of ConfigParam.load_xml_config() per domain.
+
+ legacy : xml.dom.minidom document, re-serialized and reparsed by lxml
+          for every XPath expression (the behavior before get_xml_tree()).
+ tree   : parsed once by lxml, precompiled XPath expressions.
+
+usage: python tools/bench_domain_xml.py [-n DOMAINS] [-d DISKS] [-i NICS]
+"""
+
+import sys
+import time
+from optparse import OptionParser
+
+import karesansui.lib.virt.config as virt_config
+from karesansui.lib.virt.config import ConfigParam
+from karesansui.lib.utils import get_xml_parse
+
+DOMAIN_XML = """<domain type='kvm'>
+  <name>%(name)s</name>
+  <uuid>6a0b9b2c-3a4f-4f6e-9f73-%(num)012d</uuid>
+  <memory>524288</memory>
+  <vcpu>2</vcpu>
+  <os><type>hvm</type><boot dev='hd'/></os>
+  <features><acpi/><apic/><pae/></features>
+  <on_poweroff>destroy</on_poweroff>
+  <on_reboot>restart</on_reboot>
+  <on_crash>restart</on_crash>
+  <devices>
+%(disks)s
+%(nics)s
+    <graphics type='vnc' port='%(port)d' autoport='no' listen='0.0.0.0' keymap='ja'/>
+  </devices>
+</domain>
+"""
+
+DISK_XML = """    <disk type='file' device='disk'>
+      <driver name='qemu' type='raw'/>
+      <source file='/var/lib/libvirt/domains/%(name)s/images/disk%(num)d.img'/>
+      <target dev='vd%(dev)s' bus='virtio'/>
+    </disk>"""
+
+NIC_XML = """    <interface type='bridge'>
+      <mac address='52:54:00:00:%(num)02x:%(nic)02x'/>
+      <source bridge='br%(nic)d'/>
+      <target dev='vnet%(nic)d'/>
+      <model type='virtio'/>
+    </interface>"""
+
+def domain_xml(num, disks, nics):
+    name = "guest%04d" % num
+    return DOMAIN_XML % {
+        "name"  : name,
+        "num"   : num,
+        "port"  : 5900 + num,
+        "disks" : "\n".join([DISK_XML % {"name":name, "num":i, "dev":chr(ord('a') + i)} for i in range(disks)]),
+        "nics"  : "\n".join([NIC_XML % {"num":num % 256, "nic":i} for i in range(nics)]),
+    }
+
+def run(xmls, parser):
+    virt_config.XMLTree = parser
+    start = time.time()
+    for num, xml in enumerate(xmls):
+        ConfigParam("guest%04d" % num).load_xml_config(xml)
+    return time.time() - start
+
+def main():
+    optp = OptionParser()
+    optp.add_option('-n', '--domains', dest='domains', type="int", default=250)
+    optp.add_option('-d', '--disks',   dest='disks',   type="int", default=4)
+    optp.add_option('-i', '--nics',    dest='nics',    type="int", default=2)
+    (opts, args) = optp.parse_args()
+
+    xmls = [domain_xml(i, opts.disks, opts.nics) for i in range(opts.domains)]
+
+    get_xml_tree = virt_config.XMLTree
+    try:
+        for label, parser in (("legacy", get_xml_parse), ("tree", get_xml_tree)):
+            elapsed = run(xmls, parser)
+            print("%-6s: %d domains %.3f sec (%.3f msec/domain)" \
+                  % (label, opts.domains, elapsed, elapsed * 1000 / opts.domains))
+    finally:
+        virt_config.XMLTree = get_xml_tree
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
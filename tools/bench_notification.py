@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+
+
+"""
+Measure the decoding of collectd notification messages by the
+notification plugin (karesansui/lib/collectd/notification.py).
+
+ legacy : the dict literal of filter messages and the "(msg {...})" part
+          of threshold messages evaluated with exec, regular expressions
+          compiled for every message (the behavior before
+          karesansui.lib.collectd.message).
+ decode : karesansui.lib.collectd.message.decode_message().
+
+Half of the synthetic notifications are filter messages, half are
+threshold messages.
+
+usage: python tools/bench_notification.py [-n NOTIFICATIONS]
+"""
+
+import re
+import sys
+import time
+from optparse import OptionParser
+
+from karesansui.lib.collectd.message import decode_message
+
+FILTER_MESSAGE = "{'host':'host%(num)d.example.com','plugin':'memory','plugin_instance':'','type':'memory','type_instance':'cached','ds_value':'%(value)e','msg':'threshold exceeded'}"
+
+THRESHOLD_MESSAGE = "Host host%(num)d.example.com, plugin df (instance root) type df: Data source \"used\" is currently %(value)f. That is above the warning threshold of 10.000000%%. (msg {'ds':'used','watch':'df%(num)d'})"
+
+def legacy_decode(message):
+    result = {"ds_name":None, "ds_value":None, "ts_value":None,
+              "percentage":False, "msg":None, "params":None}
+    scope = {}
+    if message[0:2] == "{'":
+        try:
+            exec("ds_value = %s['ds_value']" % message, scope)
+            exec("msg      = %s['msg']"      % message, scope)
+            exec("extras   = %s['dict']"     % message, scope)
+        except:
+            pass
+        for _k,_v in scope.get("extras", {}).items():
+            exec("extra_%s = %s" % (_k,_v,), scope)
+        result["ds_value"] = scope.get("ds_value")
+        result["msg"] = scope.get("msg")
+    else:
+        result["msg"] = message
+        regex  = r"^Host (?P<host>.+), plugin (?P<plugin>.+)( \(instance (?P<plugin_instance>.+)\))? type (?P<type>.+)( \(instance (?P<type_instance>.+)\))?: "
+        regex += r"Data source \"(?P<ds_name>.+)\" is currently (?P<ds_value>.+)\. "
+        regex += r"That is (below|above) the (failure|warning) threshold of (?P<ts_value>[\-0-9\.]+)(?P<percent_flag>%?)\."
+        m = re.match(regex,message)
+        if m:
+            result["ds_name"]  = m.group('ds_name')
+            result["ds_value"] = m.group('ds_value')
+            result["ts_value"] = m.group('ts_value')
+            result["percentage"] = (m.group('percent_flag') == "%")
+        m = re.search(r". \(msg (?P<msg_dict>{.+})", message)
+        if m:
+            exec("params = %s" % m.group('msg_dict'), scope)
+            result["params"] = scope["params"]
+            result["ds_name"] = scope["params"].get("ds", result["ds_name"])
+    try:
+        result["ds_value"] = float(result["ds_value"])
+    except:
+        result["ds_value"] = None
+    return result
+
+def run(messages, decode):
+    start = time.time()
+    for message in messages:
+        decode(message)
+    return time.time() - start
+
+def main():
+    optp = OptionParser()
+    optp.add_option('-n', '--notifications', dest='notifications', type="int", default=100000)
+    (opts, args) = optp.parse_args()
+
+    messages = []
+    for i in range(opts.notifications):
+        if i % 2 == 0:
+            messages.append(FILTER_MESSAGE % {"num":i % 300, "value":47000000.0 + i})
+        else:
+            messages.append(THRESHOLD_MESSAGE % {"num":i % 300, "value":10.0 + (i % 90)})
+
+    for message in messages[:2]:
+        if legacy_decode(message)["ds_value"] != decode_message(message)["ds_value"]:
+            print("decoded values differ: %s" % message)
+            return 1
+
+    for label, decode in (("legacy", legacy_decode), ("decode", decode_message)):
+        elapsed = run(messages, decode)
+        print("%-6s: %d notifications %.3f sec (%.1f usec/notification)" \
+              % (label, opts.notifications, elapsed, elapsed * 1000000 / opts.notifications))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+
+"""
+Measure the job list paging on a large machine2jobgroup table.
+
+ list   : the rows are loaded into a list and sliced by Pager
+          (the behavior before Pager accepted a Query).
+ query  : Pager counts and slices the Query in the database.
+ cached : as query, with the COUNT reused between requests.
+
+A temporary SQLite database is filled with JOBS rows on MACHINES machines.
+The first and the last page of the list are measured.
+
+usage: python tools/bench_pager.py [-j JOBS] [-m MACHINES] [-n REQUESTS]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import datetime
+from optparse import OptionParser
+
+import sqlalchemy
+from sqlalchemy.orm import sessionmaker
+
+from karesansui.lib.const import JOB_LIST_RANGE, PAGER_COUNT_CACHE_TTL, \
+     MACHINE_ATTRIBUTE, MACHINE_HYPERVISOR
+from karesansui.lib.pager import Pager
+from karesansui.db.model import reload_mappers
+from karesansui.db.access.machine_machine2jobgroup import findbyall
+
+def create_database(path, jobs, machines):
+    engine = sqlalchemy.create_engine("sqlite:///%s" % path)
+    metadata = sqlalchemy.MetaData(engine)
+    reload_mappers(metadata)
+    metadata.create_all()
+
+    now = datetime.datetime.now()
+    conn = engine.connect()
+    conn.execute(metadata.tables["user"].insert(),
+                 [{"id": 1, "email": "bench@example.com", "password": "",
+                   "salt": "", "nickname": "bench", "languages": "en_US",
+                   "created": now, "modified": now}])
+    conn.execute(metadata.tables["machine"].insert(),
+                 [{"id": i, "uniq_key": "%036d" % i, "name": "guest%d" % i,
+                   "attribute": MACHINE_ATTRIBUTE["GUEST"],
+                   "hypervisor": MACHINE_HYPERVISOR["KVM"],
+                   "is_deleted": False, "created_user_id": 1,
+                   "modified_user_id": 1, "created": now, "modified": now}
+                  for i in range(1, machines + 1)])
+
+    t_m2j = metadata.tables["machine2jobgroup"]
+    batch = 10000
+    for offset in range(0, jobs, batch):
+        conn.execute(t_m2j.insert(),
+                     [{"machine_id": i % machines + 1, "jobgroup_id": i + 1,
+                       "uniq_key": "%036d" % i, "created_user_id": 1,
+                       "modified_user_id": 1, "created": now, "modified": now}
+                      for i in range(offset, min(offset + batch, jobs))])
+    conn.close()
+    return engine
+
+def run(session, mode, page, requests):
+    start = time.time()
+    for i in range(requests):
+        if mode == "list":
+            pager = Pager(findbyall(session, desc=True), page, JOB_LIST_RANGE)
+        elif mode == "query":
+            pager = Pager(findbyall(session, desc=True, as_query=True),
+                          page, JOB_LIST_RANGE)
+        else:
+            pager = Pager(findbyall(session, desc=True, as_query=True),
+                          page, JOB_LIST_RANGE, PAGER_COUNT_CACHE_TTL)
+        pager.get_displays()
+        session.expunge_all()
+    return time.time() - start
+
+def main():
+    optp = OptionParser()
+    optp.add_option('-j', '--jobs',     dest='jobs',     type="int", default=500000)
+    optp.add_option('-m', '--machines', dest='machines', type="int", default=100)
+    optp.add_option('-n', '--requests', dest='requests', type="int", default=5)
+    (opts, args) = optp.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_pager.")
+    try:
+        engine = create_database(os.path.join(tmpdir, "karesansui.db"),
+                                 opts.jobs, opts.machines)
+        session = sessionmaker(bind=engine)()
+        last = (opts.jobs - 1) // JOB_LIST_RANGE
+        for page in (0, last):
+            for mode in ("list", "query", "cached"):
+                elapsed = run(session, mode, page, opts.requests)
+                print("page %-7d %-6s: %9.1f msec/req" \
+                      % (page, mode, elapsed * 1000 / opts.requests))
+        session.close()
+    finally:
+        shutil.rmtree(tmpdir)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
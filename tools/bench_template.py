@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+
+"""
+Measure the render throughput of the heaviest page templates.
+
+ legacy  : a new TemplateLookup per request, templates compiled every time
+           (the behavior before get_template_lookup()).
+ restart : a new TemplateLookup per request with a module directory, i.e. the
+           first request of a restarted process.
+ cached  : one TemplateLookup for the process.
+
+The pages are rendered with an empty view: every variable a template reads
+is given an object whose attributes, items and calls are empty, so loops are
+skipped and only the template code itself is measured.
+
+usage: python tools/bench_template.py [-n REQUESTS] [-t THEME] [TEMPLATE...]
+"""
+
+import os
+import re
+import sys
+import time
+import shutil
+import tempfile
+from optparse import OptionParser
+
+from mako.lookup import TemplateLookup
+
+import karesansui
+
+DEFAULT_TEMPLATES = ["guestby1/guestby1.part",
+                     "guest/guest.part",
+                     "host/host.part",
+                     "tree/tree.part",
+                     ]
+
+CONTEXT_NAME_REGEX = re.compile(r"context\.get\('([a-zA-Z_][a-zA-Z0-9_]*)'")
+
+# names provided by mako itself.
+MAKO_NAMES = set(["self", "next", "parent", "local", "caller", "capture"])
+
+class Empty(object):
+    def __getattr__(self, name):
+        return self
+    def __getitem__(self, key):
+        return self
+    def __call__(self, *args, **kwargs):
+        return self
+    def __iter__(self):
+        return iter([])
+    def __len__(self):
+        return 0
+    def __eq__(self, other):
+        return False
+    def __ne__(self, other):
+        return True
+    __hash__ = object.__hash__
+    def __str__(self):
+        return ""
+
+def new_lookup(template_dir, module_directory=None):
+    return TemplateLookup(directories=template_dir,
+                          module_directory=module_directory,
+                          filesystem_checks=False,
+                          input_encoding='utf-8',
+                          output_encoding='utf-8',
+                          default_filters=['decode.utf8'],
+                          encoding_errors='replace')
+
+def render_args(lookup, templatename):
+    names = set()
+    for uri in (templatename, "include/common.part"):
+        names.update(CONTEXT_NAME_REGEX.findall(lookup.get_template(uri).code))
+    kwargs = dict([(name, Empty()) for name in names - MAKO_NAMES])
+    kwargs["_"] = lambda x: x
+    kwargs["title"] = "Karesansui"
+    return kwargs
+
+def run(get_lookup, templatename, kwargs, requests):
+    start = time.time()
+    for i in range(requests):
+        get_lookup().get_template(templatename).render(**kwargs)
+    return time.time() - start
+
+def main():
+    optp = OptionParser()
+    optp.add_option('-n', '--requests', dest='requests', type="int", default=200)
+    optp.add_option('-t', '--theme',    dest='theme',    default="default")
+    (opts, args) = optp.parse_args()
+
+    template_dir = "%s/templates/%s" % (karesansui.dirname, opts.theme)
+    module_directory = tempfile.mkdtemp(prefix="bench_template.")
+    try:
+        cached = new_lookup(template_dir, module_directory)
+        modes = (("legacy",  lambda: new_lookup(template_dir)),
+                 ("restart", lambda: new_lookup(template_dir, module_directory)),
+                 ("cached",  lambda: cached),
+                 )
+        for templatename in (args or DEFAULT_TEMPLATES):
+            kwargs = render_args(cached, templatename)
+            for label, get_lookup in modes:
+                try:
+                    elapsed = run(get_lookup, templatename, kwargs, opts.requests)
+                except Exception as e:
+                    print("%-28s skipped - cannot render with an empty view: %s" \
+                          % (templatename, str(e)))
+                    break
+                print("%-28s %-7s: %6.1f req/sec (%.3f msec/req)" \
+                      % (templatename, label, opts.requests / elapsed,
+                         elapsed * 1000 / opts.requests))
+    finally:
+        shutil.rmtree(module_directory)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
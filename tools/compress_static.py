@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of Karesansui.
+#
+# Copyright (C) 2009-2012 HDE, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+
+"""
+Build the precompressed variants (.gz, and .br when the brotli module is
+available) of the static css and js files. Run at install time.
+
+usage: python tools/compress_static.py [-f] [STATIC_DIR]
+"""
+
+import sys
+from optparse import OptionParser
+
+from karesansui.lib.static import compress_static, get_static_dir
+
+def main():
+    optp = OptionParser()
+    optp.add_option('-f', '--force', dest='force', action="store_true", default=False,
+                    help='Rebuild variants that are up to date')
+    (opts, args) = optp.parse_args()
+
+    if args:
+        static_dir = args[0]
+    else:
+        static_dir = get_static_dir()
+    count = compress_static(static_dir, force=opts.force)
+    print("%s: %d files written" % (static_dir, count))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())